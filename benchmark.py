@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+"""
+Headless end-to-end benchmark of the UmetaFlow workflow.
+
+Generates synthetic LC-MS mzML files with pyopenms (random noise peaks, injected metabolite
+traces with isotope patterns and MS2 spectra of eluting traces), runs the workflow execution
+(OpenMS TOPP tools and python-tools, without the Streamlit app) for each number of files and
+reports wall time, CPU time and peak memory per stage (tool) as JSON.
+
+Synthetic data is deterministic (fixed seed) and cached, results contain the git commit and
+machine information, so that results of different commits can be compared (--compare).
+
+Example:
+    python benchmark.py --files 10 100 500 --compare benchmark-results/<commit>.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyopenms as poms
+
+# The workflow uses paths relative to the repository (settings.json, src/python-tools, assets)
+os.chdir(Path(__file__).resolve().parent)
+sys.path.insert(0, str(Path.cwd()))
+
+from src.UmetaFlowTOPPWorkflow import Workflow
+from src.workflow.RunTimeline import RunTimeline
+
+# Mass difference between isotopes and relative isotope intensities of injected traces
+C13_DIFF = 1.003355
+ISOTOPES = [1.0, 0.3, 0.05]
+# Time between two spectra in seconds
+SCAN_TIME = 0.2
+
+
+def generate_traces(n_traces: int, run_time: float, seed: int) -> pd.DataFrame:
+    """
+    Generates metabolite traces which are injected into all files of a benchmark.
+
+    Args:
+        n_traces (int): Number of traces.
+        run_time (float): Run time of the LC-MS run in seconds.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: m/z, retention time, peak width (sigma) and maximum intensity of each trace.
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "mz": rng.uniform(100, 900, n_traces),
+            "rt": rng.uniform(0.05 * run_time, 0.95 * run_time, n_traces),
+            "sigma": rng.uniform(1.5, 5, n_traces),
+            "intensity": 10 ** rng.uniform(4.5, 7, n_traces),
+        }
+    )
+
+
+def generate_mzml(
+    path: Path,
+    traces: pd.DataFrame,
+    n_spectra: int,
+    n_peaks: int,
+    ms2_ratio: float,
+    seed: int,
+) -> None:
+    """
+    Writes a synthetic LC-MS mzML file. MS1 spectra contain random noise peaks and the peaks of
+    all eluting traces (Gaussian elution profile, retention time shift and intensity scaled
+    per file). After each MS1 spectrum, MS2 spectra of the most intense eluting traces are
+    added (with trace specific fragments), so that ms2_ratio of all spectra are MS2 spectra.
+
+    Args:
+        path (Path): The mzML file to write.
+        traces (pd.DataFrame): Traces to inject (see generate_traces).
+        n_spectra (int): Total number of spectra.
+        n_peaks (int): Number of noise peaks per MS1 spectrum.
+        ms2_ratio (float): Fraction of MS2 spectra (0 to <1).
+        seed (int): Random seed of this file.
+    """
+    rng = np.random.default_rng(seed)
+    rt_center = traces["rt"].to_numpy() + rng.normal(0, 3)
+    intensity = traces["intensity"].to_numpy() * rng.lognormal(0, 0.3, len(traces))
+    sigma = traces["sigma"].to_numpy()
+    trace_mz = traces["mz"].to_numpy()
+    exp = poms.MSExperiment()
+    ms2_credit = 0.0
+    i = 0
+    while i < n_spectra:
+        rt = i * SCAN_TIME
+        # MS1 spectrum with noise and eluting traces
+        profile = intensity * np.exp(-0.5 * ((rt - rt_center) / sigma) ** 2)
+        eluting = np.flatnonzero(profile > 0.01 * intensity)
+        mz = [rng.uniform(50, 1000, n_peaks)]
+        inty = [rng.exponential(500, n_peaks)]
+        for k, rel in enumerate(ISOTOPES):
+            mz.append(trace_mz[eluting] + k * C13_DIFF + rng.normal(0, 2e-6 * trace_mz[eluting]))
+            inty.append(profile[eluting] * rel)
+        mz, inty = np.concatenate(mz), np.concatenate(inty)
+        order = np.argsort(mz)
+        spectrum = poms.MSSpectrum()
+        spectrum.setRT(rt)
+        spectrum.setMSLevel(1)
+        spectrum.setNativeID(f"scan={i + 1}")
+        spectrum.set_peaks((mz[order], inty[order].astype(np.float32)))
+        exp.addSpectrum(spectrum)
+        i += 1
+        # MS2 spectra of the most intense eluting traces (top N)
+        ms2_credit += ms2_ratio / (1 - ms2_ratio) if ms2_ratio < 1 else 0
+        precursors = eluting[np.argsort(profile[eluting])[::-1]]
+        while ms2_credit >= 1 and i < n_spectra:
+            ms2_credit -= 1
+            if len(precursors) == 0:
+                break
+            trace, precursors = precursors[0], precursors[1:]
+            # Fragments are specific for each trace (same in all files)
+            fragment_rng = np.random.default_rng([seed // 1_000_000, int(trace)])
+            fragment_mz = np.sort(fragment_rng.uniform(50, trace_mz[trace], 10))
+            fragment_intensity = fragment_rng.uniform(0.05, 1, 10) * profile[trace] * 0.1
+            precursor = poms.Precursor()
+            precursor.setMZ(float(trace_mz[trace]))
+            precursor.setIntensity(float(profile[trace]))
+            precursor.setCharge(1)
+            spectrum = poms.MSSpectrum()
+            spectrum.setRT(i * SCAN_TIME)
+            spectrum.setMSLevel(2)
+            spectrum.setNativeID(f"scan={i + 1}")
+            spectrum.setPrecursors([precursor])
+            spectrum.set_peaks((fragment_mz, fragment_intensity.astype(np.float32)))
+            exp.addSpectrum(spectrum)
+            i += 1
+    exp.updateRanges()
+    poms.MzMLFile().store(str(path), exp)
+
+
+def generate_files(n_files: int, config: dict, data_dir: Path) -> list[Path]:
+    """
+    Generates (or re-uses previously generated) synthetic mzML files for a benchmark configuration.
+
+    Args:
+        n_files (int): Number of files.
+        config (dict): Generator settings (spectra, peaks, ms2_ratio, traces and seed).
+        data_dir (Path): Directory for generated data, files are stored per configuration.
+
+    Returns:
+        list[Path]: The mzML files.
+    """
+    config_hash = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+    config_dir = Path(data_dir, config_hash)
+    config_dir.mkdir(parents=True, exist_ok=True)
+    with open(Path(config_dir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=4)
+    traces = generate_traces(config["traces"], config["spectra"] * SCAN_TIME, config["seed"])
+    files = []
+    for i in range(n_files):
+        path = Path(config_dir, f"sample-{i + 1:04d}.mzML")
+        if not path.exists():
+            tmp = path.with_suffix(".tmp.mzML")
+            generate_mzml(
+                tmp,
+                traces,
+                config["spectra"],
+                config["peaks"],
+                config["ms2_ratio"],
+                config["seed"] * 1_000_000 + i,
+            )
+            tmp.rename(path)
+        files.append(path)
+    return files
+
+
+def setup_workspace(workspace: Path, files: list[Path], enable: list[str], disable: list[str]) -> None:
+    """
+    Creates a workspace with the given mzML files selected and UmetaFlow (expert mode)
+    parameters, defaults from default-parameters.json with the given switches changed.
+    """
+    shutil.rmtree(workspace, ignore_errors=True)
+    mzML_dir = Path(workspace, "mzML-files")
+    mzML_dir.mkdir(parents=True)
+    for f in files:
+        try:
+            os.symlink(f.resolve(), Path(mzML_dir, f.name))
+        except OSError:
+            shutil.copy(f, mzML_dir)
+    pd.DataFrame({"file name": [f.name for f in files], "use in workflows": True}).to_csv(
+        Path(workspace, "mzML-files.tsv"), sep="\t", index=False
+    )
+    Path(workspace, "umetaflow-expert-flag.txt").touch()
+    with open("default-parameters.json", "r", encoding="utf-8") as f:
+        params = json.load(f)["umetaflow-expert"]
+    params["ion_mode"] = "positive"
+    for key in enable:
+        params[key] = True
+    for key in disable:
+        params[key] = False
+    Path(workspace, "umetaflow-expert").mkdir()
+    with open(Path(workspace, "umetaflow-expert", "params.json"), "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=4)
+
+
+def run_workflow(workspace: Path) -> dict:
+    """
+    Runs the workflow execution in the current process and collects per-stage metrics.
+
+    Returns:
+        dict: Success, total wall time, time line summary and metrics per stage (tool).
+    """
+    wf = Workflow(str(workspace))
+    wf.executor.pid_dir.mkdir(parents=True, exist_ok=True)
+    start = time.time()
+    wf.workflow_process(force_rerun=True)
+    wall_time = time.time() - start
+    metrics = wf.executor.get_metrics()
+    stages = {}
+    for m in metrics:
+        stage = stages.setdefault(
+            m["tool"],
+            {"commands": 0, "wall_time": 0.0, "cpu_time": 0.0, "max_rss_bytes": 0, "start": m["start_time"], "end": 0.0},
+        )
+        stage["commands"] += 1
+        stage["wall_time"] += m["wall_time"]
+        stage["cpu_time"] += m.get("user_time", 0) + m.get("system_time", 0)
+        stage["max_rss_bytes"] = max(stage["max_rss_bytes"], m.get("max_rss_bytes", 0))
+        stage["start"] = min(stage["start"], m["start_time"])
+        stage["end"] = max(stage["end"], m.get("end_time", m["start_time"] + m["wall_time"]))
+    for stage in stages.values():
+        # Time from the start of the first to the end of the last command of a stage
+        stage["elapsed"] = stage.pop("end") - stage.pop("start")
+    return {
+        "success": not wf.executor.incomplete_marker.exists(),
+        "wall_time": wall_time,
+        "timeline": RunTimeline(metrics, wf.executor.max_slots).get_summary(),
+        "stages": stages,
+    }
+
+
+def get_environment() -> dict:
+    """Returns the git commit and machine information, to tell if results are comparable."""
+
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pyopenms": poms.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """Prints the relative change of total and per-stage wall times compared to a baseline."""
+    print(f"\nComparison with {baseline['environment']['commit'][:10]}:")
+    for n_files, run in results["runs"].items():
+        base = baseline["runs"].get(n_files)
+        if base is None:
+            continue
+        print(f"{n_files} files: total {run['wall_time']:.1f} s ({run['wall_time'] / base['wall_time'] - 1:+.0%})")
+        for tool, stage in run["stages"].items():
+            if tool in base["stages"] and base["stages"][tool]["wall_time"] > 0:
+                change = stage["wall_time"] / base["stages"][tool]["wall_time"] - 1
+                print(f"    {tool}: {stage['wall_time']:.1f} s ({change:+.0%})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the UmetaFlow workflow with synthetic mzML files.")
+    parser.add_argument("--files", type=int, nargs="+", default=[10, 100, 500], help="Numbers of files to benchmark.")
+    parser.add_argument("--spectra", type=int, default=1500, help="Spectra per file.")
+    parser.add_argument("--peaks", type=int, default=300, help="Noise peaks per MS1 spectrum.")
+    parser.add_argument("--ms2-ratio", type=float, default=0.3, help="Fraction of MS2 spectra.")
+    parser.add_argument("--traces", type=int, default=200, help="Metabolite traces injected into every file.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic data.")
+    parser.add_argument(
+        "--enable",
+        nargs="*",
+        default=["adduct-detection", "requantify", "export-gnps"],
+        help="Workflow switches to enable (SIRIUS and MS2Query need external tools and are disabled by default).",
+    )
+    parser.add_argument("--disable", nargs="*", default=[], help="Workflow switches to disable.")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per number of files, the run with the median wall time is reported.")
+    parser.add_argument("--data-dir", type=Path, default=Path("benchmark-data"), help="Directory for synthetic data and workspaces.")
+    parser.add_argument("--out", type=Path, default=None, help="Results JSON file (default: benchmark-results/<commit>.json).")
+    parser.add_argument("--compare", type=Path, default=None, help="Results JSON file of a previous benchmark to compare with.")
+    args = parser.parse_args()
+
+    config = {
+        "spectra": args.spectra,
+        "peaks": args.peaks,
+        "ms2_ratio": args.ms2_ratio,
+        "traces": args.traces,
+        "seed": args.seed,
+    }
+    results = {
+        "environment": get_environment(),
+        "config": {**config, "enable": args.enable, "disable": args.disable, "repeats": args.repeats},
+        "runs": {},
+    }
+    for n_files in args.files:
+        print(f"Generating {n_files} mzML files...")
+        files = generate_files(n_files, config, Path(args.data_dir, "mzML"))
+        runs = []
+        for repeat in range(args.repeats):
+            print(f"Running workflow with {n_files} files ({repeat + 1}/{args.repeats})...")
+            workspace = Path(args.data_dir, "workspaces", f"{n_files}-files").resolve()
+            setup_workspace(workspace, files, args.enable, args.disable)
+            runs.append(run_workflow(workspace))
+            status = "finished" if runs[-1]["success"] else f"FAILED (see {workspace})"
+            print(f"    {status} in {runs[-1]['wall_time']:.1f} s")
+        median = statistics.median_low([run["wall_time"] for run in runs])
+        results["runs"][str(n_files)] = next(run for run in runs if run["wall_time"] == median)
+
+    out = args.out or Path("benchmark-results", f"{results['environment']['commit'][:10] or 'unknown'}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+    print(f"Results written to {out}.")
+
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
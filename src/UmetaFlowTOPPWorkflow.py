@@ -30,19 +30,25 @@ class Workflow(WorkflowManager):
     def upload(self) -> None:
         return
 
+    @staticmethod
+    def find_sirius() -> str:
+        """Returns the path to the SIRIUS executable or an empty string if SIRIUS is not installed."""
+        possible_paths = [  # potential SIRIUS locations in increasing priority
+            str(Path("sirius")),  # anywhere
+            str(Path(sys.prefix, "bin", "sirius")),  # in current conda environment
+            str(
+                Path(".", "sirius", "sirius.exe")
+            ),  # in case of Windows executables
+        ]
+        sirius_path = ""
+        for path in possible_paths:
+            if shutil.which(path) is not None:
+                sirius_path = path
+        return sirius_path
+
     def add_sirius_path_to_session_state(self):
         if "sirius-path" not in st.session_state:
-            possible_paths = [  # potential SIRIUS locations in increasing priority
-                str(Path("sirius")),  # anywhere
-                str(Path(sys.prefix, "bin", "sirius")),  # in current conda environment
-                str(
-                    Path(".", "sirius", "sirius.exe")
-                ),  # in case of Windows executables
-            ]
-            st.session_state["sirius-path"] = ""
-            for path in possible_paths:
-                if shutil.which(path) is not None:
-                    st.session_state["sirius-path"] = path
+            st.session_state["sirius-path"] = self.find_sirius()
 
     def configure_simple(self) -> None:
         cols = st.columns(4)
@@ -786,89 +792,125 @@ class Workflow(WorkflowManager):
 
         # # Log any messages.
         self.logger.log(f"Number of input mzML files: {len(mzML)}")
+        # Run times of previous runs are scaled by the input size for the progress estimate
+        self.executor.progress.set_input_size(sum(Path(f).stat().st_size for f in mzML))
         self.logger.log(f"mzML files: {[Path(p).name for p in mzML]}")
 
-        # Precursor m/z correction to highest intensity MS1 peak
-        if self.params["correct-precursor"]:
-            self.logger.log("Correcting precursor m/z to highest intensity MS1 peak.")
-            mzML_pmc = self.file_manager.get_files(mzML, "mzML", "mzML-pmc")
-            self.executor.run_topp(
-                "HighResPrecursorMassCorrector",
-                {"in": mzML, "out": mzML_pmc},
+        # Preprocessing, feature map export and feature linking are executed as a step graph:
+        # per-file steps are pipelined (each file continues with the next step as soon as it is ready),
+        # only collective steps (map alignment and feature linking) wait for all files.
+        with self.executor.parallel_steps() as steps:
+            # Precursor m/z correction to highest intensity MS1 peak
+            if self.params["correct-precursor"]:
+                mzML_pmc = self.file_manager.get_files(mzML, "mzML", "mzML-pmc")
+                steps.add(
+                    self.executor.run_topp,
+                    "HighResPrecursorMassCorrector",
+                    {"in": mzML, "out": mzML_pmc},
+                    message="Correcting precursor m/z to highest intensity MS1 peak.",
+                    per_file=True,
+                )
+                mzML = mzML_pmc
+
+            # Feature Detection
+            ffm = self.file_manager.get_files(mzML, "featureXML", "ffm-featureXML")
+            steps.add(
+                self.executor.run_topp,
+                "FeatureFinderMetabo",
+                {
+                    "in": mzML,
+                    "out": ffm,
+                    "out_chrom": self.file_manager.get_files(
+                        mzML, set_results_dir="ffm-chroms"
+                    ),
+                },
+                message="Detecting features.",
+                per_file=True,
             )
-            mzML = mzML_pmc
 
-        # Feature Detection
-        self.logger.log("Detecting features.")
-        ffm = self.file_manager.get_files(mzML, "featureXML", "ffm-featureXML")
-        self.executor.run_topp(
-            "FeatureFinderMetabo",
-            input_output={
-                "in": mzML,
-                "out": ffm,
-                "out_chrom": self.file_manager.get_files(
-                    mzML, set_results_dir="ffm-chroms"
-                ),
-            },
-        )
+            # Adduct Detection
+            # Steps write to new result directories instead of modifying files in place,
+            # so that unchanged steps can be skipped when the workflow is executed again.
+            if self.params["adduct-detection"]:
+                ffm_decharged = self.file_manager.get_files(ffm, set_results_dir="ffm-decharged")
+                # Run MetaboliteAdductDecharger for adduct detection, with disabled logs.
+                steps.add(
+                    self.executor.run_topp,
+                    "MetaboliteAdductDecharger",
+                    {"in": ffm, "out_fm": ffm_decharged},
+                    message="Detecting adducts.",
+                    per_file=True,
+                )
+                ffm = ffm_decharged
 
-        # Adduct Detection
-        if self.params["adduct-detection"]:
-            self.logger.log("Detecting adducts.")
-            # Run MetaboliteAdductDecharger for adduct detection, with disabled logs.
-            self.executor.run_topp(
-                "MetaboliteAdductDecharger",
-                {"in": ffm, "out_fm": ffm},
+            # Map Alignement
+            if self.params["map-alignement"]:
+                trafos = self.file_manager.get_files(
+                    ffm, "trafoXML", "trafos", collect=True
+                )
+                ffm_aligned = self.file_manager.get_files(ffm, set_results_dir="ffm-aligned")
+                # Run MapAlignerPoseClustering for map alignement, with disabled logs.
+                steps.add(
+                    self.executor.run_topp,
+                    "MapAlignerPoseClustering",
+                    {
+                        "in": self.file_manager.get_files(ffm, collect=True),
+                        "out": self.file_manager.get_files(ffm_aligned, collect=True),
+                        "trafo_out": trafos,
+                    },
+                    message="Aligning feature maps.",
+                )
+                ffm = ffm_aligned
+                # Transform mzML files
+                mzML_aligned = self.file_manager.get_files(mzML, set_results_dir="mzML-aligned")
+                steps.add(
+                    self.executor.run_topp,
+                    "MapRTTransformer",
+                    {
+                        "in": mzML,
+                        "out": mzML_aligned,
+                        "trafo_in": self.file_manager.get_files(trafos),
+                    },
+                    message="Transforming mzML files based on map alignement.",
+                    per_file=True,
+                )
+                mzML = mzML_aligned
+
+            # Feature map export and feature linking are independent of each other
+            # Export FFM feature maps to dataframes (including chromatograms)
+            steps.add(
+                self.executor.run_python,
+                "export_ffm_df",
+                {"in": ffm},
+                inputs=[Path(self.workflow_dir, "results", "ffm-chroms")],
+                outputs=[Path(self.workflow_dir, "results", "ffm-df")],
             )
 
-        # Map Alignement
-        if self.params["map-alignement"]:
-            self.logger.log("Aligning feature maps.")
-            trafos = self.file_manager.get_files(
-                ffm, "trafoXML", "trafos", collect=True
+            # Feature Linking and Export to pd.DataFrame
+            consensusXML = self.file_manager.get_files(
+                "feature-matrix-ffm", "consensusXML", "feature-linker"
             )
-            # Run MapAlignerPoseClustering for map alignement, with disabled logs.
-            self.executor.run_topp(
-                "MapAlignerPoseClustering",
-                {
-                    "in": self.file_manager.get_files(ffm, collect=True),
-                    "out": self.file_manager.get_files(ffm, collect=True),
-                    "trafo_out": trafos,
-                },
+            steps.add(
+                self.executor.run_topp,
+                "FeatureLinkerUnlabeledKD",
+                {"in": self.file_manager.get_files(ffm, collect=True), "out": consensusXML},
+                message="Linking features.",
             )
-            self.logger.log("Transforming mzML files based on map alignement.")
-            # Transform mzML files
-            self.executor.run_topp(
-                "MapRTTransformer",
+
+            # Export to DataFrame
+            consensus_df = self.file_manager.get_files(
+                "feature-matrix", "parquet", "consensus-dfs"
+            )
+            steps.add(
+                self.executor.run_python,
+                "export_consensus_df",
                 {
-                    "in": mzML,
-                    "out": mzML,
-                    "trafo_in": self.file_manager.get_files(trafos),
+                    "in": consensusXML,
+                    "out": consensus_df,
+                    "out_tsv": self.file_manager.get_files(consensus_df, "tsv"),
                 },
             )
 
-        # Export FFM feature maps to dataframes (including chromatograms)
-        self.executor.run_python("export_ffm_df", {"in": ffm})
-
-        # Feature Linking and Export to pd.DataFrame
-        self.logger.log("Linking features.")
-        consensusXML = self.file_manager.get_files(
-            "feature-matrix-ffm", "consensusXML", "feature-linker"
-        )
-        self.executor.run_topp(
-            "FeatureLinkerUnlabeledKD",
-            {"in": self.file_manager.get_files(ffm, collect=True), "out": consensusXML},
-        )
-
-        # Export to DataFrame
-        consensus_df = self.file_manager.get_files(
-            "feature-matrix", "parquet", "consensus-dfs"
-        )
-
-        self.executor.run_python(
-            "export_consensus_df", {"in": consensusXML, "out": consensus_df}
-        )
-
         # Requantify features with missing values
         if self.params["requantify"]:
             self.logger.log("Re-quantifying features with missing values.")
@@ -885,25 +927,36 @@ class Workflow(WorkflowManager):
                     "in": consensus_df,
                     "out": ffmid_library,
                     "out_ffm": consensus_df_ffm_complete,
+                    "out_ffm_tsv": self.file_manager.get_files(consensus_df_ffm_complete, "tsv"),
                 },
             )
 
-            # Run FeatureFinderMetaboIdent
-            ffmid = self.file_manager.get_files(mzML, "featureXML", "ffmid-featureXML")
-            self.executor.run_topp(
-                "FeatureFinderMetaboIdent",
-                {"in": mzML, "out": ffmid, "id": ffmid_library},
-            )
-
-            # Perform Adduct detection on re-quantified features
-            if self.params["adduct-detection"]:
-                self.logger.log("Detecting adducts for re-quantified features.")
-                # Run MetaboliteAdductDecharger for adduct detection.
-                self.executor.run_topp(
-                    "MetaboliteAdductDecharger",
-                    {"in": ffmid, "out_fm": ffmid},
+            # Re-quantification and adduct detection are pipelined per file
+            with self.executor.parallel_steps() as steps:
+                # Run FeatureFinderMetaboIdent
+                ffmid = self.file_manager.get_files(mzML, "featureXML", "ffmid-featureXML")
+                steps.add(
+                    self.executor.run_topp,
+                    "FeatureFinderMetaboIdent",
+                    {"in": mzML, "out": ffmid, "id": ffmid_library},
+                    per_file=True,
                 )
 
+                # Perform Adduct detection on re-quantified features
+                if self.params["adduct-detection"]:
+                    ffmid_decharged = self.file_manager.get_files(
+                        ffmid, set_results_dir="ffmid-decharged"
+                    )
+                    # Run MetaboliteAdductDecharger for adduct detection.
+                    steps.add(
+                        self.executor.run_topp,
+                        "MetaboliteAdductDecharger",
+                        {"in": ffmid, "out_fm": ffmid_decharged},
+                        message="Detecting adducts for re-quantified features.",
+                        per_file=True,
+                    )
+                    ffmid = ffmid_decharged
+
             # Export re-quantified feature maps to dataframes (including chromatograms)
             self.executor.run_python("export_ffmid_df", {"in": ffmid})
 
@@ -925,7 +978,11 @@ class Workflow(WorkflowManager):
             )
             self.executor.run_python(
                 "export_consensus_df",
-                {"in": consensusXML_ffmid, "out": consensus_df_ffmid},
+                {
+                    "in": consensusXML_ffmid,
+                    "out": consensus_df_ffmid,
+                    "out_tsv": self.file_manager.get_files(consensus_df_ffmid, "tsv"),
+                },
             )
 
             # Merge consensus_df and consensus_df_ffmid
@@ -934,6 +991,7 @@ class Workflow(WorkflowManager):
                 {
                     "in": [consensus_df_ffm_complete, consensus_df_ffmid],
                     "out": consensus_df,
+                    "out_tsv": self.file_manager.get_files(consensus_df, "tsv"),
                 },
             )
 
@@ -963,8 +1021,9 @@ class Workflow(WorkflowManager):
             )
             mzML = sorted(mzML)
 
-        self.add_sirius_path_to_session_state()
-        if st.session_state["sirius-path"]:
+        # Not taken from the session state, the workflow can also run without the Streamlit app (e.g. benchmark.py)
+        sirius_path = self.find_sirius()
+        if sirius_path:
             if (
                 self.params["run-sirius"]
                 or self.params["run-fingerid"]
@@ -977,175 +1036,125 @@ class Workflow(WorkflowManager):
                     self.logger.log(
                         "WARNING: SIRIUS account info incomplete. SIRIUS will not be executed and features not annotated."
                     )
-                    st.session_state["sirius-path"] = ""
+                    sirius_path = ""
             else:
-                st.session_state["sirius-path"] = ""
+                sirius_path = ""
 
-        if self.params["export-sirius"] or st.session_state["sirius-path"]:
-            self.logger.log("Exporting input files for SIRIUS.")
-            sirius_ms_files = self.file_manager.get_files(mzML, "ms", "sirius-export")
-            self.executor.run_topp(
-                "SiriusExport",
-                {
-                    "in": mzML,
-                    "in_featureinfo": ffm,
-                    "out": sirius_ms_files,
-                },
-            )
-            if st.session_state["sirius-path"]:
-                self.logger.log("Logging in to SIRIUS...")
-                self.executor.run_command(
-                    [
-                        st.session_state["sirius-path"],
-                        "login",
-                        f"--email={self.params['sirius-user-email']}",
-                        f"--password={self.params['sirius-user-password']}",
-                    ]
+        consensus_df_gnps = self.file_manager.get_files(
+            "feature-matrix-gnps", "parquet", "consensus-dfs"
+        )
+        mgf = self.file_manager.get_files("MS2", "mgf", "gnps-export")
+
+        # SIRIUS, GNPS export and MS2 annotations run concurrently where they do not depend on each other,
+        # annotation steps which modify the consensus feature matrix run one after another
+        with self.executor.parallel_steps() as steps:
+            if self.params["export-sirius"] or sirius_path:
+                steps.add(
+                    self.run_sirius,
+                    mzML,
+                    ffm,
+                    sirius_path,
+                    inputs=mzML + ffm,
+                    outputs=[
+                        Path(self.workflow_dir, "results", "sirius-export"),
+                        Path(self.workflow_dir, "results", "sirius-projects"),
+                    ],
+                    name="SIRIUS",
                 )
-                sirius_projects = [
-                    Path(
-                        self.workflow_dir, "results", "sirius-projects", Path(file).stem
-                    )
-                    for file in sirius_ms_files
-                ]
-                commands = []
-                for ms, project in zip(sirius_ms_files, sirius_projects):
-                    if Path(ms).stat().st_size > 0:
-                        project.mkdir(parents=True)
-                        command = [
-                            st.session_state["sirius-path"],
-                            "--input",
-                            ms,
-                            "--project",
-                            str(project),
-                            "--no-compression",
-                            "--maxmz",
-                            self.params["sirius-maxmz"],
-                            "formula",
-                            "--db",
-                            self.params["sirius-db"],
-                            "--ions-considered",
-                            self.params["sirius-ions-considered"],
-                            "--elements-considered",
-                            self.params["sirius-elements-considered"],
-                            "--elements-enforced",
-                            self.params["sirius-elements-enforced"],
-                            "--ppm-max",
-                            self.params["sirius-ppm-max"],
-                            "--ppm-max-ms2",
-                            self.params["sirius-ppm-max-ms2"],
-                            "--profile",
-                            self.params["sirius-profile"],
-                            "--candidates",
-                            "1",
-                        ]
-                        if self.params["run-fingerid"] or self.params["run-canopus"]:
-                            command.append("fingerprint")
-                        if self.params["run-fingerid"]:
-                            command += [
-                                "structure",
-                                "--db",
-                                self.params["sirius-structure-db"],
-                            ]
-                        if self.params["run-canopus"]:
-                            command.append("canopus")
-                        command.append("write-summaries")
-                        commands.append(command)
-                if commands:
-                    self.logger.log("Running SIRIUS... (might take a VERY long time)")
-                    for command in commands:
-                        self.logger.log(f"Running file {Path(command[2]).stem}...")
-                        self.executor.run_command(command)
-                else:
-                    self.logger.log("No MS2 data for SIRIUS to process.")
-
-        if (
-            self.params["export-gnps"]
-            or self.params["annotate-ms2"]
-            or self.params["run-ms2query"]
-        ):
-            self.logger.log("Exporting input files for GNPS.")
-            # Map MS2 specs to features
-            self.executor.run_topp(
-                "IDMapper",
-                {
-                    "in": ffm,
-                    "spectra:in": mzML,
-                    "out": ffm,
-                    "id": self.file_manager.get_files(
-                        str(Path("assets", "empty.idXML"))
-                    ),
-                },
-            )
-            # Link features with MS2 info
-            gnps_consensus = self.file_manager.get_files(
-                "feature-matrix-gnps", "consensusXML", "feature-linker"
-            )
-            self.executor.run_topp(
-                "FeatureLinkerUnlabeledKD",
-                {
-                    "in": self.file_manager.get_files(ffm, collect=True),
-                    "out": gnps_consensus,
-                },
-            )
 
-            # Filter consensus features which have missing values
-            self.executor.run_topp(
-                "FileFilter",
-                {"in": gnps_consensus, "out": gnps_consensus},
-                custom_params={"id:remove_unannotated_features": ""},
-            )
+            if (
+                self.params["export-gnps"]
+                or self.params["annotate-ms2"]
+                or self.params["run-ms2query"]
+            ):
+                # Map MS2 specs to features
+                ffm_ms2 = self.file_manager.get_files(ffm, set_results_dir="ffm-ms2-mapped")
+                steps.add(
+                    self.executor.run_topp,
+                    "IDMapper",
+                    {
+                        "in": ffm,
+                        "spectra:in": mzML,
+                        "out": ffm_ms2,
+                        "id": self.file_manager.get_files(
+                            str(Path("assets", "empty.idXML"))
+                        ),
+                    },
+                    message="Exporting input files for GNPS.",
+                )
+                # Link features with MS2 info
+                gnps_consensus_unfiltered = self.file_manager.get_files(
+                    "feature-matrix-gnps-unfiltered", "consensusXML", "feature-linker"
+                )
+                steps.add(
+                    self.executor.run_topp,
+                    "FeatureLinkerUnlabeledKD",
+                    {
+                        "in": self.file_manager.get_files(ffm_ms2, collect=True),
+                        "out": gnps_consensus_unfiltered,
+                    },
+                )
 
-            # Export to dataframe
-            self.executor.run_python(
-                "export_consensus_df",
-                {
-                    "in": gnps_consensus,
-                    "out": self.file_manager.get_files(
-                        "feature-matrix-gnps", "parquet", "consensus-dfs"
-                    ),
-                },
-            )
+                # Filter consensus features which have missing values
+                gnps_consensus = self.file_manager.get_files(
+                    "feature-matrix-gnps", "consensusXML", "feature-linker"
+                )
+                steps.add(
+                    self.executor.run_topp,
+                    "FileFilter",
+                    {"in": gnps_consensus_unfiltered, "out": gnps_consensus},
+                    custom_params={"id:remove_unannotated_features": ""},
+                )
 
-            # Run GNPSExport
-            self.executor.run_topp(
-                "GNPSExport",
-                {
-                    "in_cm": gnps_consensus,
-                    "in_mzml": self.file_manager.get_files(mzML, collect=True),
-                    "out": self.file_manager.get_files("MS2", "mgf", "gnps-export"),
-                    "out_quantification": self.file_manager.get_files(
-                        "feature-quantification", "txt", "gnps-export"
-                    ),
-                    "out_pairs": self.file_manager.get_files(
-                        "pairs", "csv", "gnps-export"
-                    ),
-                    "out_meta_values": self.file_manager.get_files(
-                        "meta-values", "tsv", "gnps-export"
-                    ),
-                },
-            )
+                # Export to dataframe
+                steps.add(
+                    self.executor.run_python,
+                    "export_consensus_df",
+                    {
+                        "in": gnps_consensus,
+                        "out": consensus_df_gnps,
+                        "out_tsv": self.file_manager.get_files(consensus_df_gnps, "tsv"),
+                    },
+                )
+
+                # Run GNPSExport
+                steps.add(
+                    self.executor.run_topp,
+                    "GNPSExport",
+                    {
+                        "in_cm": gnps_consensus,
+                        "in_mzml": self.file_manager.get_files(mzML, collect=True),
+                        "out": mgf,
+                        "out_quantification": self.file_manager.get_files(
+                            "feature-quantification", "txt", "gnps-export"
+                        ),
+                        "out_pairs": self.file_manager.get_files(
+                            "pairs", "csv", "gnps-export"
+                        ),
+                        "out_meta_values": self.file_manager.get_files(
+                            "meta-values", "tsv", "gnps-export"
+                        ),
+                    },
+                )
 
-        if self.params["annotate-ms2"]:
-            dir_path = Path(self.workflow_dir, "input-files", "ms2-library")
-            if dir_path.exists():
+            if self.params["annotate-ms2"]:
                 dir_path = Path(self.workflow_dir, "input-files", "ms2-library")
                 if dir_path.exists():
                     files = [p for p in dir_path.iterdir()]
                     if files:
-                        self.logger.log("Annotating consensus features on MS2 level.")
-                        self.executor.run_topp(
+                        steps.add(
+                            self.executor.run_topp,
                             "FileConverter",
                             {
-                                "in": self.file_manager.get_files(
-                                    "MS2", "mgf", "gnps-export"
-                                ),
+                                "in": mgf,
                                 "out": self.file_manager.get_files(
                                     "MS2", "mzML", "spectral-matcher"
                                 ),
                             },
+                            message="Annotating consensus features on MS2 level.",
                         )
-                        self.executor.run_topp(
+                        steps.add(
+                            self.executor.run_topp,
                             "MetaboliteSpectralMatcher",
                             {
                                 "in": self.file_manager.get_files(
@@ -1158,7 +1167,8 @@ class Workflow(WorkflowManager):
                             },
                             custom_params={"algorithm:merge_spectra": "false"},
                         )
-                        self.executor.run_python(
+                        steps.add(
+                            self.executor.run_python,
                             "annotate-ms2",
                             {
                                 "in_mzTab": self.file_manager.get_files(
@@ -1167,38 +1177,142 @@ class Workflow(WorkflowManager):
                                 "in_mzML": self.file_manager.get_files(
                                     "MS2", "mzML", "spectral-matcher"
                                 ),
-                                "in_mgf": self.file_manager.get_files(
-                                    "MS2", "mgf", "gnps-export"
-                                ),
-                                "in_gnps_consensus": self.file_manager.get_files(
-                                    "feature-matrix-gnps", "parquet", "consensus-dfs"
-                                ),
+                                "in_mgf": mgf,
+                                "in_gnps_consensus": consensus_df_gnps,
                                 "out": consensus_df,
+                                "out_tsv": self.file_manager.get_files(consensus_df, "tsv"),
                             },
+                            # adds the matches to the consensus feature matrix
+                            in_place=consensus_df,
                         )
 
-        if st.session_state["sirius-path"]:
-            self.executor.run_python("annotate-sirius", {"in": consensus_df})
+            # MS2Query is added before the SIRIUS annotation, so that it does not have to wait for SIRIUS
+            if self.params["run-ms2query"]:
+                steps.add(
+                    self.executor.run_python,
+                    "run_ms2query",
+                    {
+                        "in": consensus_df,
+                        "in_mgf": mgf,
+                        "out_ms2query_csv": self.file_manager.get_files(
+                            "MS2", "csv", "ms2query"
+                        ),
+                        "out_tsv": self.file_manager.get_files(consensus_df, "tsv"),
+                        "ion_mode": self.params["ion_mode"],
+                        "service": self.executor.settings.get("ms2query-service", False),
+                        "service_idle_timeout": self.executor.settings.get("ms2query-service-idle-timeout", 3600),
+                    },
+                    inputs=consensus_df_gnps,
+                    message="Detecting chemical analogues and compound classes with MS2Query. This will take a while...",
+                    # adds the results to the consensus feature matrix
+                    in_place=consensus_df,
+                )
 
-        if self.params["run-ms2query"]:
-            self.logger.log(
-                "Detecting chemical analogues and compound classes with MS2Query. This will take a while..."
-            )
-            self.executor.run_python(
-                "run_ms2query",
-                {
-                    "in": consensus_df,
-                    "in_mgf": self.file_manager.get_files("MS2", "mgf", "gnps-export"),
-                    "out_ms2query_csv": self.file_manager.get_files(
-                        "MS2", "csv", "ms2query"
-                    ),
-                    "ion_mode": self.params["ion_mode"],
-                },
-            )
+            if sirius_path:
+                steps.add(
+                    self.executor.run_python,
+                    "annotate-sirius",
+                    {"in": consensus_df},
+                    inputs=[Path(self.workflow_dir, "results", "sirius-projects")],
+                    # modifies the consensus feature matrix and its tsv file in place
+                    # (no declared outputs in the input/output dictionary, always runs)
+                    outputs=consensus_df + self.file_manager.get_files(consensus_df, "tsv"),
+                )
 
         # ZIP all relevant files for Download
         self.executor.run_python("zip-result-files", {"in": consensus_df})
 
+    def run_sirius(self, mzML: list, ffm: list, sirius_path: str) -> None:
+        """
+        Exports SIRIUS input files and runs SIRIUS on each of them if a SIRIUS executable is available.
+
+        Args:
+            mzML (list): The mzML files.
+            ffm (list): The featureXML files (same order as mzML files).
+            sirius_path (str): Path to the SIRIUS executable or empty string to only export input files.
+        """
+        self.logger.log("Exporting input files for SIRIUS.")
+        sirius_ms_files = self.file_manager.get_files(mzML, "ms", "sirius-export")
+        self.executor.run_topp(
+            "SiriusExport",
+            {
+                "in": mzML,
+                "in_featureinfo": ffm,
+                "out": sirius_ms_files,
+            },
+        )
+        if sirius_path:
+            self.logger.log("Logging in to SIRIUS...")
+            self.executor.run_command(
+                [
+                    sirius_path,
+                    "login",
+                    f"--email={self.params['sirius-user-email']}",
+                    f"--password={self.params['sirius-user-password']}",
+                ]
+            )
+            sirius_projects = [
+                Path(
+                    self.workflow_dir, "results", "sirius-projects", Path(file).stem
+                )
+                for file in sirius_ms_files
+            ]
+            commands = []
+            for ms, project in zip(sirius_ms_files, sirius_projects):
+                if Path(ms).stat().st_size > 0:
+                    command = [
+                        sirius_path,
+                        "--input",
+                        ms,
+                        "--project",
+                        str(project),
+                        "--no-compression",
+                        "--maxmz",
+                        self.params["sirius-maxmz"],
+                        "formula",
+                        "--db",
+                        self.params["sirius-db"],
+                        "--ions-considered",
+                        self.params["sirius-ions-considered"],
+                        "--elements-considered",
+                        self.params["sirius-elements-considered"],
+                        "--elements-enforced",
+                        self.params["sirius-elements-enforced"],
+                        "--ppm-max",
+                        self.params["sirius-ppm-max"],
+                        "--ppm-max-ms2",
+                        self.params["sirius-ppm-max-ms2"],
+                        "--profile",
+                        self.params["sirius-profile"],
+                        "--candidates",
+                        "1",
+                    ]
+                    if self.params["run-fingerid"] or self.params["run-canopus"]:
+                        command.append("fingerprint")
+                    if self.params["run-fingerid"]:
+                        command += [
+                            "structure",
+                            "--db",
+                            self.params["sirius-structure-db"],
+                        ]
+                    if self.params["run-canopus"]:
+                        command.append("canopus")
+                    command.append("write-summaries")
+                    commands.append(command)
+            if commands:
+                self.logger.log("Running SIRIUS... (might take a VERY long time)")
+                for command in commands:
+                    self.logger.log(f"Running file {Path(command[2]).stem}...")
+                    # Each file is a separate step, completed files are skipped when the workflow is resumed
+                    self.executor.run_command_step(
+                        command,
+                        inputs=[command[2]],
+                        outputs=[command[4]],
+                        create_output_dirs=True,
+                    )
+            else:
+                self.logger.log("No MS2 data for SIRIUS to process.")
+
     def results(self) -> None:
         # Set current results directory
         st.session_state.results_dir = Path(self.workflow_dir, "results")
@@ -10,6 +10,9 @@ from streamlit.components.v1 import html
 
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 try:
     from tkinter import Tk, filedialog
@@ -560,6 +563,72 @@ def load_parquet(file):
     else:
         return pd.DataFrame()
 
+@st.cache_resource(max_entries=10)
+def load_feature_index(file: Path, mtime: int) -> dict:
+    """Loads the row group index of a feature store (see feature_store.py in python-tools), by sample name."""
+    df = pd.read_parquet(file)
+    return {
+        sample: (group["first_id"].to_numpy(), group["last_id"].to_numpy(), group["row_group"].to_numpy())
+        for sample, group in df.groupby("sample")
+    }
+
+
+def load_chromatograms(store: Path, feature_ids: dict) -> pd.DataFrame:
+    """
+    Loads the chromatograms of features from a feature store (ffm-df or ffmid-df directory with one parquet file
+    per sample, sorted by feature ID as string).
+
+    The row group of each feature is looked up in the feature index, so that only one row group per sample is read.
+    Files without index entries (results of previous versions) are read completely. Chromatograms are NumPy arrays
+    viewing the Arrow buffers of the typed list columns, delta encoded retention times are decoded.
+
+    Args:
+        store (Path): The feature store directory.
+        feature_ids (dict): The feature ID to load by sample name.
+
+    Returns:
+        pd.DataFrame: The columns chrom_RT and chrom_intensity indexed by sample, samples without chromatogram are missing.
+    """
+    index_file = Path(Path(store).parent, "feature-index", Path(store).name + ".parquet")
+    index = load_feature_index(index_file, index_file.stat().st_mtime_ns) if index_file.exists() else {}
+    chroms = {}
+    for sample, feature_id in feature_ids.items():
+        # Feature IDs are stored as strings
+        feature_id = str(feature_id)
+        file = Path(store, sample + ".parquet")
+        if not file.exists():
+            continue
+        # Opened per call (not kept open in the app process), only the footer and one row group are read
+        with pq.ParquetFile(file) as parquet_file:
+            schema = parquet_file.schema_arrow
+            columns = [c for c in ["chrom_RT", "chrom_RT_delta", "chrom_intensity"] if c in schema.names]
+            if sample in index:
+                first_ids, last_ids, row_groups = index[sample]
+                i = np.searchsorted(first_ids, feature_id, side="right") - 1
+                if i < 0 or feature_id > last_ids[i]:
+                    continue
+                id_column = schema.pandas_metadata["index_columns"][0]
+                table = parquet_file.read_row_group(int(row_groups[i]), columns=[id_column] + columns)
+                row = pc.index(table[id_column], feature_id).as_py()
+                if row < 0:
+                    continue
+                chroms[sample] = {c: table[c][row].values.to_numpy() for c in columns}
+            else:
+                df = pd.read_parquet(file, columns=columns)
+                df.index = df.index.astype(str)
+                if feature_id not in df.index:
+                    continue
+                chroms[sample] = df.loc[feature_id].to_dict()
+        if "chrom_RT_delta" in chroms[sample]:
+            chroms[sample]["chrom_RT"] = np.cumsum(chroms[sample].pop("chrom_RT_delta"))
+    # Object columns with one array per sample
+    df = pd.DataFrame(index=list(chroms.keys()), columns=["chrom_RT", "chrom_intensity"], dtype=object)
+    for sample, chrom in chroms.items():
+        df.at[sample, "chrom_RT"] = chrom["chrom_RT"]
+        df.at[sample, "chrom_intensity"] = chrom["chrom_intensity"]
+    return df
+
+
 # General warning/error messages
 WARNINGS = {
     "missing-mzML": "Upload or select some mzML files first!",
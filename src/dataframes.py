@@ -3,7 +3,9 @@ import pandas as pd
 import numpy as np
 import os
 from pathlib import Path
+from collections import Counter
 from src.common.common import reset_directory
+from src.ms1annotation import annotate_ms1
 from pyteomics import mztab, mgf
 
 
@@ -193,36 +195,19 @@ class DataFrames():
         library = pd.read_csv(library_file, sep="\t")
         df.insert(2, "MS1 annotation", "")
 
-        df["mz"] = df["mz"].astype(float)
-
-        for _, std in library.iterrows():
-            delta_Da = abs(mz_window * std["mz"] / 1000000)
-            mz_lower = std["mz"] - delta_Da
-            mz_upper = std["mz"] + delta_Da
-            rt_lower = std["RT"] - rt_window / 2
-            rt_upper = std["RT"] + rt_window / 2
-            match = df.query(
-                "mz > @mz_lower and mz < @mz_upper and RT > @rt_lower and RT < @rt_upper"
-            )
-            if not match.empty:
-                for _, row in match.iterrows():
-                    if len(df.loc[df["id"] == row["id"], "MS1 annotation"]) > 1:
-                        df.loc[df["id"] == row["id"], "MS1 annotation"] += (
-                            ";" + std["name"]
-                        )
-                    else:
-                        df.loc[df["id"] == row["id"],
-                               "MS1 annotation"] += std["name"]
+        df["MS1 annotation"] = annotate_ms1(df, library, mz_window, rt_window)
 
         # replace generic metabolite name with actual MS1 annotation
         metabolites = []
+        counts = Counter()
         for x, y in zip(df["metabolite"], df["MS1 annotation"]):
-            if y and y not in metabolites:
+            if y and not counts[y]:
                 metabolites.append(y)
-            elif y and y in metabolites:
-                metabolites.append(y + f"_{metabolites.count(y)}")
+            elif y:
+                metabolites.append(y + f"_{counts[y]}")
             else:
                 metabolites.append(x)
+            counts[metabolites[-1]] += 1
         df["metabolite"] = metabolites
         df.to_csv(df_file, sep="\t", index=False)
 
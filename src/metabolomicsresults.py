@@ -10,7 +10,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 from itertools import cycle
 
-from src.common.common import show_fig, load_parquet
+from src.common.common import show_fig, load_parquet, load_chromatograms
 
 COLOR_SCALE = [
     (0.00, "rgba(233, 233, 233, 1.0)"),
@@ -193,26 +193,25 @@ def get_chroms_for_each_sample(metabolite):
     all_samples = [
         i.replace(".mzML", "") for i in metabolite.index if i.endswith("mzML")
     ]
-    dfs = []
-    for sample in all_samples:
-        # Get feature ID for sample
-        fid = metabolite[sample + ".mzML_IDs"]
-        path = Path(
+    # Feature ID for each sample
+    fids = {
+        sample: metabolite[sample + ".mzML_IDs"]
+        for sample in all_samples
+        if pd.notna(metabolite[sample + ".mzML_IDs"])
+    }
+    chroms = load_chromatograms(
+        Path(
             st.session_state.results_dir,
             "ffmid-df" if metabolite["re-quantified"] else "ffm-df",
-            sample + ".parquet",
-        )
-        f_df = load_parquet(path)
-        if fid in f_df.index:
-            f_df = f_df.loc[[fid]]
-            f_df["sample"] = [sample]
-            dfs.append(f_df.loc[[fid]])
-        else:
-            dfs.append(pd.DataFrame({"sample": [sample], "chrom_RT": [None], "chrom_intensity": [None]}))
-
-    if not dfs:
+        ),
+        fids,
+    )
+    if not all_samples:
         return pd.DataFrame()
-    df = pd.concat(dfs)
+    # Samples without chromatogram are kept (no trace in the plot)
+    df = chroms.reindex(all_samples)
+    df = df.astype(object).where(df.notna(), None)
+    df.insert(0, "sample", all_samples)
     return df
 
 
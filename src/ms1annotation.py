@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+
+def annotate_ms1(features: pd.DataFrame, library: pd.DataFrame, mz_tolerance: float, rt_window: float) -> pd.Series:
+    """
+    Annotates features with the names of library entries within an m/z tolerance and retention time window.
+
+    Features are sorted by m/z once, the m/z window of each library entry is located with a binary search
+    (searchsorted) and the candidates within it are filtered by retention time, all vectorised over the library.
+
+    Args:
+        features (pd.DataFrame): Features with columns "mz" and "RT" (seconds).
+        library (pd.DataFrame): Library with columns "name", "mz" and "RT" (seconds).
+        mz_tolerance (float): m/z tolerance in ppm.
+        rt_window (float): Retention time window in seconds, centered around the library RT.
+
+    Returns:
+        pd.Series: Names of all matching library entries (in library order, separated by ";") for each feature,
+            an empty string for features without match. Same index as features.
+    """
+    mz = features["mz"].to_numpy(dtype=float)
+    rt = features["RT"].to_numpy(dtype=float)
+    order = np.argsort(mz, kind="stable")
+    mz_sorted = mz[order]
+
+    library_mz = library["mz"].to_numpy(dtype=float)
+    library_rt = library["RT"].to_numpy(dtype=float)
+    delta = np.abs(mz_tolerance * library_mz / 1000000)
+    # Positions of the first and after the last feature strictly within each m/z window
+    start = np.searchsorted(mz_sorted, library_mz - delta, side="right")
+    end = np.searchsorted(mz_sorted, library_mz + delta, side="left")
+    counts = np.maximum(end - start, 0)
+
+    # One candidate pair (library entry, feature) per feature in the m/z window of a library entry
+    library_index = np.repeat(np.arange(len(library)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    feature_index = order[np.repeat(start, counts) + offsets]
+    in_rt_window = (rt[feature_index] > library_rt[library_index] - rt_window / 2) & (
+        rt[feature_index] < library_rt[library_index] + rt_window / 2
+    )
+
+    matches = pd.DataFrame(
+        {"feature": feature_index[in_rt_window], "library": library_index[in_rt_window]}
+    ).sort_values(["feature", "library"])
+    names = (
+        pd.Series(library["name"].astype(str).to_numpy()[matches["library"].to_numpy()])
+        .groupby(matches["feature"].to_numpy())
+        .agg(";".join)
+    )
+    annotations = np.full(len(features), "", dtype=object)
+    annotations[names.index.to_numpy()] = names.to_numpy()
+    return pd.Series(annotations, index=features.index)
@@ -4,6 +4,10 @@ from pathlib import Path
 import zipfile
 import pandas as pd
 
+# The annotation engine is shared with the app (repository root is not on the path if run as script)
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.ms1annotation import annotate_ms1
+
 ############################
 # default paramter values #
 ###########################
@@ -26,6 +30,7 @@ import pandas as pd
 DEFAULTS = [
     {"key": "in", "value": [], "help": "Feature Matrix parquet file", "hide": True},
     {"key": "in_lib", "value": "", "help": "MS1 library for annotation", "hide": True},
+    {"key": "out_tsv", "value": [], "help": "feature matrix tsv file (default: parquet file path with .tsv suffix)", "hide": True},
     {"key": "ms1-annotation-rt-window", "name": "RT window for annotation", "value": 10, "min": 1, "max": 240, "step_size": 5, "help": "Checks around peak apex, e.g. window of 60 s will check left and right 30 s."},
     {"key": "ms1-annotation-mz-tolerance", "name": "m/z tolerance in ppm", "value": 10, "min": 1, "max": 100, "step_size": 5, "help": "Select m/z tolerance for MS1 feature annotation."}    
 ]
@@ -37,34 +42,22 @@ def get_params():
     else:
         return {}
 
-if __name__ == "__main__":
-    params = get_params()
+def main(params: dict) -> None:
     # Add code here:
     df = pd.read_parquet(params["in"][0])
     library = pd.read_csv(params["in_lib"], sep="\t")
     df.insert(2, "MS1 annotation", "")
 
-    df["mz"] = df["mz"].astype(float)
+    df["MS1 annotation"] = annotate_ms1(
+        df,
+        library,
+        params["ms1-annotation-mz-tolerance"],
+        params["ms1-annotation-rt-window"],
+    )
 
-    for _, std in library.iterrows():
-        delta_Da = abs(params["ms1-annotation-mz-tolerance"] * std["mz"] / 1000000)
-        mz_lower = std["mz"] - delta_Da
-        mz_upper = std["mz"] + delta_Da
-        rt_lower = std["RT"] - params["ms1-annotation-rt-window"] / 2
-        rt_upper = std["RT"] + params["ms1-annotation-rt-window"] / 2
-        match = df.query(
-            "mz > @mz_lower and mz < @mz_upper and RT > @rt_lower and RT < @rt_upper"
-        )
-        if not match.empty:
-            for _, row in match.iterrows():
-                if len(df.loc[df["metabolite"] == row["metabolite"], "MS1 annotation"]) > 1:
-                    df.loc[df["metabolite"] == row["metabolite"], "MS1 annotation"] += (
-                        ";" + std["name"]
-                    )
-                else:
-                    df.loc[df["metabolite"] == row["metabolite"],
-                            "MS1 annotation"] += std["name"]
+    df.to_parquet(params["in"][0])
+    df.to_csv(params["out_tsv"][0] if params.get("out_tsv") else Path(params["in"][0]).with_suffix(".tsv"), sep="\t")
 
 
-    df.to_parquet(params["in"][0])
-    df.to_csv(Path(params["in"][0]).with_suffix(".tsv"), sep="\t")
\ No newline at end of file
+if __name__ == "__main__":
+    main(get_params())
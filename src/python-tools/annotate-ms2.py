@@ -41,6 +41,7 @@ DEFAULTS = [
     },
     {"key": "in_mgf", "value": [], "help": "GNPS mgf file", "hide": True},
     {"key": "out", "value": [""], "help": "feature matrix parquet file", "hide": True},
+    {"key": "out_tsv", "value": [], "help": "feature matrix tsv file (default: parquet file path with .tsv suffix)", "hide": True},
 ]
 
 
@@ -58,16 +59,23 @@ def get_params():
         }
 
 
-if __name__ == "__main__":
-    params = get_params()
+def main(params: dict) -> None:
 
-    # MzML file with MS2 spectra
+    # MzML file with MS2 spectra: scan numbers by native ID (peaks are not needed)
     exp = MSExperiment()
-    MzMLFile().load(params["in_mzML"][0], exp)
-    df = exp.get_df()
-    df["index"] = [spec.getNativeID() for spec in exp]
-    df["SCANS"] = [spec.getMetaValue("Scan_ID") for spec in exp]
-    df["index"] = df["index"].str.replace(r"index=", "")
+    mzml_file = MzMLFile()
+    options = mzml_file.getOptions()
+    options.setFillData(False)
+    mzml_file.setOptions(options)
+    mzml_file.load(params["in_mzML"][0], exp)
+    spectra = pd.DataFrame(
+        {
+            "native_id": [spec.getNativeID() for spec in exp],
+            "SCANS": [f"{spec.getMetaValue('Scan_ID')}" for spec in exp],
+        }
+    )
+    spectra["native_id"] = spectra["native_id"].str.replace(r"index=", "")
+    spectra = spectra.drop_duplicates()
 
     # MGF File
     file = mgf.MGF(
@@ -92,81 +100,52 @@ if __name__ == "__main__":
     spectralmatch = pyteomics.mztab.MzTab(
         params["in_mzTab"][0], encoding="UTF8", table_format="df"
     )
-    spectralmatch.metadata
     spectralmatch_DF = spectralmatch.small_molecule_table
     spectralmatch_DF["opt_spec_native_id"] = spectralmatch_DF[
         "opt_spec_native_id"
     ].str.replace(r"index=", "")
-    
-    # Add Scan numbers to spectral match DF
-    spectralmatch_DF["SCANS"] = ""
-    for i, idx in zip(spectralmatch_DF.index, spectralmatch_DF["opt_spec_native_id"]):
-        hits = []
-        for (
-            index,
-            scan_number,
-        ) in zip(df["index"], df["SCANS"]):
-            if idx == index:
-                hit = f"{scan_number}"
-                if hit not in hits:
-                    hits.append(hit)
-        spectralmatch_DF.loc[i, "SCANS"] = " ## ".join(hits)
-
-    # Add Scan numbers to feature DF
-    scan_map = {}
-    for metabolite, consensus_id in zip(DF_features.index, DF_features["consensus_feature_id"].astype(str)):
-        hits = []
-        for scan, mgf_id in zip(mgf_file["scans"], mgf_file["feature_id"]):
-            if consensus_id == mgf_id:
-                if metabolite in scan_map.keys():
-                    scan_map[metabolite].append(scan)
-                scan_map[metabolite] = [scan]
-    
+
+    # Spectral matches with scan numbers (joined on native ID), in order of the mzTab file
+    matches = pd.DataFrame(
+        {
+            "match": range(len(spectralmatch_DF)),
+            "native_id": spectralmatch_DF["opt_spec_native_id"].to_numpy(),
+            "SpectralMatch": spectralmatch_DF["description"].astype(str).to_numpy(),
+            "SpectralMatch_smiles": spectralmatch_DF["smiles"].astype(str).to_numpy(),
+            "SpectralMatch_ppm_error": spectralmatch_DF["opt_ppm_error"].astype(str).to_numpy(),
+            "SpectralMatch_score": spectralmatch_DF["opt_match_score"].astype(str).to_numpy(),
+        }
+    ).merge(spectra, on="native_id")
+
+    # Scan numbers of features (joined on consensus feature ID, all MS2 scans of a feature)
+    feature_scans = pd.DataFrame(
+        {
+            "metabolite": DF_features.index,
+            "feature_id": DF_features["consensus_feature_id"].astype(str).to_numpy(),
+        }
+    ).merge(mgf_file[["feature_id", "scans"]].rename(columns={"scans": "SCANS"}), on="feature_id")
+
+    # Spectral matches of features (joined on scan number), each match only once per feature
+    hits = (
+        feature_scans.merge(matches, on="SCANS")
+        .drop_duplicates(["metabolite", "match"])
+        .sort_values("match")
+    )
+    columns = ["SpectralMatch", "SpectralMatch_smiles", "SpectralMatch_ppm_error", "SpectralMatch_score"]
+    hits = hits.groupby("metabolite", sort=False)[columns].agg(" ## ".join)
+
     # Output Feature Matrix
     DF_features = pd.read_parquet(params["out"][0])
-
-    scans = []
-    for metabolite in DF_features.index:
-        if metabolite in scan_map:
-            scans.append(scan_map[metabolite])
-        else:
-            scans.append([])
-    DF_features["SCANS"] = scans
-
-    DF_features["SpectralMatch"] = ""
-    DF_features["SpectralMatch_smiles"] = ""
-
-    for i, scans in zip(DF_features.index, DF_features["SCANS"]):
-        hits_name = []
-        hits_smiles = []
-        hits_ppm_error = []
-        hits_score = []
-        for (
-            name,
-            smiles,
-            scan_number,
-            ppm_error,
-            score
-        ) in zip(
-            spectralmatch_DF["description"],
-            spectralmatch_DF["smiles"],
-            spectralmatch_DF["SCANS"],
-            spectralmatch_DF["opt_ppm_error"],
-            spectralmatch_DF["opt_match_score"]
-        ):
-            if scan_number in scans:
-                hits_name.append(str(name))
-                hits_smiles.append(str(smiles))
-                hits_ppm_error.append(str(ppm_error))
-                hits_score.append(str(score))
-        DF_features.loc[i, "SpectralMatch"] = " ## ".join(hits_name)
-        DF_features.loc[i, "SpectralMatch_smiles"] = " ## ".join(hits_smiles)
-        DF_features.loc[i, "SpectralMatch_ppm_error"] = " ## ".join(hits_ppm_error)
-        DF_features.loc[i, "SpectralMatch_score"] = " ## ".join(hits_score)
-    
-    DF_features = DF_features.drop(columns=["SCANS"])
+    for column in columns:
+        DF_features[column] = DF_features.index.map(hits[column]).fillna("")
 
     DF_features.to_csv(
-        Path(params["out"][0]).with_suffix(".tsv"), sep="\t", index=False
+        params["out_tsv"][0] if params.get("out_tsv") else Path(params["out"][0]).with_suffix(".tsv"),
+        sep="\t",
+        index=False,
     )
     DF_features.to_parquet(params["out"][0])
+
+
+if __name__ == "__main__":
+    main(get_params())
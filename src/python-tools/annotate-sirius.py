@@ -24,6 +24,7 @@ import pandas as pd
 
 DEFAULTS = [
     {"key": "in", "value": [], "help": "Feature Matrix parquet file", "hide": True},
+    {"key": "out_tsv", "value": [], "help": "feature matrix tsv file (default: parquet file path with .tsv suffix)", "hide": True},
 ]
 
 def get_params():
@@ -33,8 +34,7 @@ def get_params():
     else:
         return {}
 
-if __name__ == "__main__":
-    params = get_params()
+def main(params: dict) -> None:
     # Add code here:
     df = pd.read_parquet(params["in"][0])
     sirius_projects_dir = Path(Path(params["in"][0]).parent.parent, "sirius-projects")
@@ -73,4 +73,8 @@ if __name__ == "__main__":
                             )
 
         df.to_parquet(params["in"][0])
-        df.to_csv(Path(params["in"][0]).with_suffix(".tsv"), sep="\t")
\ No newline at end of file
+        df.to_csv(params["out_tsv"][0] if params.get("out_tsv") else Path(params["in"][0]).with_suffix(".tsv"), sep="\t")
+
+
+if __name__ == "__main__":
+    main(get_params())
@@ -59,9 +59,12 @@ def get_params():
     else:
         return {}
 
-if __name__ == "__main__":
-    params = get_params()
+def main(params: dict) -> None:
     # Add code here:
     print("Writing stdout which will get logged...")
     print("Parameters for this example Python tool:")
-    print(json.dumps(params, indent=4))
\ No newline at end of file
+    print(json.dumps(params, indent=4))
+
+
+if __name__ == "__main__":
+    main(get_params())
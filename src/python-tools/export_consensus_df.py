@@ -26,7 +26,8 @@ import numpy as np
 
 DEFAULTS = [
     {"key": "in", "value": [], "help": "consensusXML file", "hide": True},
-    {"key": "out", "value": [], "help": "consensus df parquet file", "hide": True}
+    {"key": "out", "value": [], "help": "consensus df parquet file", "hide": True},
+    {"key": "out_tsv", "value": [], "help": "consensus df tsv file (default: parquet file path with .tsv suffix)", "hide": True}
 ]
 
 def get_params():
@@ -36,8 +37,7 @@ def get_params():
     else:
         return {}
 
-if __name__ == "__main__":
-    params = get_params()
+def main(params: dict) -> None:
     # Add code here:
     consensus_map = poms.ConsensusMap()
     poms.ConsensusXMLFile().load(params["in"][0], consensus_map)
@@ -104,4 +104,8 @@ if __name__ == "__main__":
     path = Path(params["out"][0])
     df.to_parquet(path)
     # save additionally as tsv file
-    df.to_csv(path.with_suffix(".tsv"), sep="\t")
\ No newline at end of file
+    df.to_csv(params["out_tsv"][0] if params.get("out_tsv") else path.with_suffix(".tsv"), sep="\t")
+
+
+if __name__ == "__main__":
+    main(get_params())
@@ -3,6 +3,7 @@ import sys
 import pyopenms as poms
 from pathlib import Path
 import numpy as np
+from feature_store import write_feature_df, write_feature_index, process_pool
 
 ############################
 # default paramter values #
@@ -25,6 +26,21 @@ import numpy as np
 
 DEFAULTS = [
     {"key": "in", "value": [], "help": "ffm featureXML dir", "hide": True},
+    {
+        "key": "delta-RT",
+        "value": False,
+        "name": "delta encode chromatogram RTs",
+        "help": "Store chromatogram retention times as differences to the previous value (smaller files for regular scan intervals).",
+        "advanced": True,
+    },
+    {
+        "key": "threads",
+        "value": 4,
+        "name": "threads",
+        "help": "Maximum number of feature maps exported in parallel processes (each occupies one of the process slots of the workflow).",
+        "min": 1,
+        "advanced": True,
+    },
 ]
 
 def get_params():
@@ -34,56 +50,70 @@ def get_params():
     else:
         return {}
 
-if __name__ == "__main__":
-    params = get_params()
+def get_chromatogram_index(exp: poms.MSExperiment) -> dict:
+    """Indexes the mass trace chromatograms (native ID "<feature id>_<isotope>") by feature id and isotope."""
+    index = {}
+    for chrom in exp.getChromatograms():
+        feature_id, isotope = chrom.getNativeID().split("_")[:2]
+        index[(int(feature_id), int(isotope))] = chrom
+    return index
+
+def export_feature_map(file: Path, out_path: Path, delta_rt: bool):
+    fm = poms.FeatureMap()
+    poms.FeatureXMLFile().load(str(file), fm)
+    # Get DataFrame with meta values
+    df = fm.get_df(export_peptide_identifications=False,
+                meta_values=[b"num_of_masstraces", 
+                                b"dc_charge_adducts",
+                                b"FWHM"])
+    # Read in chromatogram values
+    chrom_path = Path(file.parent.parent, "ffm-chroms", file.stem + ".mzML")
+    exp = poms.MSExperiment()
+    poms.MzMLFile().load(str(chrom_path), exp)
+    chroms = get_chromatogram_index(exp)
+    # Get chrom data of the monoisotopic mass trace for each feature (empty if missing)
+    rts = []
+    intys = []
+    for f in fm:
+        chrom = chroms.get((f.getUniqueId(), 0))
+        if chrom is None:
+            rts.append(np.empty(0))
+            intys.append(np.empty(0, dtype=np.int64))
+            continue
+        chrom_rts, chrom_intys = chrom.get_peaks()
+        rts.append(chrom_rts)
+        intys.append(chrom_intys.astype(np.int64))
+
+    df["chrom_RT"] = rts
+    df["chrom_intensity"] = intys
+    
+    df = df.rename(columns={
+        "dc_charge_adducts": "adduct",
+    })
+    
+    df["FWHM"] = df["FWHM"].astype(float)
+
+    df.insert(12, "metabolite", df.apply(lambda x: f"{round(x['mz'], 4)}@{round(x['RT'], 2)}@{x['adduct']}", axis=1))
+
+    df["re-quantified"] = False
+
+    df["quality ranked"] = np.linspace(0, 1, len(df))  # Generate ranks
+
+    # Rows are stored sorted by feature ID, the rank is kept as column
+    return write_feature_df(df, Path(out_path, file.stem + ".parquet"), delta_rt)
+
+def main(params: dict) -> None:
     # Add code here:
     out_path = Path(Path(params["in"][0]).parent.parent, "ffm-df")
     if not out_path.exists():
         out_path.mkdir(exist_ok=True)
-    for file in Path(params["in"][0]).parent.glob("*.featureXML"):
-        fm = poms.FeatureMap()
-        poms.FeatureXMLFile().load(str(file), fm)
-        # Get DataFrame with meta values
-        df = fm.get_df(export_peptide_identifications=False,
-                    meta_values=[b"num_of_masstraces", 
-                                    b"dc_charge_adducts",
-                                    b"FWHM"])
-        # Read in chromatogram values
-        chrom_path = Path(file.parent.parent, "ffm-chroms", file.stem + ".mzML")
-        exp = poms.MSExperiment()
-        poms.MzMLFile().load(str(chrom_path), exp)
-        chroms = exp.getChromatograms()
-        # Collect all chromatogram data in two arrays with dicts
-        rts = []
-        intys = []
-        # Get chrom data for each feature
-        for f in fm:
-            f_chroms = [c for c in chroms if int(c.getNativeID().split("_")[0]) == f.getUniqueId()]
-            tmp_rt = []
-            tmp_inty = []
-            for fc in f_chroms:
-                iso = int(fc.getNativeID().split("_")[1])
-                if iso == 0:
-                    chrom_rts, chrom_intys = fc.get_peaks()
-                    rts.append(chrom_rts)
-                    intys.append(chrom_intys)
-
-        df["chrom_RT"] = rts
-        df["chrom_intensity"] = [[int(i) for i in chrom_int] for chrom_int in intys]
-        
-        df = df.rename(columns={
-            "dc_charge_adducts": "adduct",
-        })
-        
-        df["FWHM"] = df["FWHM"].astype(float)
+    files = list(Path(params["in"][0]).parent.glob("*.featureXML"))
+    # Feature maps are exported independently of each other in parallel processes
+    with process_pool(len(files), params["threads"], Path(out_path.parent.parent, "pids")) as pool:
+        futures = [pool.submit(export_feature_map, file, out_path, params["delta-RT"]) for file in files]
+        index = [future.result() for future in futures]
+    write_feature_index(index, out_path)
 
-        df.insert(12, "metabolite", df.apply(lambda x: f"{round(x['mz'], 4)}@{round(x['RT'], 2)}@{x['adduct']}", axis=1))
 
-        df["re-quantified"] = False
-
-        df["quality ranked"] = np.linspace(0, 1, len(df))  # Generate ranks
-        
-        df = df.sort_values("quality ranked", ascending=False)
-
-        df.to_parquet(Path(out_path, file.stem + ".parquet"))
-        
\ No newline at end of file
+if __name__ == "__main__":
+    main(get_params())
@@ -3,6 +3,7 @@ import sys
 import pyopenms as poms
 from pathlib import Path
 import numpy as np
+from feature_store import write_feature_df, write_feature_index, process_pool
 
 ############################
 # default paramter values #
@@ -25,6 +26,21 @@ import numpy as np
 
 DEFAULTS = [
     {"key": "in", "value": [], "help": "ffmid featureXML dir", "hide": True},
+    {
+        "key": "delta-RT",
+        "value": False,
+        "name": "delta encode chromatogram RTs",
+        "help": "Store chromatogram retention times as differences to the previous value (smaller files for regular scan intervals).",
+        "advanced": True,
+    },
+    {
+        "key": "threads",
+        "value": 4,
+        "name": "threads",
+        "help": "Maximum number of feature maps exported in parallel processes (each occupies one of the process slots of the workflow).",
+        "min": 1,
+        "advanced": True,
+    },
 ]
 
 def get_params():
@@ -34,43 +50,54 @@ def get_params():
     else:
         return {}
 
-if __name__ == "__main__":
-    params = get_params()
+def export_feature_map(file: Path, out_path: Path, delta_rt: bool):
+    fm = poms.FeatureMap()
+    poms.FeatureXMLFile().load(str(file), fm)
+    # Get DataFrame with meta values
+    df = fm.get_df(export_peptide_identifications=False,
+                meta_values=[b"num_of_masstraces", 
+                                b"dc_charge_adducts",
+                                b"model_FWHM",
+                                b"label"])
+    
+    rts = []
+    intys = []
+
+    # Convex hull of the first mass trace as chromatogram, hull points are a (n, 2) array of RT and intensity
+    for f in fm:
+        points = f.getSubordinates()[0].getConvexHulls()[0].getHullPoints()
+        rts.append(points[:, 0])
+        intys.append(points[:, 1].astype(np.int64))
+    df["chrom_RT"] = rts
+    df["chrom_intensity"] = intys
+
+    df = df.rename(columns={
+        "model_FWHM": "FWHM",
+        "dc_charge_adducts": "adduct",
+        "label": "metabolite"
+    })
+    
+    df["FWHM"] = df["FWHM"].astype(float)
+    
+    df["re-quantified"] = True
+    
+    df["quality ranked"] = np.linspace(0, 1, len(df))  # Generate ranks
+
+    # Rows are stored sorted by feature ID, the rank is kept as column
+    return write_feature_df(df, Path(out_path, file.stem + ".parquet"), delta_rt)
+
+def main(params: dict) -> None:
     # Add code here:
     out_path = Path(Path(params["in"][0]).parent.parent, "ffmid-df")
     if not out_path.exists():
         out_path.mkdir(exist_ok=True)
-    for file in Path(params["in"][0]).parent.glob("*.featureXML"):
-        fm = poms.FeatureMap()
-        poms.FeatureXMLFile().load(str(file), fm)
-        # Get DataFrame with meta values
-        df = fm.get_df(export_peptide_identifications=False,
-                    meta_values=[b"num_of_masstraces", 
-                                    b"dc_charge_adducts",
-                                    b"model_FWHM",
-                                    b"label"])
-        
-        rts = []
-        intys = []
-
-        for f in fm:
-            rts.append([float(x[0]) for x in f.getSubordinates()[0].getConvexHulls()[0].getHullPoints()])
-            intys.append([int(y[1]) for y in f.getSubordinates()[0].getConvexHulls()[0].getHullPoints()])
-        df["chrom_RT"] = rts
-        df["chrom_intensity"] = [[int(i) for i in chrom_int] for chrom_int in intys]
+    files = list(Path(params["in"][0]).parent.glob("*.featureXML"))
+    # Feature maps are exported independently of each other in parallel processes
+    with process_pool(len(files), params["threads"], Path(out_path.parent.parent, "pids")) as pool:
+        futures = [pool.submit(export_feature_map, file, out_path, params["delta-RT"]) for file in files]
+        index = [future.result() for future in futures]
+    write_feature_index(index, out_path)
 
-        df = df.rename(columns={
-            "model_FWHM": "FWHM",
-            "dc_charge_adducts": "adduct",
-            "label": "metabolite"
-        })
-        
-        df["FWHM"] = df["FWHM"].astype(float)
-        
-        df["re-quantified"] = True
-        
-        df["quality ranked"] = np.linspace(0, 1, len(df))  # Generate ranks
-        
-        df = df.sort_values("quality ranked", ascending=False)
 
-        df.to_parquet(Path(out_path, file.stem + ".parquet"))
\ No newline at end of file
+if __name__ == "__main__":
+    main(get_params())
@@ -0,0 +1,116 @@
+"""
+Helpers for the per-sample feature DataFrames (ffm-df and ffmid-df) shared by the export tools (not a tool itself).
+
+Each directory is a feature store partitioned by sample: one parquet file per sample, sorted by feature ID and
+split into row groups of ROW_GROUP_SIZE features. The first and last feature ID of each row group are written to
+an index (feature-index/<store>.parquet), so that single features can be read without loading complete files.
+
+Feature IDs are stored as strings and sorted as strings (e.g. "10" before "9"), readers have to look up row groups
+with string comparisons as well (see load_chromatograms in src/common/common.py).
+"""
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Features per row group, the smallest unit read from a sample file
+ROW_GROUP_SIZE = 1024
+
+
+def _register_process(pid_dir: str, started: multiprocessing.SimpleQueue) -> None:
+    # Registered like the commands of the workflow, so that the process is killed when the workflow is stopped,
+    # and in the started queue, so that the process id is removed again when the pool is shut down
+    if Path(pid_dir).is_dir():
+        Path(pid_dir, str(os.getpid())).touch()
+        started.put(os.getpid())
+
+
+@contextmanager
+def process_pool(n_tasks: int, threads: int, pid_dir: Path):
+    """
+    Context manager for a process pool exporting feature maps in parallel, with at most as many processes as
+    process slots granted to the tool (threads) and available CPU cores. Process ids are registered in the
+    pid directory of the workflow while the pool is running.
+
+    Yields:
+        ProcessPoolExecutor: The process pool.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        n_cores = len(os.sched_getaffinity(0))
+    else:
+        n_cores = os.cpu_count() or 1
+    context = multiprocessing.get_context()
+    started = context.SimpleQueue()
+    pool = ProcessPoolExecutor(
+        max_workers=max(1, min(n_tasks, threads, n_cores)),
+        mp_context=context,
+        initializer=_register_process,
+        initargs=(str(pid_dir), started),
+    )
+    try:
+        yield pool
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        while not started.empty():
+            Path(pid_dir, str(started.get())).unlink(missing_ok=True)
+        started.close()
+
+
+def to_list_array(arrays: list) -> pa.ListArray:
+    """Concatenates arrays into an Arrow list<float32> array, with all values in one contiguous buffer."""
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int32)
+    np.cumsum([len(a) for a in arrays], out=offsets[1:])
+    values = np.concatenate(arrays).astype(np.float32) if arrays else np.empty(0, dtype=np.float32)
+    return pa.ListArray.from_arrays(pa.array(offsets), pa.array(values))
+
+
+def write_feature_df(df: pd.DataFrame, path: Path, delta_rt: bool) -> pd.DataFrame:
+    """
+    Writes a feature DataFrame with chromatograms (chrom_RT and chrom_intensity, one array per feature) to parquet,
+    sorted by feature ID (index, converted to string) in row groups of ROW_GROUP_SIZE features. The row order of df
+    is not kept.
+
+    Chromatograms are stored as typed list<float32> columns with byte stream split encoding (compresses much better
+    than plain floats). With delta_rt, retention times are stored as differences to the previous value in column
+    chrom_RT_delta instead (smaller for regular scan intervals).
+
+    Returns:
+        pd.DataFrame: Index entries of the file: sample, row_group, first_id and last_id.
+    """
+    df.index = df.index.astype(str)
+    df = df.sort_index()
+    chroms = {"chrom_RT": df.pop("chrom_RT").tolist(), "chrom_intensity": df.pop("chrom_intensity").tolist()}
+    if delta_rt:
+        chroms["chrom_RT_delta"] = [np.diff(rt, prepend=0) for rt in chroms.pop("chrom_RT")]
+    table = pa.Table.from_pandas(df)
+    for name, arrays in chroms.items():
+        table = table.append_column(name, to_list_array(arrays))
+    pq.write_table(
+        table,
+        path,
+        row_group_size=ROW_GROUP_SIZE,
+        use_dictionary=[name for name in table.column_names if name not in chroms],
+        use_byte_stream_split=[f"{name}.list.element" for name in chroms],
+    )
+    starts = np.arange(0, len(df), ROW_GROUP_SIZE)
+    return pd.DataFrame(
+        {
+            "sample": Path(path).stem,
+            "row_group": np.arange(len(starts), dtype=np.int32),
+            "first_id": df.index[starts],
+            "last_id": df.index[np.minimum(starts + ROW_GROUP_SIZE, len(df)) - 1],
+        }
+    )
+
+
+def write_feature_index(index: list[pd.DataFrame], store: Path) -> None:
+    """Writes the index entries of all sample files in a feature store (see write_feature_df)."""
+    path = Path(store.parent, "feature-index", store.name + ".parquet")
+    path.parent.mkdir(exist_ok=True)
+    df = pd.concat(index) if index else pd.DataFrame(columns=["sample", "row_group", "first_id", "last_id"])
+    df.sort_values(["sample", "row_group"]).to_parquet(path, index=False)
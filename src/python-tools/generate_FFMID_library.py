@@ -25,7 +25,8 @@ import pandas as pd
 DEFAULTS = [
     {"key": "in", "value": [], "help": "feature matrix parquet", "hide": True},
     {"key": "out", "value": [], "help": "FFMID library tsv file", "hide": True},
-    {"key": "out_ffm", "value": [], "help": "feature matrix with complete consensus features parquet file", "hide": True}
+    {"key": "out_ffm", "value": [], "help": "feature matrix with complete consensus features parquet file", "hide": True},
+    {"key": "out_ffm_tsv", "value": [], "help": "feature matrix with complete consensus features tsv file (default: parquet file path with .tsv suffix)", "hide": True}
 ]
 
 def get_params():
@@ -35,8 +36,7 @@ def get_params():
     else:
         return {}
 
-if __name__ == "__main__":
-    params = get_params()
+def main(params: dict) -> None:
     # Add code here:
     df = pd.read_parquet(params["in"][0])
     # Select columns ending with ".mzML"
@@ -45,7 +45,10 @@ if __name__ == "__main__":
     mask = (mzml_columns == 0).any(axis=1)
     # Keep the consensus features which don't have to be re-quantified
     df[~mask].to_parquet(params["out_ffm"][0])
-    df[~mask].to_csv(Path(params["out_ffm"][0]).with_suffix(".tsv"), sep="\t")
+    df[~mask].to_csv(
+        params["out_ffm_tsv"][0] if params.get("out_ffm_tsv") else Path(params["out_ffm"][0]).with_suffix(".tsv"),
+        sep="\t",
+    )
     # Filter the DataFrame using this mask
     df = df[mask]
 
@@ -62,4 +65,7 @@ if __name__ == "__main__":
         }
     )
     lib.to_csv(params["out"][0], sep="\t", index=False)
-    
\ No newline at end of file
+
+
+if __name__ == "__main__":
+    main(get_params())
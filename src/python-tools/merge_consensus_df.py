@@ -24,7 +24,8 @@ from pathlib import Path
 
 DEFAULTS = [
     {"key": "in", "value": [], "help": "consensus df ffm complete, consensus df ffmid", "hide": True},
-    {"key": "out", "value": [], "help": "consensus df merged parquet file", "hide": True}
+    {"key": "out", "value": [], "help": "consensus df merged parquet file", "hide": True},
+    {"key": "out_tsv", "value": [], "help": "consensus df merged tsv file (default: parquet file path with .tsv suffix)", "hide": True}
 ]
 
 def get_params():
@@ -34,8 +35,7 @@ def get_params():
     else:
         return {}
 
-if __name__ == "__main__":
-    params = get_params()
+def main(params: dict) -> None:
     # Add code here:
     df_ffm = pd.read_parquet(params["in"][0])
     df_ffmid = pd.read_parquet(params["in"][1])
@@ -48,4 +48,8 @@ if __name__ == "__main__":
     path = Path(params["out"][0])
     df.to_parquet(path)
     # save additionally as tsv file
-    df.to_csv(path.with_suffix(".tsv"), sep="\t")
\ No newline at end of file
+    df.to_csv(params["out_tsv"][0] if params.get("out_tsv") else path.with_suffix(".tsv"), sep="\t")
+
+
+if __name__ == "__main__":
+    main(get_params())
@@ -34,8 +34,7 @@ def get_params():
     else:
         return {}
 
-if __name__ == "__main__":
-    params = get_params()
+def main(params: dict) -> None:
     # Add code here:
     in_path = params["in"][0]
     # output directory for merged dfs
@@ -65,8 +64,13 @@ if __name__ == "__main__":
                 Path(file).stem + ".parquet",
             )
         )
-        # Concat both dataframes
-        df_merged = pd.concat([df_ffm, df_ffmid])
+        # Concat both dataframes, each in quality ranked order (files are stored sorted by feature ID)
+        df_merged = pd.concat(
+            [
+                df_ffm.sort_values("quality ranked", ascending=False),
+                df_ffmid.sort_values("quality ranked", ascending=False),
+            ]
+        )
 
         # Save dataframe
         df_merged.to_parquet(
@@ -75,3 +79,7 @@ if __name__ == "__main__":
                 Path(file).stem + ".parquet",
             )
         )
+
+
+if __name__ == "__main__":
+    main(get_params())
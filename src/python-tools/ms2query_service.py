@@ -0,0 +1,204 @@
+"""
+Optional long-lived MS2Query service (not a tool itself), used by run_ms2query.py.
+
+Creating the MS2Library loads the embeddings, the SQLite database and the models of an ion mode from disk, which takes
+much longer than scoring the spectra of a typical workflow run. The service keeps a library in memory and scores MGF
+files submitted by workflows over a local socket (Unix domain socket, named pipe on Windows). There is one service per
+library directory, so workflows of all workspaces using the same library share one copy of the models. The service
+is started by the first workflow which needs it and stops after being idle for a while.
+
+Run as script to start a service: python ms2query_service.py <library directory> <idle timeout in seconds>
+"""
+from pathlib import Path
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+import os
+import sys
+import time
+import hashlib
+import tempfile
+import threading
+import traceback
+import subprocess
+
+# Directory with the addresses, authentication keys and logs of running services
+SERVICE_DIR = Path(tempfile.gettempdir(), "ms2query-service")
+
+# Maximum time in seconds for a service to start and load the library until clients give up
+START_TIMEOUT = 1800
+
+
+def get_service_files(library_dir: Path) -> tuple:
+    """Returns the address, authentication key file, process id file and log file of the service for a library directory."""
+    name = "ms2query-" + hashlib.sha1(str(Path(library_dir).resolve()).encode()).hexdigest()[:12]
+    if sys.platform == "win32":
+        address = rf"\\.\pipe\{name}"
+    else:
+        address = str(Path(SERVICE_DIR, name + ".sock"))
+    return (
+        address,
+        Path(SERVICE_DIR, name + ".key"),
+        Path(SERVICE_DIR, name + ".pid"),
+        Path(SERVICE_DIR, name + ".log"),
+    )
+
+
+def _is_service(pid: int, library_dir: Path) -> bool:
+    # Process ids are reused, the process has to be the service of this library (checked where /proc is available)
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    if not Path("/proc").is_dir():
+        return True
+    try:
+        args = Path("/proc", str(pid), "cmdline").read_bytes().decode(errors="replace").split("\0")
+    except OSError:
+        # Exited in the meantime
+        return False
+    return any(Path(a).name == Path(__file__).name for a in args) and str(Path(library_dir).resolve()) in args
+
+
+def is_running(library_dir: Path) -> bool:
+    """Checks if the service of a library directory is running (or still loading the library)."""
+    pid_file = get_service_files(library_dir)[2]
+    try:
+        content = pid_file.read_text()
+        modified = pid_file.stat().st_mtime
+    except OSError:
+        return False
+    if not content:
+        # Just created by a starting service (or left empty by a crashed one)
+        return time.time() - modified < 60
+    return _is_service(int(content), library_dir)
+
+
+def connect(library_dir: Path):
+    """Connects to the service of a library directory, returns None if it is not running (yet)."""
+    address, key_file, _, _ = get_service_files(library_dir)
+    try:
+        return Client(address, authkey=key_file.read_bytes())
+    except (OSError, EOFError, AuthenticationError):
+        # Not running, still loading the library or authentication failed (key of a previous service)
+        return None
+
+
+def start(library_dir: Path, idle_timeout: int) -> subprocess.Popen:
+    """Starts the service of a library directory in a separate process (not stopped together with the workflow)."""
+    SERVICE_DIR.mkdir(exist_ok=True)
+    log_file = get_service_files(library_dir)[3]
+    with open(log_file, "a") as log:
+        return subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), str(Path(library_dir).resolve()), str(idle_timeout)],
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+
+def run(library_dir: Path, mgf_file: Path, results_folder: Path, idle_timeout: int) -> None:
+    """
+    Scores the spectra of an MGF file with the service of a library directory (started if not running) and writes
+    the results to the results folder, in the same way as ms2query.run_ms2query.run_complete_folder.
+
+    Raises:
+        RuntimeError: If the service could not be started within START_TIMEOUT seconds or the spectra could not be scored.
+    """
+    connection = connect(library_dir)
+    if connection is None:
+        # Several workflows may start a service at the same time, all but one exit immediately
+        process = start(library_dir, idle_timeout)
+        start_time = time.time()
+        while connection is None:
+            if process.poll() is not None and not is_running(library_dir):
+                raise RuntimeError(f"MS2Query service failed to start, see {get_service_files(library_dir)[3]}")
+            if time.time() - start_time > START_TIMEOUT:
+                raise RuntimeError(
+                    f"MS2Query service did not start within {START_TIMEOUT} seconds, see {get_service_files(library_dir)[3]}"
+                )
+            time.sleep(1)
+            connection = connect(library_dir)
+    with connection:
+        connection.send({"mgf": str(Path(mgf_file).resolve()), "results": str(Path(results_folder).resolve())})
+        response = connection.recv()
+    if response["error"]:
+        raise RuntimeError(f"MS2Query service failed to score {Path(mgf_file).name}:\n{response['error']}")
+
+
+def serve(library_dir: Path, idle_timeout: int) -> None:
+    """Loads the library and scores submitted MGF files (one at a time) until idle for idle_timeout seconds."""
+    address, key_file, pid_file, _ = get_service_files(library_dir)
+    # Only one service per library directory (the process id file is created exclusively)
+    while True:
+        try:
+            fd = os.open(pid_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if is_running(library_dir):
+                print("Service for this library is already running.", flush=True)
+                return
+            # Left by a service which was not stopped properly
+            pid_file.unlink(missing_ok=True)
+    os.write(fd, str(os.getpid()).encode())
+    os.close(fd)
+    from ms2query.run_ms2query import run_complete_folder
+    from ms2query.ms2library import create_library_object_from_one_dir
+    from ms2query.utils import SettingsRunMS2Query
+
+    print(f"Loading MS2Query library {library_dir}...", flush=True)
+    ms2library = create_library_object_from_one_dir(library_dir)
+
+    # Address of a service which was not stopped properly
+    if sys.platform != "win32" and Path(address).exists():
+        Path(address).unlink()
+    key = os.urandom(32)
+    key_file.touch(mode=0o600)
+    key_file.write_bytes(key)
+    listener = Listener(address, authkey=key)
+    print(f"Listening on {address}.", flush=True)
+
+    lock = threading.Lock()
+    last_request = [time.time()]
+
+    def handle(connection):
+        with connection:
+            request = connection.recv()
+            with lock:
+                print(f"Scoring {request['mgf']}...", flush=True)
+                try:
+                    run_complete_folder(
+                        ms2library=ms2library,
+                        folder_with_spectra=Path(request["mgf"]).parent,
+                        results_folder=Path(request["results"]),
+                        settings=SettingsRunMS2Query(additional_metadata_columns=("FEATURE_ID",)),
+                    )
+                    error = ""
+                except Exception:
+                    error = traceback.format_exc()
+                last_request[0] = time.time()
+            connection.send({"error": error})
+
+    def stop_when_idle():
+        while time.time() - last_request[0] < idle_timeout or lock.locked():
+            time.sleep(10)
+        print("Stopping idle service.", flush=True)
+        pid_file.unlink(missing_ok=True)
+        if sys.platform != "win32":
+            Path(address).unlink(missing_ok=True)
+        # Also stops accept in the main thread
+        os._exit(0)
+
+    threading.Thread(target=stop_when_idle, daemon=True).start()
+    while True:
+        try:
+            connection = listener.accept()
+        except Exception:
+            # e.g. authentication failed
+            continue
+        last_request[0] = time.time()
+        threading.Thread(target=handle, args=(connection,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    serve(Path(sys.argv[1]), int(sys.argv[2]))
@@ -36,8 +36,7 @@ def get_params():
     else:
         return {}
 
-if __name__ == "__main__":
-    params = get_params()
+def main(params: dict) -> None:
     # Add code here:
     dir = params["in"]
 
@@ -81,4 +80,8 @@ if __name__ == "__main__":
             # Add the feature to the feature map
             fm.push_back(f)
         # Save the feature map to featureXML format
-        poms.FeatureXMLFile().store(str(Path(fm_dir, Path(f_df).stem + ".featureXML")), fm)
\ No newline at end of file
+        poms.FeatureXMLFile().store(str(Path(fm_dir, Path(f_df).stem + ".featureXML")), fm)
+
+
+if __name__ == "__main__":
+    main(get_params())
@@ -1,8 +1,11 @@
 import json
+import os
 import sys
 from pathlib import Path
+from contextlib import contextmanager
 import pandas as pd
 import shutil
+import tempfile
 
 from ms2query.run_ms2query import (
     run_complete_folder,
@@ -11,9 +14,12 @@ from ms2query.run_ms2query import (
 from ms2query.ms2library import create_library_object_from_one_dir
 from ms2query.utils import SettingsRunMS2Query
 
+import ms2query_service
+
 DEFAULTS = [
     {"key": "in", "value": [], "help": "Feature Matrix tsv file", "hide": True},
     {"key": "in_mgf", "value": [], "help": "GNPS mgf file", "hide": True},
+    {"key": "out_tsv", "value": [], "help": "feature matrix tsv file (default: parquet file path with .tsv suffix)", "hide": True},
     {
         "key": "out_m2query_csv",
         "value": [],
@@ -26,6 +32,18 @@ DEFAULTS = [
         "help": "Ion mode for MS2Query.",
         "hide": True,
     },
+    {
+        "key": "service",
+        "value": False,
+        "help": "Score spectra with a shared MS2Query service which keeps the library in memory (see ms2query_service.py).",
+        "hide": True,
+    },
+    {
+        "key": "service_idle_timeout",
+        "value": 3600,
+        "help": "Seconds after which an idle MS2Query service stops.",
+        "hide": True,
+    },
 ]
 
 
@@ -37,20 +55,49 @@ def get_params():
         return {}
 
 
-def download_ms2query_libraries(ms2query_library_files_directory, ion_mode, flag_file):
-    print("Downloading MS2Query Models...")
-    if ms2query_library_files_directory.exists():
-        shutil.rmtree(ms2query_library_files_directory)
-
-    ms2query_library_files_directory.mkdir(exist_ok=True, parents=True)
-
-    # Downloads pretrained models and files for MS2Query (>2GB download)
-    download_zenodo_files(ion_mode, ms2query_library_files_directory)
-
-    Path(flag_file).touch()
+@contextmanager
+def exclusive_lock(lock_file: Path):
+    """Holds an exclusive lock on a file, waits while another process holds it (released if the process is killed)."""
+    with open(lock_file, "a+") as f:
+        if sys.platform == "win32":
+            import msvcrt
+            while True:
+                try:
+                    # Retries for 10 seconds before raising
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
 
 
-def ms2query_annotations(feature_matrix, ms2query_csv):
+def download_ms2query_libraries(ms2query_library_files_directory, ion_mode, flag_file):
+    # The library directory can be shared by workflows of all workspaces (see ms2query_service.py): only one of
+    # them downloads, the others wait for the lock. Files are downloaded to a temporary directory, which is
+    # renamed into place once complete, so that an interrupted download never leaves a partial library.
+    library_dir = Path(ms2query_library_files_directory)
+    library_dir.parent.mkdir(exist_ok=True, parents=True)
+    with exclusive_lock(Path(library_dir.parent, library_dir.name + ".lock")):
+        if Path(flag_file).exists():
+            # Downloaded by another workflow in the meantime
+            return
+        print("Downloading MS2Query Models...")
+        download_dir = Path(tempfile.mkdtemp(prefix=library_dir.name + "-download-", dir=library_dir.parent))
+        try:
+            # Downloads pretrained models and files for MS2Query (>2GB download)
+            download_zenodo_files(ion_mode, download_dir)
+            Path(download_dir, Path(flag_file).name).touch()
+            if library_dir.exists():
+                shutil.rmtree(library_dir)
+            os.replace(download_dir, library_dir)
+        finally:
+            shutil.rmtree(download_dir, ignore_errors=True)
+
+
+def ms2query_annotations(feature_matrix, ms2query_csv, feature_matrix_tsv=None):
     df_gnps = pd.read_parquet(
         Path(Path(feature_matrix).parent, "feature-matrix-gnps.parquet"))
 
@@ -85,19 +132,20 @@ def ms2query_annotations(feature_matrix, ms2query_csv):
                 ] = str(df_ms2query.loc[i, col])
 
     df.to_parquet(feature_matrix)
-    df.to_csv(Path(feature_matrix).with_suffix(".tsv"), sep="\t")
+    df.to_csv(feature_matrix_tsv or Path(feature_matrix).with_suffix(".tsv"), sep="\t")
 
 
-if __name__ == "__main__":
-    params = get_params()
+def main(params: dict) -> None:
 
     consensus_file = params["in"][0]
     mgf_spectra = params["in_mgf"][0]
     results_file = params["out_ms2query_csv"][0]
 
-    # Set the location where downloaded library and model files are stored (directly in workspace)
+    # Set the location where downloaded library and model files are stored (directly in workspace,
+    # shared by all workspaces if the service is used, so that they share one service)
+    workspace = Path(results_file).parent.parent.parent.parent
     ms2query_library_files_directory = Path(
-        Path(Path(results_file).parent.parent.parent.parent, "ms2query-models"),
+        Path(workspace.parent if params["service"] else workspace, "ms2query-models"),
         params["ion_mode"],
     )
     flag = Path(ms2query_library_files_directory, "download-complete")
@@ -106,17 +154,29 @@ if __name__ == "__main__":
             ms2query_library_files_directory, params["ion_mode"], flag
         )
 
-    # Create a MS2Library object
-    ms2library = create_library_object_from_one_dir(ms2query_library_files_directory)
-
     if Path(results_file).exists():
         Path(results_file).unlink()
 
-    run_complete_folder(
-        ms2library=ms2library,
-        folder_with_spectra=Path(mgf_spectra).parent,
-        results_folder=Path(results_file).parent,
-        settings=SettingsRunMS2Query(additional_metadata_columns=("FEATURE_ID",)),
-    )
+    if params["service"]:
+        ms2query_service.run(
+            ms2query_library_files_directory,
+            mgf_spectra,
+            Path(results_file).parent,
+            params["service_idle_timeout"],
+        )
+    else:
+        # Create a MS2Library object
+        ms2library = create_library_object_from_one_dir(ms2query_library_files_directory)
+
+        run_complete_folder(
+            ms2library=ms2library,
+            folder_with_spectra=Path(mgf_spectra).parent,
+            results_folder=Path(results_file).parent,
+            settings=SettingsRunMS2Query(additional_metadata_columns=("FEATURE_ID",)),
+        )
+
+    ms2query_annotations(consensus_file, results_file, params["out_tsv"][0] if params.get("out_tsv") else None)
 
-    ms2query_annotations(consensus_file, results_file)
\ No newline at end of file
+
+if __name__ == "__main__":
+    main(get_params())
@@ -34,8 +34,7 @@ def get_params():
     else:
         return {}
 
-if __name__ == "__main__":
-    params = get_params()
+def main(params: dict) -> None:
     # Add code here:
     # Files to package:
     dir = Path(params["in"][0]).parent.parent
@@ -70,4 +69,8 @@ if __name__ == "__main__":
                 # If the path is a directory, recursively add its contents
                 for subpath in path.rglob('*'):
                     # Use as_posix() to ensure correct path format in ZIP across platforms
-                    zipf.write(subpath, subpath.relative_to(path.parent).as_posix())
\ No newline at end of file
+                    zipf.write(subpath, subpath.relative_to(path.parent).as_posix())
+
+
+if __name__ == "__main__":
+    main(get_params())
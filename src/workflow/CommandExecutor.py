@@ -6,9 +6,18 @@ import threading
 from pathlib import Path
 from .Logger import Logger
 from .ParameterManager import ParameterManager
+from .StepGraph import StepGraph
+from .PythonWorkerPool import PythonWorkerPool
+from .JobQueue import JobQueue
+from .ProgressTracker import ProgressTracker
 import sys
-import importlib.util
 import json
+import hashlib
+import signal
+from queue import Queue, Empty
+from collections import deque
+from typing import Callable, Union
+from contextlib import contextmanager
 
 class CommandExecutor:
     """
@@ -19,36 +28,155 @@ class CommandExecutor:
     commands and batches of commands in parallel, leveraging Python's subprocess module
     for execution.
     """
+    # Maximum number of bytes read at once from the output of a command (see read_lines)
+    OUTPUT_CHUNK_SIZE = 64 * 1024
+
+    # Seconds between two checks of a running command by its watchdog (see start_watchdog)
+    WATCHDOG_INTERVAL = 0.5
+
     # Methods for running commands and logging
     def __init__(self, workflow_dir: Path, logger: Logger, parameter_manager: ParameterManager):
         self.pid_dir = Path(workflow_dir, "pids")
         self.logger = logger
         self.parameter_manager = parameter_manager
+        # Step fingerprints and results of the previous run, used to skip unchanged steps
+        self.results_dir = Path(workflow_dir, "results")
+        self.cache_dir = Path(workflow_dir, "results-previous")
+        self.step_dir = Path(workflow_dir, "steps")
+        self.used_steps = set()
+        # Exists while a workflow run is not finished (e.g. stopped or crashed), which can then be resumed
+        self.incomplete_marker = Path(workflow_dir, "run-incomplete")
+        # Deployment wide execution settings, e.g. the maximum number of parallel commands
+        self.settings = {}
+        if Path("settings.json").exists():
+            with open("settings.json", "r", encoding="utf-8") as f:
+                self.settings = json.load(f).get("workflow-execution", {})
+        # Process slots shared by all commands of this executor, commands occupy one slot per thread
+        # (limits the total load when several workflow steps run at the same time), slots are
+        # numbered to show which commands ran side by side in the execution timeline
+        self.max_slots = self.get_max_parallel_commands()
+        self.free_slots = list(range(self.max_slots))
+        self.slots_condition = threading.Condition()
+        # Resource usage of each command (one JSON object per line) and aggregate per workflow run
+        self.metrics_file = Path(workflow_dir, "metrics.jsonl")
+        self.metrics_summary_file = Path(workflow_dir, "metrics-summary.json")
+        self.metrics_lock = threading.Lock()
+        # Start of the current workflow process, recorded with each command to tell the part
+        # before an interruption from the resumed part of a run (see RunTimeline)
+        self.run_start_time = time.time()
+        # Optional long-lived Python processes executing python-tools (see start_python_workers)
+        self.python_workers = None
+        # Optional server-wide queue limiting the number of workflows running at the same time,
+        # shared by all workspaces (database in the workspaces directory)
+        self.job_queue = None
+        max_running_workflows = int(self.settings.get("max-running-workflows", 0))
+        if max_running_workflows > 0:
+            self.job_queue = JobQueue(
+                Path(workflow_dir, "..", "..", "job-queue.db"), max_running_workflows, workflow_dir
+            )
+        # Progress of the running workflow with estimates from run times of previous runs on this deployment
+        self.progress = ProgressTracker(workflow_dir, Path(workflow_dir, "..", "..", "workflow-history.db"))
+
+    def get_max_parallel_commands(self, num_threads: int = 1) -> int:
+        """
+        Returns the maximum number of commands which are allowed to run at the same time.
+
+        Uses "max-parallel-commands" from the "workflow-execution" section in settings.json
+        if it is set to a value larger than zero. Otherwise the number of available CPU cores
+        is divided by the number of threads each command uses, so that the machine is not
+        oversubscribed.
+
+        Args:
+            num_threads (int, optional): Number of threads used by each command. Defaults to 1.
+
+        Returns:
+            int: The maximum number of parallel commands (at least 1).
+        """
+        max_commands = int(self.settings.get("max-parallel-commands", 0))
+        if max_commands > 0:
+            return max_commands
+        # Respect CPU affinity (e.g. in containers) where available
+        if hasattr(os, "sched_getaffinity"):
+            n_cores = len(os.sched_getaffinity(0))
+        else:
+            n_cores = os.cpu_count() or 1
+        return max(1, n_cores // max(1, num_threads))
 
     def run_multiple_commands(
-        self, commands: list[str]
-    ) -> None:
+        self,
+        commands: list[str],
+        num_threads: int = 1,
+        sizes: list[int] = None,
+        on_finished: Callable[[], None] = None,
+        on_started: Callable[[], None] = None,
+    ) -> bool:
         """
-        Executes multiple shell commands concurrently in separate threads.
+        Executes multiple shell commands concurrently with a bounded pool of worker threads.
 
-        This method leverages threading to run each command in parallel, improving
-        efficiency for batch command execution. Execution time and command results are
-        logged if specified.
+        Commands are put into a queue which is processed by a limited number of workers
+        (see get_max_parallel_commands). Commands are processed in FIFO order, or, if
+        "command-order" in settings.json is set to "size" and input sizes are given, with
+        the largest inputs first to avoid a single large file finishing last. Queue depth
+        and waiting times are logged.
 
         Args:
             commands (list[str]): A list where each element is a list representing
                                         a command and its arguments.
+            num_threads (int, optional): Number of threads used by each command. Defaults to 1.
+            sizes (list[int], optional): Input size in bytes for each command, used for size-aware ordering.
+            on_finished (Callable[[], None], optional): Called after each finished command (e.g. to report progress).
+            on_started (Callable[[], None], optional): Called when a command occupied its process slots.
+
+        Returns:
+            bool: True if all commands finished successfully.
         """
+        n_workers = min(len(commands), self.get_max_parallel_commands(num_threads))
+        order = self.settings.get("command-order", "fifo")
+        if order == "size" and sizes is not None:
+            commands = [
+                cmd for _, cmd in sorted(zip(sizes, commands), key=lambda x: x[0], reverse=True)
+            ]
+        else:
+            order = "fifo"
+
         # Log the start of command execution
-        self.logger.log(f"Running {len(commands)} commands in parallel...", 1)
+        self.logger.log(
+            f"Running {len(commands)} commands with up to {n_workers} in parallel ({order} order)...",
+            1,
+        )
         start_time = time.time()
 
+        # Fill the queue, workers pull commands until it is empty
+        queue = Queue()
+        for cmd in commands:
+            queue.put(cmd)
+        results = []
+
+        def worker():
+            while True:
+                try:
+                    cmd = queue.get_nowait()
+                except Empty:
+                    return
+                self.logger.log(
+                    f"Starting queued command after waiting {time.time() - start_time:.2f} seconds ({queue.qsize()} commands left in queue).",
+                    1,
+                )
+                try:
+                    results.append(self.run_command(cmd, num_threads, on_started))
+                except Exception as e:
+                    # e.g. the tool executable does not exist, counts as failed command
+                    self.logger.log(f"ERROR: Failed to run command {' '.join(str(c) for c in cmd)}: {e}")
+                    results.append(False)
+                if on_finished is not None:
+                    on_finished()
+
         # Initialize a list to keep track of threads
         threads = []
 
-        # Start a new thread for each command
-        for cmd in commands:
-            thread = threading.Thread(target=self.run_command, args=(cmd,))
+        # Start a fixed number of worker threads
+        for _ in range(n_workers):
+            thread = threading.Thread(target=worker)
             thread.start()
             threads.append(thread)
 
@@ -59,52 +187,616 @@ class CommandExecutor:
         # Calculate and log the total execution time
         end_time = time.time()
         self.logger.log(f"Total time to run {len(commands)} commands: {end_time - start_time:.2f} seconds", 1)
+        return all(results)
 
-    def run_command(self, command: list[str]) -> None:
+    def run_command(self, command: list[str], num_threads: int = 1, on_started: Callable[[], None] = None) -> bool:
         """
         Executes a specified shell command and logs its execution details.
+        Waits until enough process slots are free if other commands are running concurrently.
+
+        Output is streamed: stdout and stderr are read in chunks of at most OUTPUT_CHUNK_SIZE bytes
+        (see read_lines) and written to the log in small batches while the command is running.
+        If the command fails, the last lines of stderr are logged again as errors. The logged
+        output per command can be limited with "max-command-output" (bytes, 0 for no limit) in
+        settings.json.
 
         Args:
             command (list[str]): The shell command to execute, provided as a list of strings.
+            num_threads (int, optional): Number of threads used by the command (slots to occupy). Defaults to 1.
+            on_started (Callable[[], None], optional): Called once the command occupied its process slots.
 
-        Raises:
-            Exception: If the command execution results in any errors.
+        Returns:
+            bool: True if the command finished with return code 0.
         """
         # Ensure all command parts are strings
         command = [str(c) for c in command]
 
-        # Log the execution start
-        self.logger.log(f"Running command:\n"+' '.join(command)+"\nWaiting for command to finish...", 1)   
-        start_time = time.time()
-        
-        # Execute the command
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        child_pid = process.pid
-        
-        # Record the PID to keep track of running processes associated with this workspace/workflow
-        # User can close the Streamlit app and return to a running workflow later
-        pid_file_path = self.pid_dir / str(child_pid)
-        pid_file_path.touch()
-        
-        # Wait for command completion and capture output
-        stdout, stderr = process.communicate()
-        
-        # Cleanup PID file
-        pid_file_path.unlink()
+        slots = self.acquire_slots(num_threads)
+        if on_started is not None:
+            on_started()
+
+        max_output = int(self.settings.get("max-command-output", 0))
+        # Number of logged and dropped stdout bytes (first entry) and stderr bytes (second entry)
+        logged_bytes = [0, 0]
+        dropped_bytes = [0, 0]
+        # The last lines of stderr are repeated in the error message if the command fails
+        stderr_tail = deque(maxlen=20)
+
+        def read_output(stream, i):
+            # Log output in batches (at most every second) to keep the log up to date,
+            # i is 0 for stdout and 1 for stderr
+            batch = []
+            last_flush = time.time()
+            for line in self.read_lines(stream):
+                if i == 1:
+                    stderr_tail.append(line)
+                # Counted with the line break
+                size = len(line) + 1
+                if max_output and logged_bytes[i] + size > max_output:
+                    dropped_bytes[i] += size
+                    continue
+                logged_bytes[i] += size
+                batch.append(line.decode(errors="replace").rstrip())
+                if len(batch) >= 100 or time.time() - last_flush > 1:
+                    self.logger.log("\n".join(batch), 2)
+                    batch = []
+                    last_flush = time.time()
+            if batch:
+                self.logger.log("\n".join(batch), 2)
+            stream.close()
+
+        try:
+            # Log the execution start
+            self.logger.log(f"Running command:\n"+' '.join(command)+"\nWaiting for command to finish...", 1)
+            start_time = time.time()
+
+            # Execute the command in a new process group (session), so that all processes started
+            # by the command (e.g. Java processes started by SIRIUS) can be terminated together
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+                preexec_fn=self.get_memory_limiter(command),
+            )
+            child_pid = process.pid
+
+            # Record the PID to keep track of running processes associated with this workspace/workflow
+            # User can close the Streamlit app and return to a running workflow later
+            pid_file_path = self.pid_dir / str(child_pid)
+            pid_file_path.touch()
+
+            # Sample peak memory and enforce memory and time limits for this tool
+            stop_watchdog = self.start_watchdog(command, process)
+
+            # Stream output while waiting for command completion
+            readers = [
+                threading.Thread(target=read_output, args=(process.stdout, 0)),
+                threading.Thread(target=read_output, args=(process.stderr, 1)),
+            ]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join()
+            usage = self.wait_for_process(process, stop_watchdog)
+
+            # Cleanup PID file
+            pid_file_path.unlink()
+        finally:
+            self.release_slots(slots)
 
         end_time = time.time()
         execution_time = end_time - start_time
         # Format the logging prefix
         self.logger.log(f"Process finished:\n"+' '.join(command)+f"\nTotal time to run command: {execution_time:.2f} seconds", 1)
-        
-        # Log stdout if present
+
+        self.record_metrics(command, start_time, execution_time, process.returncode, usage, slots)
+
+        for name, dropped in zip(("stdout", "stderr"), dropped_bytes):
+            if dropped:
+                self.logger.log(f"Output truncated, {dropped} bytes of {name} not logged.", 2)
+
+        if process.returncode != 0:
+            self.log_stderr(
+                process.returncode, "\n".join(line.decode(errors="replace").rstrip() for line in stderr_tail).strip()
+            )
+
+        return process.returncode == 0
+
+    @classmethod
+    def read_lines(cls, stream, chunk_size: int = 0):
+        """
+        Reads lines from a binary stream (e.g. the stdout pipe of a process) in chunks of at most
+        chunk_size bytes, as soon as they are available. Lines longer than chunk_size are split,
+        so that memory use stays bounded for output without line breaks.
+
+        Args:
+            stream: The binary stream.
+            chunk_size (int, optional): Maximum number of bytes to read at once. Defaults to OUTPUT_CHUNK_SIZE.
+
+        Yields:
+            bytes: The lines without line breaks.
+        """
+        chunk_size = chunk_size or cls.OUTPUT_CHUNK_SIZE
+        pending = b""
+        while True:
+            chunk = stream.read1(chunk_size)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            yield from lines
+            while len(pending) >= chunk_size:
+                yield pending[:chunk_size]
+                pending = pending[chunk_size:]
+        if pending:
+            yield pending
+
+    def get_command_limits(self, command: list[str]) -> dict:
+        """
+        Returns resource limits for a command from the "command-limits" parameter, with
+        tool names (or "*" for all tools) as keys and limits as values, e.g.
+        {"FeatureFinderMetabo": {"max-memory-mb": 8000, "max-rss-mb": 4000, "timeout": 3600}}.
+
+        "max-memory-mb" limits the virtual memory of the process (RLIMIT_AS), "max-rss-mb" the
+        resident memory of all processes of the command and "timeout" the run time in seconds.
+
+        Args:
+            command (list[str]): The command.
+
+        Returns:
+            dict: The limits for the tool.
+        """
+        command_limits = self.parameter_manager.get_value("command-limits", {})
+        return {**command_limits.get("*", {}), **command_limits.get(self.get_tool_name(command), {})}
+
+    def get_memory_limiter(self, command: list[str]) -> Union[Callable[[], None], None]:
+        """
+        Returns a function which limits the virtual memory of a command ("max-memory-mb", see
+        get_command_limits) via RLIMIT_AS. It is executed in the child process before the command
+        is executed (preexec_fn), so that the limit applies from the start and never to another process.
+
+        Args:
+            command (list[str]): The command.
+
+        Returns:
+            Union[Callable[[], None], None]: The function, None if no limit is set or limits are
+                not supported (e.g. Windows).
+        """
+        max_memory = self.get_command_limits(command).get("max-memory-mb")
+        if not max_memory:
+            return None
+        try:
+            import resource
+        except ImportError:
+            self.logger.log(f"WARNING: Could not set memory limit for {self.get_tool_name(command)}: not supported.")
+            return None
+        max_bytes = int(max_memory) * 1024 * 1024
+        # Checked here, errors in the child process can not be logged (lowering a limit is always allowed)
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            max_bytes = min(max_bytes, hard)
+
+        def limit_memory():
+            resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+        return limit_memory
+
+    @staticmethod
+    def is_running(process: subprocess.Popen) -> bool:
+        """
+        Checks if a process is still running, without reaping it if it exited (where supported),
+        so that its process id can not be reused by another process in the meantime.
+
+        Args:
+            process (subprocess.Popen): The process.
+
+        Returns:
+            bool: True if the process did not exit yet.
+        """
+        if hasattr(os, "waitid"):
+            try:
+                return os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is None
+            except ChildProcessError:
+                # Already reaped
+                return False
+        return process.poll() is None
+
+    def start_watchdog(self, command: list[str], process: subprocess.Popen) -> Callable[[], dict]:
+        """
+        Starts a watchdog thread for a started command, which checks the command every WATCHDOG_INTERVAL
+        seconds. It samples the peak resident memory (Linux only): the high-water mark of the main
+        process (VmHWM, resets when the command is executed) and the summed resident memory of all
+        processes in its process group. Memory peaks of other processes between two samples are missed.
+
+        It also applies the resident memory and run time limits for the command (see get_command_limits)
+        by terminating the process group, unless the process exited in the meantime. The virtual memory
+        limit is set when the process is started (see get_memory_limiter).
+
+        Args:
+            command (list[str]): The command.
+            process (subprocess.Popen): The started process.
+
+        Returns:
+            Callable[[], dict]: Stops the watchdog (to be called before the finished process is reaped)
+                and returns the sampled usage ("max_rss_bytes", missing if not available).
+        """
+        limits = self.get_command_limits(command)
+        tool = self.get_tool_name(command)
+        max_rss = int(limits.get("max-rss-mb", 0)) * 1024 * 1024
+        timeout = float(limits.get("timeout", 0))
+        sample_memory = Path("/proc", str(process.pid), "status").exists()
+        usage = {}
+        if not sample_memory and not max_rss and not timeout:
+            return lambda: usage
+        finished = threading.Event()
+
+        def watchdog():
+            start_time = time.time()
+            # First check directly after the start, to sample short commands at least once
+            while True:
+                reason = None
+                group_rss = self.get_process_group_rss(process.pid) if sample_memory or max_rss else 0
+                if sample_memory:
+                    peak_rss = max(group_rss, self.get_peak_rss(process.pid))
+                    if peak_rss:
+                        usage["max_rss_bytes"] = max(usage.get("max_rss_bytes", 0), peak_rss)
+                if timeout and time.time() - start_time > timeout:
+                    reason = f"exceeded the time limit of {timeout:.0f} seconds"
+                elif max_rss and group_rss > max_rss:
+                    reason = f"exceeded the memory limit of {max_rss // (1024 * 1024)} MB"
+                # The process is not reaped before the watchdog stopped, its process id is not reused
+                if reason is not None and self.is_running(process):
+                    self.logger.log(f"ERROR: {tool} {reason}, terminating the process.")
+                    self.kill_process_group(process.pid)
+                    return
+                if finished.wait(self.WATCHDOG_INTERVAL):
+                    return
+
+        thread = threading.Thread(target=watchdog, daemon=True)
+        thread.start()
+
+        def stop() -> dict:
+            finished.set()
+            thread.join()
+            return usage
+
+        return stop
+
+    @staticmethod
+    def get_peak_rss(pid: int) -> int:
+        """
+        Returns the peak resident memory (bytes) of a running process since it was started or
+        executed a new program (VmHWM, Linux only, 0 otherwise or if the process exited).
+
+        Args:
+            pid (int): The process id.
+
+        Returns:
+            int: Peak resident memory in bytes.
+        """
+        try:
+            status = Path("/proc", str(pid), "status").read_text()
+        except OSError:
+            return 0
+        for line in status.splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+        return 0
+
+    @staticmethod
+    def get_process_group_rss(pgid: int) -> int:
+        """
+        Returns the resident memory (bytes) of all processes in a process group (Linux only, 0 otherwise).
+
+        Args:
+            pgid (int): The process group id.
+
+        Returns:
+            int: Resident memory in bytes.
+        """
+        rss = 0
+        page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        for stat_file in Path("/proc").glob("[0-9]*/stat"):
+            try:
+                # The command name (second field) can contain spaces, fields after it are fixed
+                fields = stat_file.read_text().rsplit(")", 1)[1].split()
+            except (OSError, IndexError):
+                continue
+            # Fields after the command name: state, ppid, pgrp, ..., rss (22nd)
+            if int(fields[2]) == pgid:
+                rss += int(fields[21]) * page_size
+        return rss
+
+    @staticmethod
+    def kill_process_group(pid: int) -> None:
+        """
+        Kills a process together with all processes in its process group, if it is a process group leader
+        (commands started by run_command), otherwise only the process itself.
+
+        Args:
+            pid (int): The process id.
+        """
+        try:
+            if hasattr(os, "killpg") and os.getpgid(pid) == pid:
+                os.killpg(pid, signal.SIGKILL)
+            else:
+                os.kill(pid, signal.SIGKILL if hasattr(signal, "SIGKILL") else signal.SIGTERM)
+        except ProcessLookupError:
+            # Exited in the meantime
+            pass
+
+    def acquire_slots(self, num_threads: int = 1) -> list[int]:
+        """
+        Waits until enough process slots are free and occupies them (lowest slot numbers first).
+
+        Args:
+            num_threads (int, optional): Number of threads used by the command. Defaults to 1.
+
+        Returns:
+            list[int]: The occupied slot numbers, to be passed to release_slots.
+        """
+        n_slots = min(max(1, num_threads), self.max_slots)
+        with self.slots_condition:
+            self.slots_condition.wait_for(lambda: len(self.free_slots) >= n_slots)
+            self.free_slots.sort()
+            slots = self.free_slots[:n_slots]
+            del self.free_slots[:n_slots]
+        return slots
+
+    def release_slots(self, slots: list[int]) -> None:
+        """
+        Releases process slots occupied with acquire_slots.
+
+        Args:
+            slots (list[int]): The slot numbers to release.
+        """
+        with self.slots_condition:
+            self.free_slots += slots
+            self.slots_condition.notify_all()
+
+    def log_stderr(self, returncode: int, stderr_message: str) -> None:
+        """
+        Logs stderr output of a command. Messages on stderr are only errors if the command
+        failed, otherwise they are warnings.
+
+        Args:
+            returncode (int): The return code of the command.
+            stderr_message (str): The stderr output.
+        """
+        if returncode != 0:
+            self.logger.log(f"ERRORS OCCURRED (return code {returncode}):\n{stderr_message}", 2)
+        elif stderr_message:
+            self.logger.log(f"WARNINGS:\n{stderr_message}", 2)
+
+    def start_python_workers(self) -> None:
+        """
+        Starts long-lived Python worker processes for python-tools if "python-workers" in the
+        "workflow-execution" section of settings.json is larger than zero. Modules listed in
+        "python-worker-modules" are imported once per worker. Scripts with a "threads" parameter
+        always run in a new process (see run_python). Needs to be called in the workflow
+        process before steps run in parallel threads.
+        """
+        n_workers = int(self.settings.get("python-workers", 0))
+        if n_workers > 0:
+            self.python_workers = PythonWorkerPool(
+                n_workers, self.settings.get("python-worker-modules", []), self.pid_dir
+            )
+            self.python_workers.start()
+
+    def stop_python_workers(self) -> None:
+        """
+        Stops the Python worker processes.
+        """
+        if self.python_workers is not None:
+            self.python_workers.shutdown()
+            self.python_workers = None
+
+    def run_python_in_worker(
+        self, path: Path, params: dict, num_threads: int = 1, on_started: Callable[[], None] = None
+    ) -> bool:
+        """
+        Executes the main(params) function of a Python tool in a Python worker process
+        and logs its execution details and output in the same way as run_command.
+
+        Args:
+            path (Path): Path to the Python tool.
+            params (dict): The parameters for the tool.
+            num_threads (int, optional): Number of processes used by the tool (slots to occupy). Defaults to 1.
+            on_started (Callable[[], None], optional): Called once the tool occupied its process slots.
+
+        Returns:
+            bool: True if the tool finished without errors.
+        """
+        command = ["python", str(path)]
+        slots = self.acquire_slots(num_threads)
+        if on_started is not None:
+            on_started()
+        try:
+            self.logger.log(f"Running Python tool in worker process:\n{path}\nWaiting for tool to finish...", 1)
+            start_time = time.time()
+            result = self.python_workers.run(str(path), params)
+        finally:
+            self.release_slots(slots)
+        execution_time = time.time() - start_time
+        self.logger.log(f"Process finished:\n{path}\nTotal time to run command: {execution_time:.2f} seconds", 1)
+        self.record_metrics(
+            command, start_time, execution_time, result["returncode"], result["usage"], slots, params.get("in", "")
+        )
+
+        max_output = int(self.settings.get("max-command-output", 0))
+        stdout = result["stdout"]
+        if max_output and len(stdout) > max_output:
+            self.logger.log(f"Output truncated, {len(stdout) - max_output} bytes of stdout not logged.", 2)
+            stdout = stdout[:max_output]
         if stdout:
-            self.logger.log(stdout.decode(), 2)
-        
-        # Log stderr and raise an exception if errors occurred
-        if stderr or process.returncode != 0:
-            error_message = stderr.decode().strip()
-            self.logger.log(f"ERRORS OCCURRED:\n{error_message}", 2)
+            self.logger.log(stdout.decode(errors="replace").rstrip(), 2)
+        self.log_stderr(result["returncode"], result["stderr"].decode(errors="replace").strip())
+        return result["returncode"] == 0
+
+    def wait_for_process(self, process: subprocess.Popen, stop_watchdog: Callable[[], dict] = None) -> dict:
+        """
+        Waits for a process to finish and collects its resource usage: CPU time via os.wait4, I/O
+        from /proc/<pid>/io and peak memory sampled by the watchdog (stopped before the finished process
+        is reaped, so that it never acts on a reused process id). The peak memory reported by os.wait4
+        is not used, on Linux it includes the memory of the process the command was forked from.
+        Falls back to a plain wait without CPU time and I/O where this is not available (e.g. Windows).
+
+        Args:
+            process (subprocess.Popen): The running process.
+            stop_watchdog (Callable[[], dict], optional): Stops the watchdog of the process (see start_watchdog).
+
+        Returns:
+            dict: Resource usage of the process, empty if not available.
+        """
+        if not hasattr(os, "wait4"):
+            process.wait()
+            return stop_watchdog() if stop_watchdog is not None else {}
+        usage = {}
+        # Wait for the process to exit without reaping it, so that /proc/<pid>/io is still available
+        if hasattr(os, "waitid"):
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            io_file = Path("/proc", str(process.pid), "io")
+            if io_file.exists():
+                io = dict(
+                    line.split(": ") for line in io_file.read_text().splitlines() if ": " in line
+                )
+                usage["read_bytes"] = int(io.get("rchar", 0))
+                usage["write_bytes"] = int(io.get("wchar", 0))
+                usage["storage_read_bytes"] = int(io.get("read_bytes", 0))
+                usage["storage_write_bytes"] = int(io.get("write_bytes", 0))
+        if stop_watchdog is not None:
+            usage.update(stop_watchdog())
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        usage["user_time"] = rusage.ru_utime
+        usage["system_time"] = rusage.ru_stime
+        return usage
+
+    def record_metrics(
+        self,
+        command: list[str],
+        start_time: float,
+        execution_time: float,
+        returncode: int,
+        usage: dict,
+        slots: list[int] = [],
+        file: Union[str, list] = "",
+    ) -> None:
+        """
+        Appends the resource usage of a finished command to the metrics file (JSON lines),
+        together with the information needed for the execution timeline (see RunTimeline).
+
+        Args:
+            command (list[str]): The executed command.
+            start_time (float): Start time of the command (seconds since epoch).
+            execution_time (float): Wall clock time in seconds.
+            returncode (int): The return code of the command.
+            usage (dict): Resource usage as returned by wait_for_process.
+            slots (list[int], optional): The process slots occupied by the command. Defaults to [].
+            file (Union[str, list], optional): The input file(s), taken from the command if not given. Defaults to "".
+        """
+        if not file:
+            file = self.get_command_file(command)
+        files = file if isinstance(file, list) else [file]
+        metrics = {
+            "tool": self.get_tool_name(command),
+            "command": command,
+            "file": ", ".join(Path(str(f)).name for f in files if f),
+            "start_time": start_time,
+            "end_time": start_time + execution_time,
+            "wall_time": execution_time,
+            "slots": slots,
+            "returncode": returncode,
+            "run_start_time": self.run_start_time,
+            **usage,
+        }
+        with self.metrics_lock:
+            with open(self.metrics_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(metrics) + "\n")
+
+    @staticmethod
+    def get_tool_name(command: list[str]) -> str:
+        """
+        Returns the name of the tool executed by a command, Python tools are identified by their script name.
+
+        Args:
+            command (list[str]): The command.
+
+        Returns:
+            str: The tool name, e.g. "FeatureFinderMetabo" or "export_ffm_df.py".
+        """
+        tool = Path(command[0]).name
+        if tool.startswith("python") and len(command) > 1:
+            tool = Path(command[1]).name
+        return tool
+
+    @staticmethod
+    def get_command_file(command: list[str]) -> Union[str, list]:
+        """
+        Returns the input file of a command: the value of the "-in" parameter for TOPP tools,
+        the "in" parameter from the parameter file for Python tools or the first existing file.
+
+        Args:
+            command (list[str]): The command.
+
+        Returns:
+            Union[str, list]: The input file(s), empty if no input file was found.
+        """
+        if "-in" in command[:-1]:
+            return command[command.index("-in") + 1]
+        tool = Path(command[0]).name
+        if tool.startswith("python") and len(command) > 2 and command[2].endswith(".json"):
+            try:
+                with open(command[2], "r", encoding="utf-8") as f:
+                    return json.load(f).get("in", "")
+            except (OSError, ValueError):
+                return ""
+        for part in command[1:]:
+            if Path(part).exists():
+                return part
+        return ""
+
+    def get_metrics(self) -> list[dict]:
+        """
+        Returns the resource usage of all commands of the current (or last) workflow run.
+
+        Returns:
+            list[dict]: Resource usage per command.
+        """
+        if not self.metrics_file.exists():
+            return []
+        with open(self.metrics_file, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def write_metrics_summary(self) -> None:
+        """
+        Aggregates the resource usage of all commands per tool and for the whole workflow run:
+        summed wall, user and system times and I/O, the number of commands and the peak memory.
+        """
+        summary = {"tools": {}, "total": {}}
+
+        def add(entry, metrics):
+            entry["commands"] = entry.get("commands", 0) + 1
+            for key in (
+                "wall_time",
+                "user_time",
+                "system_time",
+                "read_bytes",
+                "write_bytes",
+                "storage_read_bytes",
+                "storage_write_bytes",
+            ):
+                if key in metrics:
+                    entry[key] = entry.get(key, 0) + metrics[key]
+            if "max_rss_bytes" in metrics:
+                entry["max_rss_bytes"] = max(entry.get("max_rss_bytes", 0), metrics["max_rss_bytes"])
+
+        for metrics in self.get_metrics():
+            add(summary["tools"].setdefault(metrics["tool"], {}), metrics)
+            add(summary["total"], metrics)
+        with open(self.metrics_summary_file, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
 
     def run_topp(self, tool: str, input_output: dict, custom_params: dict = {}) -> None:
         """
@@ -142,12 +834,23 @@ class CommandExecutor:
             n_processes = max(io_lengths)
 
         commands = []
+        # Input file size for each command (for size-aware scheduling)
+        sizes = []
 
         # Load parameters for non-defaults
         params = self.parameter_manager.get_parameters_from_json()
+        # Number of threads per command, to determine how many commands can run in parallel
+        num_threads = 1
+        if tool in params.keys() and "threads" in params[tool]:
+            num_threads = int(params[tool]["threads"])
         # Construct commands for each process
         for i in range(n_processes):
             command = [tool]
+            if "in" in input_output:
+                in_files = input_output["in"][i if len(input_output["in"]) > 1 else 0]
+                if not isinstance(in_files, list):
+                    in_files = [in_files]
+                sizes.append(sum(Path(f).stat().st_size for f in in_files if Path(f).is_file()))
             # Add input/output files
             for k in input_output.keys():
                 # add key as parameter name
@@ -187,13 +890,61 @@ class CommandExecutor:
             if ini_path.exists():
                 command += ["-ini", str(ini_path)]
 
-        # Run command(s)
+        if len(commands) == 0:
+            raise Exception("No commands to execute.")
+
+        # Skip if this step has been run before with identical commands and inputs
+        outputs = self.get_step_files(input_output, outputs=True)
+        fingerprint = None
+        if outputs:
+            inputs = self.get_step_files(input_output, outputs=False)
+            inputs.append(str(Path(self.parameter_manager.ini_dir, tool + ".ini")))
+            fingerprint = self.get_step_fingerprint(tool, commands, inputs)
+            if self.restore_step(fingerprint):
+                self.logger.log(f"Skipping {tool}, results are up to date.")
+                self.progress.skip_step(tool)
+                return
+
+        if fingerprint is not None:
+            self.begin_step(fingerprint, tool, outputs)
+
+        # Run command(s), the step is shown as running once the first command occupied its process slots
+        step_id = self.progress.add_step(tool, len(commands), sum(sizes))
+        on_started = lambda: self.progress.step_started(step_id)
         if len(commands) == 1:
-            self.run_command(commands[0])
-        elif len(commands) > 1:
-            self.run_multiple_commands(commands)
+            success = self.run_command(commands[0], num_threads, on_started)
         else:
-            raise Exception("No commands to execute.")
+            success = self.run_multiple_commands(
+                commands,
+                num_threads,
+                sizes if sizes else None,
+                lambda: self.progress.file_done(step_id),
+                on_started,
+            )
+        self.progress.finish_step(step_id, success)
+
+        if success and fingerprint is not None:
+            self.record_step(fingerprint, tool, outputs)
+
+    @contextmanager
+    def parallel_steps(self):
+        """
+        Context manager to define workflow steps which are executed as a dependency graph.
+        Steps added within the context are executed when the context is left, each step as
+        soon as all steps it depends on (via shared input/output files) are finished, so
+        that independent branches of the workflow run concurrently.
+
+        Example:
+            with self.executor.parallel_steps() as steps:
+                steps.add(self.executor.run_topp, "FeatureLinkerUnlabeledKD", {"in": [ffm], "out": [consensus]})
+                steps.add(self.executor.run_python, "export_ffm_df", {"in": ffm}, outputs=[ffm_df_dir])
+
+        Yields:
+            StepGraph: The step graph to add steps to.
+        """
+        graph = StepGraph(self)
+        yield graph
+        graph.run()
 
     def stop(self) -> None:
         """
@@ -204,14 +955,14 @@ class CommandExecutor:
         
         for pid in pids:
             try:
-                os.kill(int(pid), 9)
+                self.kill_process_group(int(pid))
             except OSError as e:
                 self.logger.log(f"Failed to kill process {pid}: {e}")
         
         shutil.rmtree(self.pid_dir, ignore_errors=True)
         self.logger.log("WORKFLOW FINISHED - STOPPED MANUALLY")
 
-    def run_python(self, script_file: str, input_output: dict = {}) -> None:
+    def run_python(self, script_file: str, input_output: dict = {}, in_place: Union[str, list] = []) -> None:
         """
         Executes a specified Python script with dynamic input and output parameters,
         optionally logging the execution process. The method identifies and loads
@@ -228,7 +979,10 @@ class CommandExecutor:
                                 If the path is omitted, the method looks for the script in 'src/python-tools/'.
                                 The '.py' extension is appended if not present.
             input_output (dict, optional): A dictionary specifying the input/output parameter names (as key) and their corresponding file paths (as value). Defaults to {}.
+            in_place (Union[str, list], optional): Files modified in place by the script. They are fingerprinted
+                as inputs before and as outputs after the script runs, but not removed before it runs. Defaults to [].
         """
+        in_place = [str(f) for f in (in_place if isinstance(in_place, list) else [in_place])]
         # Check if script file exists (can be specified without path and extension)
         # default location: src/python-tools/script_file
         if not script_file.endswith(".py"):
@@ -239,17 +993,15 @@ class CommandExecutor:
             if not path.exists():
                 self.logger.log(f"Script file not found: {script_file}")
                 
-        # load DEFAULTS
-        if path.parent not in sys.path:
-            sys.path.append(str(path.parent))
-        spec = importlib.util.spec_from_file_location(path.stem, path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        defaults = getattr(module, "DEFAULTS", None)
+        # load DEFAULTS (without importing the script)
+        defaults = self.parameter_manager.get_python_tool_defaults(path)
         if defaults is None:
             self.logger.log(f"WARNING: No DEFAULTS found in {path.name}")
             # run command without params
-            self.run_command(["python", str(path)])
+            step_id = self.progress.add_step(path.name)
+            self.progress.finish_step(
+                step_id, self.run_command(["python", str(path)], on_started=lambda: self.progress.step_started(step_id))
+            )
         elif isinstance(defaults, list):
             defaults = {entry["key"]: entry["value"] for entry in defaults}
             # load paramters from JSON file
@@ -259,11 +1011,320 @@ class CommandExecutor:
                 defaults[k.replace(f"{path.name}:", "")] = v
             for k, v in input_output.items():
                 defaults[k] = v
-            # save parameters to temporary JSON file
-            tmp_params_file = Path(self.pid_dir.parent, f"{path.stem}.json")
-            with open(tmp_params_file, "w", encoding="utf-8") as f:
-                json.dump(defaults, f, indent=4)
-            # run command
-            self.run_command(["python", str(path), str(tmp_params_file)])
-            # remove tmp params file
-            tmp_params_file.unlink()
\ No newline at end of file
+            # Skip if this script has been run before with identical parameters and inputs
+            # (only possible for scripts with declared output files). Files modified in place are
+            # inputs as well as outputs: the step runs again if they were re-created by previous steps.
+            outputs = self.get_step_files(input_output, outputs=True)
+            outputs += [f for f in in_place if f not in outputs]
+            fingerprint = None
+            if outputs:
+                inputs = self.get_step_files(input_output, outputs=False) + in_place + [str(path)]
+                fingerprint = self.get_step_fingerprint(path.name, defaults, inputs)
+                if self.restore_step(fingerprint):
+                    self.logger.log(f"Skipping {path.name}, results are up to date.")
+                    self.progress.skip_step(path.name)
+                    return
+                self.begin_step(fingerprint, path.name, [f for f in outputs if f not in in_place])
+            # Scripts with a "threads" parameter occupy as many process slots (at most all of them)
+            # and get the number of granted slots passed, e.g. to size their process pools
+            num_threads = 1
+            if "threads" in defaults:
+                num_threads = min(max(1, int(defaults["threads"])), self.max_slots)
+                defaults["threads"] = num_threads
+            step_id = self.progress.add_step(
+                path.name, input_bytes=self.get_input_size(self.get_step_files(input_output, outputs=False))
+            )
+            on_started = lambda: self.progress.step_started(step_id)
+            # Scripts with a "threads" parameter start their own process pools, they run in a new process
+            # instead of a worker (pools are not nested in the worker pool)
+            if (
+                self.python_workers is not None
+                and "threads" not in defaults
+                and self.parameter_manager.python_tool_has_main(path)
+            ):
+                # run in a Python worker process with preloaded modules
+                success = self.run_python_in_worker(path, defaults, num_threads, on_started)
+            else:
+                # save parameters to temporary JSON file
+                # (unique per thread, the same script can run in concurrent workflow steps)
+                tmp_params_file = Path(self.pid_dir.parent, f"{path.stem}-{threading.get_ident()}.json")
+                with open(tmp_params_file, "w", encoding="utf-8") as f:
+                    json.dump(defaults, f, indent=4)
+                # run command
+                success = self.run_command(["python", str(path), str(tmp_params_file)], num_threads, on_started)
+                # remove tmp params file
+                tmp_params_file.unlink()
+            self.progress.finish_step(step_id, success)
+            if success and fingerprint is not None:
+                self.record_step(fingerprint, path.name, outputs)
+
+    def get_step_files(self, input_output: dict, outputs: bool) -> list[str]:
+        """
+        Collects the input or output files of a step from its input/output dictionary.
+        Parameter names "out", starting with "out_" or ending with "_out" are considered outputs.
+
+        Args:
+            input_output (dict): A dictionary specifying the input/output parameter names (as key) and their corresponding file paths (as value).
+            outputs (bool): Whether to return output files (True) or input files (False).
+
+        Returns:
+            list[str]: A flat list of file paths.
+        """
+        files = []
+        for k, v in input_output.items():
+            is_output = k == "out" or k.startswith("out_") or k.endswith("_out")
+            if is_output != outputs:
+                continue
+            for entry in v if isinstance(v, list) else [v]:
+                files += [str(f) for f in (entry if isinstance(entry, list) else [entry])]
+        return files
+
+    @staticmethod
+    def get_input_size(files: list[str]) -> int:
+        """
+        Returns the summed size of existing files in bytes (directories are not counted).
+
+        Args:
+            files (list[str]): File paths.
+
+        Returns:
+            int: Size in bytes.
+        """
+        return sum(Path(f).stat().st_size for f in files if Path(f).is_file())
+
+    def get_cached_path(self, path: str) -> Union[Path, None]:
+        """
+        Returns the location of a results file in the results of the previous run,
+        or None if the file is not located in the results directory.
+        """
+        path = Path(path).resolve()
+        results_dir = self.results_dir.resolve()
+        if not path.is_relative_to(results_dir):
+            return None
+        return Path(self.cache_dir.resolve(), path.relative_to(results_dir))
+
+    def get_file_fingerprint(self, path: str) -> Union[str, None]:
+        """
+        Returns a fingerprint for a file: the SHA-256 hash of its content for files up to 64 MB,
+        size and modification time for larger files. Directories are fingerprinted by the files
+        they contain. Files which have not been (re-)created in the current run are looked up in
+        the results of the previous run.
+
+        Args:
+            path (str): The file path.
+
+        Returns:
+            Union[str, None]: The fingerprint or None if the file does not exist.
+        """
+        path = Path(path)
+        if not path.exists():
+            cached_path = self.get_cached_path(path)
+            if cached_path is None or not cached_path.exists():
+                return None
+            path = cached_path
+        if path.is_dir():
+            content = [
+                f"{p.relative_to(path)}:{self.get_file_fingerprint(p)}"
+                for p in sorted(path.rglob("*"))
+                if p.is_file()
+            ]
+            return hashlib.sha256("\n".join(content).encode()).hexdigest()
+        stat = path.stat()
+        if stat.st_size > 64 * 1024 * 1024:
+            return f"{stat.st_size}-{stat.st_mtime_ns}"
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    def get_step_fingerprint(self, tool: str, resolved_params: Union[list, dict], inputs: list[str]) -> str:
+        """
+        Calculates a fingerprint for a workflow step from the tool name, the fully resolved
+        parameters (commands for TOPP tools) and the fingerprints of all input files.
+
+        Args:
+            tool (str): The TOPP tool or Python script name.
+            resolved_params (Union[list, dict]): Commands or parameters passed to the tool.
+            inputs (list[str]): Input file paths.
+
+        Returns:
+            str: The step fingerprint.
+        """
+        data = {
+            "tool": tool,
+            "params": resolved_params,
+            "inputs": {f: self.get_file_fingerprint(f) for f in inputs},
+        }
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+    def run_command_step(
+        self,
+        command: list[str],
+        inputs: list[str],
+        outputs: list[str],
+        num_threads: int = 1,
+        create_output_dirs: bool = False,
+    ) -> bool:
+        """
+        Executes a command (e.g. an external tool other than TOPP tools) as a workflow step:
+        the command is skipped if it has been run before with identical inputs and its outputs
+        are unchanged, partial outputs of an interrupted run are removed before it runs again.
+
+        Args:
+            command (list[str]): The shell command to execute, provided as a list of strings.
+            inputs (list[str]): Input files (or directories) of the command.
+            outputs (list[str]): Output files (or directories) of the command.
+            num_threads (int, optional): Number of threads used by the command. Defaults to 1.
+            create_output_dirs (bool, optional): Create outputs as empty directories before running the command. Defaults to False.
+
+        Returns:
+            bool: True if the command finished successfully or was skipped.
+        """
+        command = [str(c) for c in command]
+        outputs = [str(f) for f in outputs]
+        tool = Path(command[0]).name
+        fingerprint = self.get_step_fingerprint(tool, command, [str(f) for f in inputs])
+        if self.restore_step(fingerprint):
+            self.logger.log(f"Skipping {tool} ({', '.join(Path(f).name for f in outputs)}), results are up to date.")
+            self.progress.skip_step(tool)
+            return True
+        self.begin_step(fingerprint, tool, outputs)
+        if create_output_dirs:
+            for output in outputs:
+                Path(output).mkdir(parents=True, exist_ok=True)
+        step_id = self.progress.add_step(tool, input_bytes=self.get_input_size(inputs))
+        success = self.run_command(command, num_threads, lambda: self.progress.step_started(step_id))
+        self.progress.finish_step(step_id, success)
+        if success:
+            self.record_step(fingerprint, tool, outputs)
+        return success
+
+    def begin_step(self, fingerprint: str, tool: str, outputs: list[str]) -> None:
+        """
+        Marks a step as running and removes its outputs (from an interrupted run or a previous run
+        with different inputs). The marker is removed by record_step once the step is complete.
+
+        Args:
+            fingerprint (str): The step fingerprint.
+            tool (str): The TOPP tool or Python script name.
+            outputs (list[str]): Output file paths.
+        """
+        self.step_dir.mkdir(parents=True, exist_ok=True)
+        with open(Path(self.step_dir, f"{fingerprint}.running"), "w", encoding="utf-8") as f:
+            json.dump({"tool": tool, "outputs": outputs}, f, indent=4)
+        self.remove_outputs(outputs)
+
+    def remove_outputs(self, outputs: list[str]) -> None:
+        """
+        Removes output files of a step from the results and the previous results.
+        Output directories are emptied in the results (tools might expect them to exist).
+
+        Args:
+            outputs (list[str]): Output file paths.
+        """
+        for output in outputs:
+            cached_path = self.get_cached_path(output)
+            if cached_path is not None and cached_path.is_dir():
+                shutil.rmtree(cached_path)
+            elif cached_path is not None and cached_path.exists():
+                cached_path.unlink()
+            path = Path(output)
+            if path.is_dir():
+                shutil.rmtree(path)
+                path.mkdir()
+            elif path.exists():
+                path.unlink()
+
+    def restore_step(self, fingerprint: str) -> bool:
+        """
+        Checks if a step with the given fingerprint was executed before and all of its outputs
+        are unchanged since. If so, outputs are moved back from the results of the previous run.
+
+        Args:
+            fingerprint (str): The step fingerprint.
+
+        Returns:
+            bool: True if the step does not need to be executed again.
+        """
+        record_file = Path(self.step_dir, f"{fingerprint}.json")
+        if not record_file.exists():
+            return False
+        with open(record_file, "r", encoding="utf-8") as f:
+            record = json.load(f)
+        for output, output_fingerprint in record["outputs"].items():
+            if self.get_file_fingerprint(output) != output_fingerprint:
+                return False
+        for output in record["outputs"].keys():
+            cached_path = self.get_cached_path(output)
+            if not Path(output).exists() and cached_path is not None and cached_path.exists():
+                Path(output).parent.mkdir(parents=True, exist_ok=True)
+                os.replace(cached_path, output)
+        self.used_steps.add(fingerprint)
+        return True
+
+    def record_step(self, fingerprint: str, tool: str, outputs: list[str]) -> None:
+        """
+        Stores the fingerprint of a successfully executed step together with the
+        fingerprints of its output files.
+
+        Args:
+            fingerprint (str): The step fingerprint.
+            tool (str): The TOPP tool or Python script name.
+            outputs (list[str]): Output file paths.
+        """
+        self.step_dir.mkdir(parents=True, exist_ok=True)
+        record = {
+            "tool": tool,
+            "outputs": {f: self.get_file_fingerprint(f) for f in outputs},
+        }
+        with open(Path(self.step_dir, f"{fingerprint}.json"), "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=4)
+        Path(self.step_dir, f"{fingerprint}.running").unlink(missing_ok=True)
+        self.used_steps.add(fingerprint)
+
+    def cache_previous_results(self, force_rerun: bool = False) -> None:
+        """
+        Prepares the results directory for a new run. Results of the previous run are moved
+        to a cache directory, from where outputs of unchanged steps are restored. If the
+        previous run did not finish, its partial results are merged into the cache.
+
+        Args:
+            force_rerun (bool, optional): Remove all previous results and step fingerprints instead. Defaults to False.
+        """
+        if force_rerun:
+            shutil.rmtree(self.results_dir, ignore_errors=True)
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            shutil.rmtree(self.step_dir, ignore_errors=True)
+            self.results_dir.mkdir(parents=True, exist_ok=True)
+            return
+        # Remove partial outputs of steps which have been interrupted (workflow stopped or crashed)
+        if self.step_dir.exists():
+            for marker in self.step_dir.glob("*.running"):
+                with open(marker, "r", encoding="utf-8") as f:
+                    step = json.load(f)
+                self.logger.log(f"Removing partial results of interrupted step {step['tool']}.")
+                self.remove_outputs(step["outputs"])
+                marker.unlink()
+        if self.results_dir.exists():
+            if self.cache_dir.exists():
+                for f in self.results_dir.rglob("*"):
+                    if f.is_file():
+                        target = Path(self.cache_dir, f.relative_to(self.results_dir))
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        os.replace(f, target)
+                shutil.rmtree(self.results_dir)
+            else:
+                self.results_dir.rename(self.cache_dir)
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+
+    def remove_previous_results(self) -> None:
+        """
+        Removes the cached results of the previous run and fingerprints of steps
+        which were not part of the current run.
+        """
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        if self.step_dir.exists():
+            for record_file in self.step_dir.iterdir():
+                if record_file.stem not in self.used_steps:
+                    record_file.unlink()
\ No newline at end of file
@@ -0,0 +1,207 @@
+from pathlib import Path
+import os
+import time
+import heapq
+import sqlite3
+from typing import Union
+
+
+class JobQueue:
+    """
+    A server-wide queue for workflow runs, backed by a SQLite database shared by all workspaces.
+
+    Every started workflow process registers as a job and waits until it is admitted to one of
+    the worker slots (number of workflows allowed to run at the same time). Waiting jobs pull
+    free slots themselves: a job is admitted if a slot is free and it is the next job according to
+    fair share, i.e. from the workspace with the fewest running jobs, then the earliest submitted.
+    Jobs of processes which do not exist anymore (stopped or crashed) are removed. Processes are
+    identified by process id and start time, so that a reused process id does not keep a job alive.
+    Failed jobs are removed when they finish, of successful jobs only the last HISTORY are kept
+    (for the estimated waiting time).
+
+    Attributes:
+        db_file (Path): The SQLite database file.
+        slots (int): Maximum number of workflows running at the same time.
+        workspace (str): The workspace of this workflow.
+        workflow_dir (str): The workflow directory, identifies the jobs of this workflow.
+    """
+
+    # Number of successfully finished jobs kept to estimate the run time of workflows
+    HISTORY = 50
+
+    def __init__(self, db_file: Path, slots: int, workflow_dir: Path) -> None:
+        self.db_file = Path(db_file)
+        self.slots = slots
+        self.workflow_dir = str(Path(workflow_dir).resolve())
+        self.workspace = str(Path(workflow_dir).resolve().parent)
+        self.job_id = None
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.db_file, timeout=60, isolation_level=None)
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                workspace TEXT,
+                workflow_dir TEXT,
+                pid INTEGER,
+                state TEXT,
+                submitted REAL,
+                started REAL,
+                finished REAL
+            )"""
+        )
+        # Jobs of earlier versions were only identified by the process id
+        if "pid_start_time" not in [c[1] for c in connection.execute("PRAGMA table_info(jobs)")]:
+            connection.execute("ALTER TABLE jobs ADD COLUMN pid_start_time INTEGER")
+        return connection
+
+    @staticmethod
+    def _get_start_time(pid: int) -> Union[int, None]:
+        """
+        Returns the start time of a process in clock ticks after system boot from /proc/<pid>/stat
+        (Linux only), None if not available.
+        """
+        try:
+            # The command name (second field) can contain spaces, fields after it are fixed
+            fields = Path("/proc", str(pid), "stat").read_text().rsplit(")", 1)[1].split()
+            # Fields after the command name: state, ppid, ..., starttime (22nd)
+            return int(fields[19])
+        except (OSError, IndexError, ValueError):
+            return None
+
+    @classmethod
+    def _is_alive(cls, pid: int, start_time: Union[int, None] = None) -> bool:
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return False
+        # A different start time means that the process id was reused by another process
+        return start_time is None or cls._get_start_time(pid) == start_time
+
+    def _remove_dead_jobs(self, connection: sqlite3.Connection) -> None:
+        # Needs to be called within a transaction
+        for job_id, pid, start_time in connection.execute(
+            "SELECT id, pid, pid_start_time FROM jobs WHERE state IN ('queued', 'running')"
+        ).fetchall():
+            if not self._is_alive(pid, start_time):
+                connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def _next_jobs(self, connection: sqlite3.Connection) -> list[int]:
+        # Queued job ids in fair share order: workspaces with fewer running jobs first, then by submission time
+        running = dict(
+            connection.execute(
+                "SELECT workspace, COUNT(*) FROM jobs WHERE state = 'running' GROUP BY workspace"
+            ).fetchall()
+        )
+        queued = connection.execute(
+            "SELECT id, workspace, submitted FROM jobs WHERE state = 'queued' ORDER BY submitted"
+        ).fetchall()
+        order = []
+        # Simulate admission: each admitted job counts as running for its workspace
+        while queued:
+            job = min(queued, key=lambda j: (running.get(j[1], 0), j[2]))
+            order.append(job[0])
+            running[job[1]] = running.get(job[1], 0) + 1
+            queued.remove(job)
+        return order
+
+    def wait_for_slot(self, poll_interval: float = 2) -> bool:
+        """
+        Registers the current process as a job and blocks until it is admitted to a worker slot.
+
+        Args:
+            poll_interval (float, optional): Seconds between attempts to get a slot. Defaults to 2.
+
+        Returns:
+            bool: True if the job had to wait in the queue.
+        """
+        connection = self._connect()
+        connection.execute(
+            "INSERT INTO jobs (workspace, workflow_dir, pid, pid_start_time, state, submitted) VALUES (?, ?, ?, ?, 'queued', ?)",
+            (self.workspace, self.workflow_dir, os.getpid(), self._get_start_time(os.getpid()), time.time()),
+        )
+        self.job_id = connection.execute("SELECT last_insert_rowid()").fetchone()[0]
+        waited = False
+        while True:
+            connection.execute("BEGIN IMMEDIATE")
+            self._remove_dead_jobs(connection)
+            n_running = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = 'running'"
+            ).fetchone()[0]
+            next_jobs = self._next_jobs(connection)
+            if n_running < self.slots and next_jobs and next_jobs[0] == self.job_id:
+                connection.execute(
+                    "UPDATE jobs SET state = 'running', started = ? WHERE id = ?",
+                    (time.time(), self.job_id),
+                )
+                connection.execute("COMMIT")
+                connection.close()
+                return waited
+            connection.execute("COMMIT")
+            waited = True
+            time.sleep(poll_interval)
+
+    def finish(self, success: bool = True) -> None:
+        """
+        Marks the job of the current process as finished, which frees its slot. Failed jobs are
+        removed, of successful jobs only the last HISTORY are kept.
+
+        Args:
+            success (bool, optional): Whether the workflow finished successfully. Defaults to True.
+        """
+        if self.job_id is None:
+            return
+        connection = self._connect()
+        if success:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("UPDATE jobs SET state = 'done', finished = ? WHERE id = ?", (time.time(), self.job_id))
+            connection.execute(
+                "DELETE FROM jobs WHERE state NOT IN ('queued', 'running') AND id NOT IN "
+                "(SELECT id FROM jobs WHERE state = 'done' ORDER BY finished DESC LIMIT ?)",
+                (self.HISTORY,),
+            )
+            connection.execute("COMMIT")
+        else:
+            connection.execute("DELETE FROM jobs WHERE id = ?", (self.job_id,))
+        connection.close()
+        self.job_id = None
+
+    def get_queue_status(self) -> dict:
+        """
+        Returns the position of this workflow in the queue and an estimate when it will start,
+        based on the average duration of previously finished workflow runs.
+
+        Returns:
+            dict: "position" (1 = next) and "estimated_wait" (seconds or None if no estimate is available),
+                or an empty dict if the workflow is not waiting in the queue.
+        """
+        if not self.db_file.exists():
+            return {}
+        connection = self._connect()
+        queued = connection.execute(
+            "SELECT id FROM jobs WHERE state = 'queued' AND workflow_dir = ?", (self.workflow_dir,)
+        ).fetchone()
+        if queued is None:
+            connection.close()
+            return {}
+        next_jobs = self._next_jobs(connection)
+        position = next_jobs.index(queued[0]) + 1
+        average = connection.execute(
+            "SELECT AVG(finished - started) FROM (SELECT finished, started FROM jobs WHERE state = 'done' ORDER BY finished DESC LIMIT ?)",
+            (self.HISTORY,),
+        ).fetchone()[0]
+        running = [
+            r[0] for r in connection.execute("SELECT started FROM jobs WHERE state = 'running'").fetchall()
+        ]
+        connection.close()
+        if average is None:
+            return {"position": position, "estimated_wait": None}
+        # Simulate the slots: running jobs finish after the average duration, queued jobs ahead follow
+        now = time.time()
+        slot_free = [max(0, started + average - now) for started in running]
+        slot_free += [0] * max(0, self.slots - len(slot_free))
+        heapq.heapify(slot_free)
+        for _ in range(position - 1):
+            heapq.heappush(slot_free, heapq.heappop(slot_free) + average)
+        return {"position": position, "estimated_wait": slot_free[0]}
@@ -1,42 +1,168 @@
 from pathlib import Path
+import os
+import json
+import time
+import threading
 
 class Logger:
     """
-    A simple logging class for writing messages to a log file. input_widgetThis class is designed
+    A simple logging class for writing messages to a log file. This class is designed
     to append messages to a log file in the current workflow directory, facilitating
     easy tracking of events, errors, or other significant occurrences in processes called
     during workflow execution.
 
+    Messages are written as events with level tags to a single JSON lines file. Events are
+    buffered and appended in batches with a single write call (safe for concurrent threads and
+    processes). The human readable logs ("minimal", "commands and run times" and "all") are
+    derived from the events when reading.
+
     Attributes:
         log_file (Path): The file path of the log file where messages will be written.
     """
+
+    # Human readable log views and the maximum message level they contain
+    VIEWS = {"minimal": 0, "commands and run times": 1, "all": 2}
+
+    # Buffered events are written when this many events are buffered or the oldest is older than FLUSH_INTERVAL seconds
+    FLUSH_EVENTS = 100
+    FLUSH_INTERVAL = 0.5
+
     def __init__(self, workflow_dir: Path) -> None:
         self.workflow_dir = workflow_dir
+        self.log_file = Path(workflow_dir, "logs", "events.jsonl")
+        self._init_buffer()
+
+    def _init_buffer(self) -> None:
+        # Buffer, lock and flush thread are process specific, they are re-created in new (e.g. forked) processes
+        self._pid = os.getpid()
+        self._buffer = []
+        self._buffer_time = 0
+        self._lock = threading.Lock()
+        # Background thread writing buffered events, started with the first buffered event
+        self._flush_thread = None
+
+    def _check_process(self) -> None:
+        if self._pid != os.getpid():
+            self._init_buffer()
 
     def log(self, message: str, level: int = 0) -> None:
         """
-        Appends a given message to the log file, followed by two newline characters
-        for readability. This method ensures that each logged message is separated
-        for clear distinction in the log file.
+        Adds a given message to the log. Messages of level 0 are written immediately,
+        others are buffered for a short time.
 
         Args:
             message (str): The message to be logged to the file.
             level (int, optional): The level of importance of the message. Defaults to 0.
         """
-        log_dir = Path(self.workflow_dir, "logs")
-        if not log_dir.exists():
-            log_dir.mkdir()
-        # Write the message to the log file.
-        if level == 0:
-            with open(Path(log_dir, "minimal.log"), "a", encoding="utf-8") as f:
-                f.write(f"{message}\n\n")
-        if level <= 1:
-            with open(Path(log_dir, "commands-and-run-times.log"), "a", encoding="utf-8") as f:
-                f.write(f"{message}\n\n")
-        if level <= 2:
-            with open(Path(log_dir, "all.log"), "a", encoding="utf-8") as f:
-                f.write(f"{message}\n\n")
-        # log_types = ["minimal", "commands and run times", "tool outputs", "all"]
-        # for i, log_type in enumerate(log_types):
-        #     with open(Path(log_dir, f"{log_type.replace(" ", "-")}.log"), "a", encoding="utf-8") as f:
-        #         f.write(f"{message}\n\n")
\ No newline at end of file
+        self._check_process()
+        event = {"time": time.time(), "level": level, "pid": os.getpid(), "message": message}
+        with self._lock:
+            if not self._buffer:
+                self._buffer_time = event["time"]
+            self._buffer.append(event)
+            if (
+                level == 0
+                or len(self._buffer) >= self.FLUSH_EVENTS
+                or event["time"] - self._buffer_time >= self.FLUSH_INTERVAL
+            ):
+                self._flush()
+            elif self._flush_thread is None:
+                self._flush_thread = threading.Thread(target=self._flush_periodically, daemon=True)
+                self._flush_thread.start()
+
+    def flush(self) -> None:
+        """
+        Writes all buffered events to the log file.
+        """
+        self._check_process()
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        # Needs to be called with the lock acquired
+        if not self._buffer:
+            return
+        data = "".join(json.dumps(event) + "\n" for event in self._buffer).encode("utf-8")
+        self._buffer = []
+        self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        # A single write in append mode, events from different processes are never interleaved
+        fd = os.open(self.log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _flush_periodically(self) -> None:
+        # Writes buffered events until no new events are logged, then stops until the next event is buffered
+        while True:
+            time.sleep(self.FLUSH_INTERVAL)
+            with self._lock:
+                if not self._buffer:
+                    self._flush_thread = None
+                    return
+                self._flush()
+
+    def get_events(self, level: int = 2) -> list[dict]:
+        """
+        Reads all logged events up to the given level.
+
+        Args:
+            level (int, optional): The maximum level of events to return. Defaults to 2.
+
+        Returns:
+            list[dict]: The events with time, level, pid and message.
+        """
+        self.flush()
+        if not self.log_file.exists():
+            return []
+        events = []
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # Incomplete last line while another process is writing
+                    continue
+                if event["level"] <= level:
+                    events.append(event)
+        return events
+
+    def read_events(self, offset: int = 0, level: int = 2) -> tuple[list[dict], int]:
+        """
+        Reads events which were logged after a given position in the log file, e.g. to follow
+        the log of a running workflow. Only complete lines are read.
+
+        Args:
+            offset (int, optional): Position in bytes to start reading at (returned by the previous call). Defaults to 0.
+            level (int, optional): The maximum level of events to return. Defaults to 2.
+
+        Returns:
+            tuple[list[dict], int]: The new events and the position to continue reading at.
+        """
+        self.flush()
+        events = []
+        with open(self.log_file, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        # Ignore an incomplete last line while another process is writing
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].splitlines():
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if event["level"] <= level:
+                events.append(event)
+        return events, offset + complete
+
+    def get_log(self, view: str = "all") -> str:
+        """
+        Returns a human readable log, each message followed by an empty line.
+
+        Args:
+            view (str, optional): One of "minimal", "commands and run times" and "all". Defaults to "all".
+
+        Returns:
+            str: The log content.
+        """
+        return "".join(f"{event['message']}\n\n" for event in self.get_events(self.VIEWS[view]))
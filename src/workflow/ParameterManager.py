@@ -3,6 +3,15 @@ import json
 import shutil
 import streamlit as st
 from pathlib import Path
+import ast
+import copy
+import os
+import re
+import sys
+import subprocess
+import tempfile
+import importlib.util
+from typing import Any, Union
 
 class ParameterManager:
     """
@@ -17,6 +26,21 @@ class ParameterManager:
         param_prefix (str): Prefix for general parameter keys in Streamlit's session state.
         topp_param_prefix (str): Prefix for TOPP tool parameter keys in Streamlit's session state.
     """
+    # DEFAULTS and main function of python-tools by script path, together with the file
+    # modification time (shared between instances, e.g. across Streamlit reruns)
+    _python_tools_cache = {}
+
+    # Default parameters of TOPP tools by OpenMS version and tool name, shared by all workspaces.
+    # Default INI files are written once per OpenMS version to a shared directory, so that new
+    # sessions and other app processes do not have to run the tools again.
+    _topp_defaults_cache = {}
+    _openms_version = None
+    topp_ini_cache_dir = Path(tempfile.gettempdir(), "openms-topp-ini")
+
+    # Parsed parameter files (params.json and workspace TOPP parameters) by path, together with
+    # modification time and size of the file (shared between instances, e.g. across Streamlit reruns)
+    _file_cache = {}
+
     # Methods related to parameter handling
     def __init__(self, workflow_dir: Path):
         self.ini_dir = Path(workflow_dir, "ini")
@@ -56,9 +80,10 @@ class ParameterManager:
         for tool in current_topp_tools:
             if tool not in json_params:
                 json_params[tool] = {}
-            # load the param object
-            param = poms.Param()
-            poms.ParamXMLFile().load(str(Path(self.ini_dir, f"{tool}.ini")), param)
+            # load the param object (defaults with workspace custom defaults, cached)
+            param = self._get_topp_param(tool)
+            if param is None:
+                continue
             # get all session state param keys and values for this tool
             for key, value in st.session_state.items():
                 if key.startswith(f"{self.topp_param_prefix}{tool}:1:"):
@@ -73,30 +98,138 @@ class ParameterManager:
                     ):
                         # store non-default value
                         json_params[tool][key.split(":1:")[1]] = value
-        # Save to json file
+        # Save to json file (unchanged parameters are not written, the parsed file stays cached)
+        if self.params_file.exists() and json_params == self._get_json_params():
+            return
         with open(self.params_file, "w", encoding="utf-8") as f:
             json.dump(json_params, f, indent=4)
 
-    def get_parameters_from_json(self) -> None:
+    def get_parameters_from_json(self) -> dict:
         """
         Loads parameters from the JSON file if it exists and returns them as a dictionary.
-        If the file does not exist, it returns an empty dictionary.
+        If the file does not exist, it returns an empty dictionary. The parsed file is cached
+        until it is modified.
 
         Returns:
             dict: A dictionary containing the loaded parameters. Keys are parameter names,
                 and values are parameter values.
         """
-        # Check if parameter file exists
-        if not Path(self.params_file).exists():
+        return copy.deepcopy(self._get_json_params())
+
+    def _get_json_params(self) -> dict:
+        # Cached parameters from the JSON file, must not be modified
+        try:
+            params = self._get_cached(self.params_file, self._load_json)
+        except (OSError, ValueError):
+            st.error("**ERROR**: Attempting to load an invalid JSON parameter file. Reset to defaults.")
             return {}
-        else:
-            # Load parameters from json file
-            try:
-                with open(self.params_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except:
-                st.error("**ERROR**: Attempting to load an invalid JSON parameter file. Reset to defaults.")
-                return {}
+        return {} if params is None else params
+
+    @staticmethod
+    def _load_json(path: Path) -> dict:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @classmethod
+    def _get_cached(cls, path: Path, load) -> Any:
+        """
+        Returns the parsed content of a parameter file, parsed with the given function only
+        if the file was modified (modification time or size changed) since it was parsed last.
+
+        Args:
+            path (Path): The file.
+            load (Callable[[Path], Any]): Function which parses the file.
+
+        Returns:
+            Any: The parsed content or None if the file does not exist.
+        """
+        key = str(Path(path).resolve())
+        try:
+            stat = Path(path).stat()
+        except FileNotFoundError:
+            cls._file_cache.pop(key, None)
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if key not in cls._file_cache or cls._file_cache[key][0] != stamp:
+            cls._file_cache[key] = (stamp, load(path))
+        return cls._file_cache[key][1]
+
+    @staticmethod
+    def _convert(value: Any, like: Any) -> Any:
+        # Converts a value (e.g. from the JSON file or session state) to the type of another value
+        if like is None or value is None or isinstance(value, type(like)):
+            return value
+        if isinstance(like, bool):
+            return str(value).lower() in ("true", "1", "yes")
+        if isinstance(like, (int, float)):
+            return type(like)(value)
+        if isinstance(like, list):
+            return value.split("\n") if isinstance(value, str) else list(value)
+        return str(value)
+
+    def get_value(self, key: str, default: Any = None) -> Any:
+        """
+        Returns a general parameter from the JSON file, converted to the type of the default value.
+
+        Args:
+            key (str): The parameter name.
+            default (Any, optional): The value if the parameter is not set. Defaults to None.
+
+        Returns:
+            Any: The parameter value.
+        """
+        params = self._get_json_params()
+        if key not in params:
+            return default
+        return self._convert(copy.deepcopy(params[key]), default)
+
+    def get_topp_value(self, tool: str, name: str) -> Any:
+        """
+        Returns the value of a TOPP tool parameter: the value set by the user, otherwise the
+        custom default of the workspace or the default of the tool, converted to the parameter type.
+
+        Args:
+            tool (str): The TOPP tool name.
+            name (str): The parameter name without tool prefix, e.g. "algorithm:common:noise_threshold_int".
+
+        Returns:
+            Any: The parameter value or None if the parameter does not exist.
+        """
+        param = self._get_topp_param(tool)
+        key = f"{tool}:1:{name}".encode()
+        if param is None or not param.exists(key):
+            return None
+        value = param.getValue(key)
+        user_params = self._get_json_params().get(tool, {})
+        if name in user_params:
+            value = self._convert(copy.deepcopy(user_params[name]), value)
+        return value
+
+    def get_topp_diff(self, tool: str) -> dict:
+        """
+        Returns all parameters of a TOPP tool which differ from the defaults of the tool
+        (custom defaults of the workspace and values set by the user).
+
+        Args:
+            tool (str): The TOPP tool name.
+
+        Returns:
+            dict: Values by parameter name (without tool prefix).
+        """
+        defaults = self._get_topp_defaults(tool)
+        if defaults is None:
+            return {}
+        prefix = f"{tool}:1:"
+        diff = {}
+        for key in defaults.keys():
+            # Keys are bytes in older pyOpenMS versions
+            name = key.decode() if isinstance(key, bytes) else key
+            if not name.startswith(prefix):
+                continue
+            value = self.get_topp_value(tool, name[len(prefix):])
+            if value != defaults.getValue(key):
+                diff[name[len(prefix):]] = value
+        return diff
 
     def reset_to_default_parameters(self) -> None:
         """
@@ -104,4 +237,191 @@ class ParameterManager:
         JSON file.
         """
         # Delete custom params json file
-        self.params_file.unlink(missing_ok=True)
\ No newline at end of file
+        self.params_file.unlink(missing_ok=True)
+
+    @classmethod
+    def get_openms_version(cls) -> str:
+        """
+        Returns the version of the installed OpenMS TOPP tools (determined once per process),
+        or the pyOpenMS version if the TOPP tools are not available.
+
+        Returns:
+            str: The OpenMS version, e.g. "3.2.0".
+        """
+        if cls._openms_version is None:
+            cls._openms_version = poms.__version__
+            try:
+                result = subprocess.run(
+                    ["FileFilter", "--help"], capture_output=True, text=True, timeout=60
+                )
+                match = re.search(r"Version: (\S+)", result.stdout + result.stderr)
+                if match:
+                    cls._openms_version = match.group(1)
+            except (OSError, subprocess.SubprocessError):
+                pass
+        return cls._openms_version
+
+    @classmethod
+    def get_topp_defaults(cls, tool: str) -> Union[poms.Param, None]:
+        """
+        Returns the default parameters of a TOPP tool. The default INI file is written with
+        -write_ini only once per OpenMS version (shared directory), parsed parameters are cached
+        in memory.
+
+        Args:
+            tool (str): The TOPP tool name.
+
+        Returns:
+            Union[poms.Param, None]: A copy of the default parameters or None if the tool was not found.
+        """
+        param = cls._get_topp_defaults(tool)
+        return None if param is None else poms.Param(param)
+
+    @classmethod
+    def _get_topp_defaults(cls, tool: str) -> Union[poms.Param, None]:
+        # Cached default parameters, must not be modified
+        key = (cls.get_openms_version(), tool)
+        if key not in cls._topp_defaults_cache:
+            ini_file = Path(cls.topp_ini_cache_dir, key[0], f"{tool}.ini")
+            if not ini_file.exists():
+                ini_file.parent.mkdir(parents=True, exist_ok=True)
+                # Write to a unique file first, other processes might write the same INI file
+                tmp_file = Path(ini_file.parent, f"{tool}-{os.getpid()}.ini.tmp")
+                try:
+                    subprocess.call([tool, "-write_ini", str(tmp_file)])
+                except FileNotFoundError:
+                    return None
+                if not tmp_file.exists():
+                    return None
+                os.replace(tmp_file, ini_file)
+            param = poms.Param()
+            poms.ParamXMLFile().load(str(ini_file), param)
+            cls._topp_defaults_cache[key] = param
+        return cls._topp_defaults_cache[key]
+
+    def write_topp_overrides(self, tool: str, custom_defaults: dict) -> None:
+        """
+        Writes the workspace INI file of a TOPP tool, which contains only parameters with custom
+        default values (and the tool version). It is passed to the tool with -ini.
+
+        Args:
+            tool (str): The TOPP tool name.
+            custom_defaults (dict): Custom default values by parameter name (without tool prefix).
+        """
+        defaults = self.get_topp_defaults(tool)
+        if defaults is None:
+            return
+        overrides = poms.Param()
+        for name, value in [("version", None)] + list(custom_defaults.items()):
+            key = (f"{tool}:{name}" if value is None else f"{tool}:1:{name}").encode()
+            if not defaults.exists(key):
+                continue
+            overrides.setValue(
+                key,
+                defaults.getValue(key) if value is None else value,
+                defaults.getDescription(key),
+                defaults.getTags(key),
+            )
+        poms.ParamXMLFile().store(str(Path(self.ini_dir, f"{tool}.ini")), overrides)
+
+    def get_topp_param(self, tool: str) -> Union[poms.Param, None]:
+        """
+        Returns the parameters of a TOPP tool for this workspace: the defaults with the custom
+        defaults from the workspace INI file applied (user parameters are stored in the JSON file).
+
+        Args:
+            tool (str): The TOPP tool name.
+
+        Returns:
+            Union[poms.Param, None]: A copy of the parameters or None if the tool was not found.
+        """
+        param = self._get_topp_param(tool)
+        return None if param is None else poms.Param(param)
+
+    def _get_topp_param(self, tool: str) -> Union[poms.Param, None]:
+        # Cached workspace parameters (re-created if the workspace INI file changed), must not be modified
+        defaults = self._get_topp_defaults(tool)
+        if defaults is None:
+            return None
+
+        def load(ini_file):
+            param = poms.Param(defaults)
+            overrides = poms.Param()
+            poms.ParamXMLFile().load(str(ini_file), overrides)
+            for key in overrides.keys():
+                if param.exists(key):
+                    param.setValue(key, overrides.getValue(key))
+            return param
+
+        param = self._get_cached(Path(self.ini_dir, f"{tool}.ini"), load)
+        return defaults if param is None else param
+
+    @classmethod
+    def _load_python_tool(cls, path: Path) -> dict:
+        """
+        Reads DEFAULTS and checks for a main function in a python-tools script. DEFAULTS are
+        extracted from the source code without executing the script (and its imports). Only if
+        DEFAULTS is not a literal value, the script is imported. Results are cached until the
+        script is modified.
+
+        Args:
+            path (Path): Path to the Python script.
+
+        Returns:
+            dict: "defaults" (list or None) and "main" (bool).
+        """
+        path = Path(path)
+        key = str(path.resolve())
+        mtime = path.stat().st_mtime_ns
+        if key in cls._python_tools_cache and cls._python_tools_cache[key][0] == mtime:
+            return cls._python_tools_cache[key][1]
+        tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+        tool = {"defaults": None, "main": False}
+        dynamic_defaults = False
+        for node in tree.body:
+            if isinstance(node, ast.FunctionDef) and node.name == "main":
+                tool["main"] = True
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and node.value is not None:
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                if any(isinstance(t, ast.Name) and t.id == "DEFAULTS" for t in targets):
+                    try:
+                        tool["defaults"] = ast.literal_eval(node.value)
+                        dynamic_defaults = False
+                    except ValueError:
+                        dynamic_defaults = True
+        if dynamic_defaults:
+            # DEFAULTS is computed at import time
+            if str(path.parent) not in sys.path:
+                sys.path.append(str(path.parent))
+            spec = importlib.util.spec_from_file_location(path.stem, path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            tool["defaults"] = getattr(module, "DEFAULTS", None)
+        cls._python_tools_cache[key] = (mtime, tool)
+        return tool
+
+    @classmethod
+    def get_python_tool_defaults(cls, path: Path) -> Union[list, None]:
+        """
+        Returns the DEFAULTS of a python-tools script (see _load_python_tool).
+
+        Args:
+            path (Path): Path to the Python script.
+
+        Returns:
+            Union[list, None]: A copy of DEFAULTS or None if the script does not define DEFAULTS.
+        """
+        return copy.deepcopy(cls._load_python_tool(path)["defaults"])
+
+    @classmethod
+    def python_tool_has_main(cls, path: Path) -> bool:
+        """
+        Checks if a python-tools script defines a main(params) function.
+
+        Args:
+            path (Path): Path to the Python script.
+
+        Returns:
+            bool: True if the script has a main function.
+        """
+        return cls._load_python_tool(path)["main"]
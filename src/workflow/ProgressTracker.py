@@ -0,0 +1,379 @@
+from pathlib import Path
+import os
+import json
+import time
+import sqlite3
+import statistics
+import threading
+from collections import Counter
+
+
+class ProgressTracker:
+    """
+    Publishes the progress of a running workflow to a small JSON file, which the UI can poll
+    cheaply: the steps (TOPP tools, Python scripts and other commands) with files done and total,
+    the overall percentage and an estimated time until the workflow is finished.
+
+    Estimates are based on the run times of steps in previous runs of the same workflow on this
+    deployment (SQLite database shared by all workspaces), scaled by the size of the input files of
+    each step (or of the workflow for steps which did not start yet). The steps of the last finished
+    run are taken as plan for the steps still to come. Per-file steps of a tool are tracked as one
+    step, which is running once the first of its commands occupied a process slot.
+
+    Attributes:
+        progress_file (Path): The JSON file with the current progress.
+        db_file (Path): The SQLite database with run times of previous runs.
+        workflow (str): The workflow name, run times are only compared within the same workflow.
+    """
+
+    # Number of previous run times per step used for estimates
+    HISTORY = 20
+
+    def __init__(self, workflow_dir: Path, db_file: Path) -> None:
+        self.progress_file = Path(workflow_dir, "progress.json")
+        self.db_file = Path(db_file)
+        self.workflow = Path(workflow_dir).name
+        self.lock = threading.Lock()
+        self.progress = None
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.db_file, timeout=60, isolation_level=None)
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS steps (
+                workflow TEXT,
+                step TEXT,
+                input_bytes INTEGER,
+                run_input_bytes INTEGER,
+                wall_time REAL,
+                finished REAL
+            )"""
+        )
+        # Run times of earlier versions were only stored with the size of the workflow input files
+        if "run_input_bytes" not in [c[1] for c in connection.execute("PRAGMA table_info(steps)")]:
+            connection.execute("ALTER TABLE steps ADD COLUMN run_input_bytes INTEGER")
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS runs (
+                workflow TEXT,
+                steps TEXT,
+                input_bytes INTEGER,
+                wall_time REAL,
+                step_time REAL,
+                finished REAL
+            )"""
+        )
+        return connection
+
+    def start_run(self) -> None:
+        """
+        Starts tracking a new workflow run and loads run times of previous runs.
+        """
+        self.history = {}
+        self.plan = []
+        # Files announced with expect_files and steps added with add_step (step index and files)
+        self.expected = {}
+        self.calls = []
+        # Ratio of run time and summed step times (lower if steps ran in parallel)
+        self.parallel_factor = 1.0
+        try:
+            connection = self._connect()
+            for step, input_bytes, run_input_bytes, wall_time in connection.execute(
+                "SELECT step, input_bytes, run_input_bytes, wall_time FROM steps WHERE workflow = ? AND run_input_bytes IS NOT NULL ORDER BY finished DESC",
+                (self.workflow,),
+            ).fetchall():
+                samples = self.history.setdefault(step, [])
+                if len(samples) < self.HISTORY:
+                    samples.append((input_bytes, run_input_bytes, wall_time))
+            last_run = connection.execute(
+                "SELECT steps, wall_time, step_time FROM runs WHERE workflow = ? ORDER BY finished DESC LIMIT 1",
+                (self.workflow,),
+            ).fetchone()
+            connection.close()
+        except sqlite3.Error:
+            last_run = None
+        if last_run is not None:
+            self.plan = json.loads(last_run[0])
+            if last_run[2]:
+                self.parallel_factor = min(1.0, last_run[1] / last_run[2])
+        self.progress = {
+            "started": time.time(),
+            "updated": time.time(),
+            "input_bytes": 0,
+            "steps": [],
+            "current": [],
+            "percent": None,
+            "eta": None,
+        }
+        self._write()
+
+    def set_input_size(self, input_bytes: int) -> None:
+        """
+        Sets the total size of the workflow input files, used to scale run times of previous runs.
+
+        Args:
+            input_bytes (int): Size of all input files in bytes.
+        """
+        with self.lock:
+            if self.progress is not None:
+                self.progress["input_bytes"] = input_bytes
+                self._write()
+
+    def expect_files(self, name: str, files: int) -> None:
+        """
+        Announces the number of files of a step which is split into one step per file (see StepGraph),
+        so that the files total is known before all of them started.
+
+        Args:
+            name (str): The step name (tool or script name).
+            files (int): Number of files.
+        """
+        with self.lock:
+            if self.progress is not None:
+                self.expected[name] = self.expected.get(name, 0) + files
+
+    def add_step(self, name: str, files: int = 1, input_bytes: int = 0) -> int:
+        """
+        Adds a step which waits for free process slots. Steps with the same name as a step which
+        is not finished yet (e.g. per-file steps of one tool) are counted as files of that step.
+
+        Args:
+            name (str): The step name (tool or script name).
+            files (int, optional): Number of files (commands) processed by the step. Defaults to 1.
+            input_bytes (int, optional): Size of the input files of the step, used to scale estimates. Defaults to 0.
+
+        Returns:
+            int: Id to pass to step_started, file_done and finish_step.
+        """
+        with self.lock:
+            if self.progress is None:
+                return -1
+            steps = self.progress["steps"]
+            index = next((i for i, s in enumerate(steps) if s["name"] == name and s["finished"] is None), None)
+            if index is None:
+                steps.append(
+                    {
+                        "name": name,
+                        "files_done": 0,
+                        "files_total": self.expected.pop(name, 0),
+                        "files_added": 0,
+                        "input_bytes": 0,
+                        "active": 0,
+                        "started": None,
+                        "finished": None,
+                        "skipped": True,
+                        "estimated": None,
+                    }
+                )
+                index = len(steps) - 1
+            step = steps[index]
+            step["files_added"] += files
+            step["files_total"] = max(step["files_total"], step["files_added"])
+            step["input_bytes"] += input_bytes
+            step["active"] += 1
+            # Input size of all files, including files which were not added yet
+            step["estimated"] = self._estimate(
+                name, step["input_bytes"] * step["files_total"] // step["files_added"]
+            )
+            self.calls.append({"step": index, "files": files, "done": 0})
+            self._write()
+            return len(self.calls) - 1
+
+    def step_started(self, call_id: int) -> None:
+        """
+        Marks a step as running, once its (first) command occupied a process slot.
+
+        Args:
+            call_id (int): The id returned by add_step.
+        """
+        with self.lock:
+            if self.progress is None or call_id < 0:
+                return
+            step = self.progress["steps"][self.calls[call_id]["step"]]
+            step["skipped"] = False
+            if step["started"] is None:
+                step["started"] = time.time()
+                self._write()
+
+    def file_done(self, call_id: int) -> None:
+        """
+        Counts a processed file (finished command) of a running step.
+
+        Args:
+            call_id (int): The id returned by add_step.
+        """
+        with self.lock:
+            if self.progress is None or call_id < 0:
+                return
+            call = self.calls[call_id]
+            call["done"] += 1
+            step = self.progress["steps"][call["step"]]
+            step["files_done"] = min(step["files_total"], step["files_done"] + 1)
+            self._write()
+
+    def finish_step(self, call_id: int, success: bool = True, skipped: bool = False) -> None:
+        """
+        Marks the files of a step as finished. The step is finished once all of its files are,
+        its run time is stored for future estimates.
+
+        Args:
+            call_id (int): The id returned by add_step.
+            success (bool, optional): Whether the step finished successfully. Defaults to True.
+            skipped (bool, optional): Whether the step was skipped (results up to date). Defaults to False.
+        """
+        with self.lock:
+            if self.progress is None or call_id < 0:
+                return
+            call = self.calls[call_id]
+            step = self.progress["steps"][call["step"]]
+            step["files_done"] = min(step["files_total"], step["files_done"] + max(0, call["files"] - call["done"]))
+            step["active"] -= 1
+            if step["active"] > 0 or (success and step["files_done"] < step["files_total"]):
+                self._write()
+                return
+            step["finished"] = time.time()
+            if step["started"] is None:
+                step["started"] = step["finished"]
+            self._write()
+            run_input_bytes = self.progress["input_bytes"]
+        if success and not step["skipped"]:
+            try:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT INTO steps (workflow, step, input_bytes, run_input_bytes, wall_time, finished) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        self.workflow,
+                        step["name"],
+                        step["input_bytes"],
+                        run_input_bytes,
+                        step["finished"] - step["started"],
+                        step["finished"],
+                    ),
+                )
+                connection.close()
+            except sqlite3.Error:
+                pass
+
+    def skip_step(self, name: str) -> None:
+        """
+        Records a step which was skipped because its results are up to date.
+
+        Args:
+            name (str): The step name.
+        """
+        self.finish_step(self.add_step(name), skipped=True)
+
+    def finish_run(self, success: bool) -> None:
+        """
+        Stops tracking the run. The steps of a successful run are stored as plan for estimates of future runs.
+
+        Args:
+            success (bool): Whether the workflow finished successfully.
+        """
+        with self.lock:
+            if self.progress is None:
+                return
+            progress = self.progress
+            if success:
+                progress["percent"] = 100.0
+                progress["eta"] = 0.0
+            progress["current"] = []
+            progress["finished"] = time.time()
+            self._write()
+            self.progress = None
+        # Runs where all steps were skipped do not tell anything about run times
+        executed = [s for s in progress["steps"] if not s["skipped"] and s["finished"] is not None]
+        if not success or not executed:
+            return
+        try:
+            connection = self._connect()
+            connection.execute(
+                "INSERT INTO runs (workflow, steps, input_bytes, wall_time, step_time, finished) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.workflow,
+                    json.dumps([s["name"] for s in progress["steps"]]),
+                    progress["input_bytes"],
+                    progress["finished"] - progress["started"],
+                    sum(s["finished"] - s["started"] for s in executed),
+                    progress["finished"],
+                ),
+            )
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+    def _estimate(self, name: str, input_bytes: int = 0) -> float:
+        # Estimated run time of a step from previous runs (None if unknown), scaled by the size of the
+        # input files of the step if known, otherwise by the size of the workflow input files
+        samples = self.history.get(name)
+        if not samples:
+            return None
+        for size, samples_size in (
+            (input_bytes, [(b, w) for b, _, w in samples]),
+            (self.progress["input_bytes"], [(r, w) for _, r, w in samples]),
+        ):
+            scaled = [(b, w) for b, w in samples_size if b > 0]
+            if size > 0 and scaled:
+                # Seconds per input byte over all previous runs with known input size
+                return sum(w for _, w in scaled) / sum(b for b, _ in scaled) * size
+        return statistics.median(w for _, _, w in samples)
+
+    def _update_estimate(self) -> None:
+        # Remaining time: rest of running steps and steps of the plan which did not start yet
+        # (steps without previous run times, e.g. always skipped so far, are not counted)
+        now = time.time()
+        steps = self.progress["steps"]
+        remaining = 0.0
+        known = False
+        for step in steps:
+            if step["finished"] is not None or step["estimated"] is None:
+                continue
+            known = True
+            if step["started"] is None:
+                # Waiting for free process slots
+                remaining += step["estimated"]
+                continue
+            by_files = step["estimated"] * (1 - step["files_done"] / max(1, step["files_total"]))
+            remaining += max(by_files, step["estimated"] - (now - step["started"]), 0)
+        to_come = Counter(self.plan) - Counter(s["name"] for s in steps)
+        for name, count in to_come.items():
+            estimate = self._estimate(name)
+            if estimate is not None:
+                known = True
+                remaining += count * estimate
+        self.progress["current"] = [s["name"] for s in steps if s["started"] is not None and s["finished"] is None]
+        elapsed = now - self.progress["started"]
+        if known:
+            eta = remaining * self.parallel_factor
+            self.progress["eta"] = eta
+            self.progress["percent"] = 100 * elapsed / (elapsed + eta) if elapsed + eta > 0 else 0.0
+        elif self.plan:
+            # No run times of previous runs, count finished steps instead
+            done = sum(1 for s in steps if s["finished"] is not None)
+            self.progress["eta"] = None
+            self.progress["percent"] = 100 * min(1.0, done / max(len(self.plan), len(steps)))
+        else:
+            self.progress["eta"] = None
+            self.progress["percent"] = None
+
+    def _write(self) -> None:
+        # Needs to be called with the lock acquired, replaces the file so that readers never see partial content
+        self.progress["updated"] = time.time()
+        if "finished" not in self.progress:
+            self._update_estimate()
+        tmp_file = Path(self.progress_file.parent, f"{self.progress_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.progress, f)
+        os.replace(tmp_file, self.progress_file)
+
+    def get_progress(self) -> dict:
+        """
+        Reads the published progress of the current (or last) run.
+
+        Returns:
+            dict: The progress, empty if not available.
+        """
+        try:
+            with open(self.progress_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
@@ -0,0 +1,213 @@
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import os
+import sys
+import time
+import multiprocessing
+import tempfile
+import threading
+import traceback
+import importlib
+import importlib.util
+
+# Not available on Windows, CPU times are not reported there
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _init_worker(pid_dir: str, modules: list[str], started: multiprocessing.SimpleQueue) -> None:
+    """
+    Initializes a worker process: registers its process id (so that workers are stopped with
+    the workflow, and in the started queue to remove it again) and imports heavy modules once,
+    so that tools do not have to import them again.
+    """
+    Path(pid_dir, str(os.getpid())).touch()
+    started.put(os.getpid())
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+def _reset_peak_rss() -> bool:
+    """
+    Resets the peak resident memory (VmHWM) of the current process (Linux only).
+
+    Returns:
+        bool: True if the peak memory was reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _get_peak_rss() -> int:
+    """Returns the peak resident memory (VmHWM) of the current process in bytes (Linux only, 0 otherwise)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _run_tool(script_file: str, params: dict) -> dict:
+    """
+    Executes the main(params) function of a Python tool in a worker process. The script is loaded
+    freshly for every call (imports are cached), so that tools do not share global state.
+    Output written to stdout and stderr (including output of compiled libraries) is captured.
+
+    The peak memory of the worker process while running the tool is reported where the peak can be
+    reset (Linux), it includes the memory of modules imported before, but not of processes started
+    by the tool (e.g. process pools).
+
+    Returns:
+        dict: Return code, captured stdout and stderr, CPU times and peak memory of the tool.
+    """
+    path = Path(script_file)
+    if str(path.parent) not in sys.path:
+        sys.path.append(str(path.parent))
+    usage_start = resource.getrusage(resource.RUSAGE_SELF) if resource else None
+    peak_rss_reset = _reset_peak_rss()
+    returncode = 0
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        # Redirect file descriptors instead of sys.stdout to also capture output of C++ libraries
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved_fds = os.dup(1), os.dup(2)
+        saved_streams = sys.stdout, sys.stderr
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+        # The Python streams might not write to the file descriptors (e.g. replaced in the process the worker was forked from)
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(2, "w", closefd=False)
+        try:
+            spec = importlib.util.spec_from_file_location(path.stem, path)
+            module = importlib.util.module_from_spec(spec)
+            # Registered while running, so that functions of the tool can be pickled (e.g. for process pools)
+            sys.modules[path.stem] = module
+            spec.loader.exec_module(module)
+            module.main(params)
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                returncode = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            sys.modules.pop(path.stem, None)
+            sys.stdout.close()
+            sys.stderr.close()
+            sys.stdout, sys.stderr = saved_streams
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            os.close(saved_fds[0])
+            os.close(saved_fds[1])
+        out.seek(0)
+        err.seek(0)
+        stdout, stderr = out.read(), err.read()
+    usage = {}
+    if resource:
+        usage_end = resource.getrusage(resource.RUSAGE_SELF)
+        usage["user_time"] = usage_end.ru_utime - usage_start.ru_utime
+        usage["system_time"] = usage_end.ru_stime - usage_start.ru_stime
+    peak_rss = _get_peak_rss() if peak_rss_reset else 0
+    if peak_rss:
+        usage["max_rss_bytes"] = peak_rss
+    return {"returncode": returncode, "stdout": stdout, "stderr": stderr, "usage": usage}
+
+
+class PythonWorkerPool:
+    """
+    A small pool of long-lived Python processes which execute python-tools in-process via their
+    main(params) function. Heavy modules (e.g. pyopenms and pandas) are imported once per worker,
+    instead of once per tool in a new interpreter.
+
+    Errors in a tool are isolated in the same way as for separate processes: exceptions are
+    reported as return code 1 with the traceback on stderr. If a worker process dies (e.g. crash
+    in a compiled library), the pool is restarted and the tool reported as failed.
+
+    Attributes:
+        n_workers (int): Number of worker processes.
+        modules (list[str]): Modules which are imported when a worker is started.
+        pid_dir (Path): Directory where the worker process ids are registered.
+    """
+
+    def __init__(self, n_workers: int, modules: list[str], pid_dir: Path) -> None:
+        self.n_workers = n_workers
+        self.modules = modules
+        self.pid_dir = pid_dir
+        self.pool = None
+        # Process ids of started workers (put by the workers, see _init_worker)
+        self.started = None
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Starts the worker processes. Should be called before other threads are started,
+        since worker processes are forked from the current process.
+        """
+        context = multiprocessing.get_context()
+        self.started = context.SimpleQueue()
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(str(self.pid_dir), self.modules, self.started),
+        )
+        # Workers are started with the first task
+        self.pool.submit(time.sleep, 0).result()
+
+    def run(self, script_file: str, params: dict) -> dict:
+        """
+        Executes a Python tool in one of the workers.
+
+        Args:
+            script_file (str): Path to the Python tool with a main(params) function.
+            params (dict): The parameters passed to main.
+
+        Returns:
+            dict: Return code, stdout and stderr (bytes), CPU times and peak memory of the tool.
+        """
+        with self.lock:
+            if self.pool is None:
+                self.start()
+            pool = self.pool
+        try:
+            return pool.submit(_run_tool, str(script_file), params).result()
+        except BrokenProcessPool:
+            # Replace the broken pool (only once if several tools were running)
+            with self.lock:
+                if self.pool is pool:
+                    self.shutdown()
+            return {
+                "returncode": -1,
+                "stdout": b"",
+                "stderr": f"Python worker process terminated unexpectedly while running {Path(script_file).name}.".encode(),
+                "usage": {},
+            }
+
+    def shutdown(self) -> None:
+        """
+        Stops all worker processes and removes their process ids.
+        """
+        if self.pool is None:
+            return
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.pool = None
+        while not self.started.empty():
+            Path(self.pid_dir, str(self.started.get())).unlink(missing_ok=True)
+        self.started.close()
+        self.started = None
@@ -0,0 +1,159 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+
+class RunTimeline:
+    """
+    Analyzes the execution of a workflow run from the recorded command metrics (see
+    CommandExecutor.record_metrics): a timeline of all commands per process slot, the critical
+    path (the chain of commands which determined the total run time) and idle slot time.
+
+    Commands of a resumed run are recorded with the start time of the resumed part ("run_start_time").
+    The time between the last command before the interruption and the resume is removed, so that
+    it is not counted as idle time.
+
+    Attributes:
+        commands (pd.DataFrame): One row per command with tool, file, slots and start/end times
+            in seconds relative to the start of the first command (without interruptions).
+        n_slots (int): Number of process slots available to the run.
+    """
+
+    # Commands starting within this many seconds after another finished are considered to wait for it
+    EPSILON = 0.5
+
+    def __init__(self, metrics: list[dict], n_slots: int) -> None:
+        rows = []
+        for m in metrics:
+            rows.append(
+                {
+                    "tool": m["tool"],
+                    "file": m.get("file", ""),
+                    "slots": m.get("slots") or [0],
+                    "start": m["start_time"],
+                    "end": m.get("end_time", m["start_time"] + m["wall_time"]),
+                    "wall_time": m["wall_time"],
+                    "cpu_time": m.get("user_time", 0) + m.get("system_time", 0),
+                    "io_bytes": m.get("read_bytes", 0) + m.get("write_bytes", 0),
+                    "returncode": m["returncode"],
+                    "run_start": m.get("run_start_time", 0),
+                }
+            )
+        self.commands = pd.DataFrame(
+            rows,
+            columns=["tool", "file", "slots", "start", "end", "wall_time", "cpu_time", "io_bytes", "returncode", "run_start"],
+        )
+        # Shift each resumed part of the run to the end of the previous part
+        shift, previous_end = 0.0, None
+        for run_start, part in self.commands.groupby("run_start", sort=True):
+            if previous_end is not None:
+                shift += max(0.0, run_start - previous_end)
+            previous_end = part["end"].max()
+            self.commands.loc[part.index, ["start", "end"]] -= shift
+        self.commands = self.commands.drop(columns="run_start")
+        if not self.commands.empty:
+            t0 = self.commands["start"].min()
+            self.commands["start"] -= t0
+            self.commands["end"] -= t0
+            self.commands = self.commands.sort_values("start", ignore_index=True)
+            n_slots = max(n_slots, max(max(s) for s in self.commands["slots"]) + 1)
+        self.n_slots = n_slots
+
+    def critical_path(self) -> pd.DataFrame:
+        """
+        Traces the critical path backwards from the last finished command: the predecessor of
+        a command is the command which finished last before it started. Time between two
+        commands on the path is spent outside of commands (e.g. Python code of the workflow or
+        restoring cached results), slots waiting for it are idle.
+
+        Returns:
+            pd.DataFrame: The commands on the critical path in execution order, with the gap
+                (seconds) before each command.
+        """
+        if self.commands.empty:
+            return self.commands.assign(gap=[])
+        path = []
+        current = self.commands["end"].idxmax()
+        while current is not None:
+            path.append(current)
+            start = self.commands.at[current, "start"]
+            before = self.commands[
+                (self.commands["end"] <= start + self.EPSILON) & (self.commands.index != current)
+            ]
+            before = before[~before.index.isin(path)]
+            current = before["end"].idxmax() if not before.empty else None
+        path = self.commands.loc[path[::-1]].copy()
+        path["gap"] = (path["start"] - path["end"].shift(1, fill_value=0)).clip(lower=0)
+        return path.reset_index(drop=True)
+
+    def get_summary(self) -> dict:
+        """
+        Summarizes where the time of the run was spent.
+
+        Returns:
+            dict: Run time ("span"), available and busy slot time, idle slot time and utilization
+                (fraction of available slot time), time without any running command ("no_command_time"),
+                critical path time in commands and the CPU utilization of critical path commands
+                (low values indicate I/O bound commands).
+        """
+        if self.commands.empty:
+            return {}
+        span = float(self.commands["end"].max())
+        busy = float((self.commands["wall_time"] * self.commands["slots"].apply(len)).sum())
+        capacity = span * self.n_slots
+        # Time in which no command was running (union of command intervals)
+        covered, covered_until = 0.0, 0.0
+        for start, end in zip(self.commands["start"], self.commands["end"]):
+            if end > covered_until:
+                covered += end - max(start, covered_until)
+                covered_until = end
+        path = self.critical_path()
+        path_time = float(path["wall_time"].sum())
+        return {
+            "span": span,
+            "slots": self.n_slots,
+            "capacity": capacity,
+            "busy": busy,
+            "idle": max(0.0, capacity - busy),
+            "utilization": busy / capacity if capacity else 0.0,
+            "no_command_time": max(0.0, span - float(covered)),
+            "critical_path_time": path_time,
+            "critical_path_cpu_utilization": float(path["cpu_time"].sum()) / path_time if path_time else 0.0,
+        }
+
+    def get_figure(self) -> go.Figure:
+        """
+        Creates a timeline (Gantt chart) with one row per process slot and one bar per command,
+        commands on the critical path are outlined.
+
+        Returns:
+            go.Figure: The timeline figure.
+        """
+        path = self.critical_path()
+        critical = set(zip(path["tool"], path["start"]))
+        # One bar per occupied slot (commands with several threads occupy several slots)
+        bars = self.commands.explode("slots").rename(columns={"slots": "slot"})
+        bars["slot"] = "slot " + bars["slot"].astype(str)
+        bars["critical"] = [(t, s) in critical for t, s in zip(bars["tool"], bars["start"])]
+        fig = px.bar(
+            bars,
+            x="wall_time",
+            base="start",
+            y="slot",
+            color="tool",
+            orientation="h",
+            hover_data={"file": True, "start": ":.1f", "wall_time": ":.1f", "returncode": True, "slot": False},
+            category_orders={"slot": [f"slot {i}" for i in range(self.n_slots)]},
+        )
+        for trace in fig.data:
+            critical_bars = bars[bars["tool"] == trace.name]["critical"]
+            trace.marker.line.width = [2 if c else 0 for c in critical_bars]
+            trace.marker.line.color = "black"
+        fig.update_layout(
+            barmode="overlay",
+            template="plotly_white",
+            xaxis_title="time since first command (seconds)",
+            yaxis_title="",
+            legend_title="tool",
+        )
+        return fig
@@ -0,0 +1,191 @@
+from pathlib import Path
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, List
+
+
+class StepGraph:
+    """
+    Collects workflow steps together with the files they read and write and executes them
+    as a dependency graph. A step depends on every previously added step it shares files with
+    (read after write, write after read and write after write). Steps without dependencies
+    between each other run concurrently in separate threads, at most as many as the CommandExecutor
+    has process slots.
+
+    Steps without any declared files are treated as barriers: they wait for all previously added
+    steps and all following steps wait for them.
+
+    Attributes:
+        executor (CommandExecutor): The executor running the steps.
+        steps (List[dict]): The added steps with name, function, arguments, inputs and outputs.
+    """
+
+    def __init__(self, executor) -> None:
+        self.executor = executor
+        self.logger = executor.logger
+        self.steps = []
+
+    def add(
+        self,
+        function: Callable,
+        *args,
+        inputs: List[str] = [],
+        outputs: List[str] = [],
+        name: str = "",
+        message: str = "",
+        per_file: bool = False,
+        **kwargs,
+    ) -> None:
+        """
+        Adds a step to the graph. Files are taken from the input/output dictionary passed to
+        CommandExecutor.run_topp or run_python (first dictionary in args), additional files which
+        are read or written by the step (e.g. directories) can be declared with inputs and outputs.
+        Files modified in place (in_place keyword argument of CommandExecutor.run_python) are
+        inputs as well as outputs of the step.
+
+        With per_file the step is split into one step per file (n-th input files with n-th output
+        files), so that chains of per-file steps are pipelined: a file can continue with the next
+        step while other files are still processed. Only collective steps (e.g. with collected
+        input files) wait for all files.
+
+        Args:
+            function (Callable): The function to execute, e.g. CommandExecutor.run_topp.
+            *args: Positional arguments for the function.
+            inputs (List[str], optional): Additional files or directories read by the step.
+            outputs (List[str], optional): Additional files or directories written by the step.
+            name (str, optional): Name of the step for logging. Defaults to the first argument.
+            message (str, optional): Message logged when the step starts (for per-file steps with the first file).
+            per_file (bool, optional): Split the step into one step per file. Defaults to False.
+            **kwargs: Keyword arguments for the function.
+        """
+        input_output = next((a for a in args if isinstance(a, dict)), None)
+        if not name:
+            name = str(args[0]) if args else function.__name__
+        if per_file and input_output is not None:
+            n_files = max([len(v) for v in input_output.values() if isinstance(v, list)] + [1])
+            if n_files > 1:
+                self.executor.progress.expect_files(name, n_files)
+                for i in range(n_files):
+                    # Take the n-th file from each file list, single entries are used for all files
+                    file_io = {
+                        k: [v[i]] if isinstance(v, list) and len(v) > 1 else v
+                        for k, v in input_output.items()
+                    }
+                    file_args = [file_io if a is input_output else a for a in args]
+                    files = self.executor.get_step_files(file_io, outputs=False)
+                    file_name = Path(files[0]).name if files else str(i + 1)
+                    self.add(
+                        function,
+                        *file_args,
+                        inputs=inputs,
+                        outputs=outputs,
+                        name=f"{name} ({file_name})",
+                        message=message if i == 0 else "",
+                        **kwargs,
+                    )
+                return
+        step_inputs, step_outputs = list(inputs), list(outputs)
+        if input_output is not None:
+            step_inputs += self.executor.get_step_files(input_output, outputs=False)
+            step_outputs += self.executor.get_step_files(input_output, outputs=True)
+        in_place = kwargs.get("in_place", [])
+        in_place = in_place if isinstance(in_place, list) else [in_place]
+        step_inputs += in_place
+        step_outputs += in_place
+        self.steps.append(
+            {
+                "name": name,
+                "message": message,
+                "function": function,
+                "args": args,
+                "kwargs": kwargs,
+                "inputs": [Path(f).resolve() for f in step_inputs],
+                "outputs": [Path(f).resolve() for f in step_outputs],
+            }
+        )
+
+    @staticmethod
+    def _overlap(a: List[Path], b: List[Path]) -> bool:
+        """Checks if any path in a is equal to, contains or is contained in a path in b."""
+        return any(p == q or p in q.parents or q in p.parents for p in a for q in b)
+
+    def _conflict(self, first: dict, second: dict) -> bool:
+        """Checks if the second step has to wait for the first step."""
+        if not (first["inputs"] or first["outputs"]) or not (
+            second["inputs"] or second["outputs"]
+        ):
+            return True
+        return (
+            self._overlap(first["outputs"], second["inputs"] + second["outputs"])
+            or self._overlap(first["inputs"], second["outputs"])
+        )
+
+    @staticmethod
+    def _input_size(step: dict) -> int:
+        """Returns the size of the input files of a step in bytes (directories are not counted)."""
+        return sum(f.stat().st_size for f in step["inputs"] if f.is_file())
+
+    def _run_step(self, step: dict) -> None:
+        if step["message"]:
+            self.logger.log(step["message"])
+        step["function"](*step["args"], **step["kwargs"])
+
+    def run(self) -> None:
+        """
+        Executes all steps in dependency order. Steps whose dependencies are finished are queued
+        and started as soon as one of the executor's process slots is free, in FIFO order or, if
+        "command-order" in settings.json is "size", with the largest inputs first (in the same way
+        as CommandExecutor.run_multiple_commands). If a step raises an exception, no further steps
+        are started and the exception is raised once the running steps are finished.
+        """
+        dependencies = [
+            {j for j in range(i) if self._conflict(self.steps[j], step)}
+            for i, step in enumerate(self.steps)
+        ]
+        by_size = self.executor.settings.get("command-order", "fifo") == "size"
+        max_running = max(1, self.executor.max_slots)
+        pending = set(range(len(self.steps)))
+        # Steps ready to run (dependencies finished) with the time they were queued and their input size
+        queue = []
+        queued = {}
+        sizes = {}
+        finished = set()
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=max(1, min(max_running, len(self.steps)))) as pool:
+            while pending or queue or running:
+                if error is None:
+                    for i in sorted(pending):
+                        if dependencies[i] <= finished:
+                            pending.remove(i)
+                            queue.append(i)
+                            queued[i] = time.time()
+                            if by_size:
+                                sizes[i] = self._input_size(self.steps[i])
+                    if by_size:
+                        # Stable sort, steps with equal size keep the order in which they were added
+                        queue.sort(key=lambda i: sizes[i], reverse=True)
+                    while queue and len(running) < max_running:
+                        i = queue.pop(0)
+                        step = self.steps[i]
+                        self.logger.log(
+                            f"Starting queued step {step['name']} after waiting {time.time() - queued[i]:.2f} seconds ({len(queue)} steps left in queue).",
+                            1,
+                        )
+                        if running:
+                            self.logger.log(
+                                f"Starting {step['name']} in parallel to {', '.join(self.steps[j]['name'] for j in running.values())}.",
+                                1,
+                            )
+                        future = pool.submit(self._run_step, step)
+                        running[future] = i
+                elif not running:
+                    break
+                done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    finished.add(i)
+                    if future.exception() is not None and error is None:
+                        error = future.exception()
+        if error is not None:
+            raise error
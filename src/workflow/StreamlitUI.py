@@ -1,18 +1,15 @@
 import streamlit as st
-import pyopenms as poms
 from pathlib import Path
 import shutil
-import subprocess
 from typing import Any, Union, List, Literal
 import json
 import os
-import sys
-import importlib.util
-import time
 from io import BytesIO
+from collections import deque
 import zipfile
 from datetime import datetime
 from streamlit_js_eval import streamlit_js_eval
+from .RunTimeline import RunTimeline
 
 
 from src.common.common import (
@@ -563,27 +560,16 @@ class StreamlitUI:
         if display_subsection_tabs:
             display_subsections = True
 
-        # write defaults ini files
+        # Default parameters are shared by all workspaces, the workspace ini file only contains custom defaults
+        if self.parameter_manager.get_topp_defaults(topp_tool_name) is None:
+            st.error(f"TOPP tool **'{topp_tool_name}'** not found.")
+            return
         ini_file_path = Path(self.parameter_manager.ini_dir, f"{topp_tool_name}.ini")
         if not ini_file_path.exists():
-            try:
-                subprocess.call([topp_tool_name, "-write_ini", str(ini_file_path)])
-            except FileNotFoundError:
-                st.error(f"TOPP tool **'{topp_tool_name}'** not found.")
-                return
-            # update custom defaults if necessary
-            if custom_defaults:
-                param = poms.Param()
-                poms.ParamXMLFile().load(str(ini_file_path), param)
-                for key, value in custom_defaults.items():
-                    encoded_key = f"{topp_tool_name}:1:{key}".encode()
-                    if encoded_key in param.keys():
-                        param.setValue(encoded_key, value)
-                poms.ParamXMLFile().store(str(ini_file_path), param)
+            self.parameter_manager.write_topp_overrides(topp_tool_name, custom_defaults)
 
         # read into Param object
-        param = poms.Param()
-        poms.ParamXMLFile().load(str(ini_file_path), param)
+        param = self.parameter_manager.get_topp_param(topp_tool_name)
         if include_parameters:
             valid_keys = [
                 key
@@ -824,13 +810,8 @@ class StreamlitUI:
             path = Path("src", "python-tools", script_file)
             if not path.exists():
                 st.error("Script file not found.")
-        # load DEFAULTS from file
-        if path.parent not in sys.path:
-            sys.path.append(str(path.parent))
-        spec = importlib.util.spec_from_file_location(path.stem, path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        defaults = getattr(module, "DEFAULTS", None)
+        # load DEFAULTS from file (without importing the script)
+        defaults = self.parameter_manager.get_python_tool_defaults(path)
         if defaults is None:
             st.error("No DEFAULTS found in script file.")
             return
@@ -988,7 +969,7 @@ class StreamlitUI:
 
     def execution_section(self, start_workflow_function) -> None:
         with st.expander("**Summary**"):
-            st.markdown(self.export_parameters_markdown())
+            self.show_summary()
 
         c1, c2 = st.columns(2)
         # Select log level, this can be changed at run time or later without re-running the workflow
@@ -999,40 +980,185 @@ class StreamlitUI:
             if c1.button("Stop Workflow", type="primary", use_container_width=True):
                 self.executor.stop()
                 st.rerun()
-        elif c1.button("Start Workflow", type="primary", use_container_width=True):
-            start_workflow_function()
-            st.rerun()
-        log_path = Path(self.workflow_dir, "logs", log_level.replace(" ", "-") + ".log")
-        if log_path.exists():
-            if self.executor.pid_dir.exists():
-                with st.spinner("**Workflow running...**"):
-                    with open(log_path, "r", encoding="utf-8") as f:
-                        content = f.readlines()
-                        if len(content) > 500:
-                            content = "".join(content[-500:])
-                        else:
-                            content = "".join(content)
-                        st.code(
-                            content,
-                            language="neon",
-                            line_numbers=False,
-                        )
-                    time.sleep(2)
+        else:
+            force_rerun = c2.toggle(
+                "force full re-run",
+                value=False,
+                key="force-rerun",
+                help="Execute all workflow steps again. By default, steps with unchanged parameters and input files are skipped and their previous results are re-used.",
+            )
+            if c1.button("Start Workflow", type="primary", use_container_width=True):
+                start_workflow_function(force_rerun)
                 st.rerun()
-            else:
-                st.markdown(
-                    f"**Workflow log file: {datetime.fromtimestamp(log_path.stat().st_ctime).strftime('%Y-%m-%d %H:%M')} CET**"
-                )
-                with open(log_path, "r", encoding="utf-8") as f:
-                    content = f.readlines()
-                    if len(content) > 500:
-                        content = "".join(content[-500:])
-                    else:
-                        content = "".join(content)
-                    # Check if workflow finished successfully
-                    if not "WORKFLOW FINISHED" in content:
-                        st.error("**Errors occurred, check log file.**")
-                    st.code(content, language="neon", line_numbers=False)
+            # A stopped or crashed run can be continued from the first incomplete step
+            if self.executor.incomplete_marker.exists():
+                if c1.button(
+                    "Resume Workflow",
+                    use_container_width=True,
+                    help="Continue the interrupted workflow run. Completed steps are not executed again.",
+                ):
+                    start_workflow_function(False, resume=True)
+                    st.rerun()
+        # The log views are derived from the logged events
+        log_path = self.logger.log_file
+        if self.executor.pid_dir.exists():
+            # Only the log panel is refreshed while the workflow is running, not the whole page
+            st.fragment(self.running_workflow_panel, run_every=2)(log_level)
+        elif log_path.exists():
+            st.markdown(
+                f"**Workflow log file: {datetime.fromtimestamp(log_path.stat().st_ctime).strftime('%Y-%m-%d %H:%M')} CET**"
+            )
+            # The complete log of a finished run, only the log of a running workflow is tailed
+            content = self.logger.get_log(log_level)
+            # Check if workflow finished successfully
+            if not "WORKFLOW FINISHED" in content:
+                st.error("**Errors occurred, check log file.**")
+            st.code(content, language="neon", line_numbers=False)
+            metrics = self.executor.get_metrics()
+            if metrics:
+                with st.expander("⏱️ **Execution Timeline**"):
+                    self.show_timeline(metrics)
+
+    @st.fragment
+    def show_summary(self) -> None:
+        """
+        Shows the summary of the workflow and its non-default parameters.
+        """
+        st.markdown(self.export_parameters_markdown())
+
+    def running_workflow_panel(self, log_level: str) -> None:
+        """
+        Shows the position in the workflow queue and the log of a running workflow,
+        refreshed periodically as a fragment. Reruns the whole page once the workflow finished.
+
+        Args:
+            log_level (str): The log view to show.
+        """
+        if not self.executor.pid_dir.exists():
+            st.rerun()
+        # Show position in the workflow queue while waiting for a free slot
+        if self.executor.job_queue is not None:
+            queue_status = self.executor.job_queue.get_queue_status()
+            if queue_status:
+                message = f"**Workflow queued:** position {queue_status['position']} in the queue"
+                if queue_status["estimated_wait"] is not None:
+                    message += f", estimated start in about {max(1, round(queue_status['estimated_wait'] / 60))} minutes"
+                st.info(message + ".")
+        if self.logger.log_file.exists():
+            self.show_progress()
+            st.code(self.tail_log(log_level), language="neon", line_numbers=False)
+
+    def show_progress(self) -> None:
+        """
+        Shows the progress of the running workflow (see ProgressTracker): running steps with
+        processed files, percentage and estimated remaining time where available.
+        """
+        progress = self.executor.progress.get_progress()
+        if not progress or "finished" in progress:
+            st.markdown("⏳ **Workflow running...**")
+            return
+        steps = [
+            s["name"] + (f" ({s['files_done']}/{s['files_total']} files)" if s["files_total"] > 1 else "")
+            for s in progress["steps"]
+            if s["started"] is not None and s["finished"] is None
+        ]
+        text = "⏳ **Workflow running...**"
+        if steps:
+            text += " " + ", ".join(steps)
+        if progress["eta"] is not None:
+            eta = progress["eta"]
+            text += f" · about {round(eta / 60)} min remaining" if eta >= 90 else f" · about {max(1, round(eta))} s remaining"
+        if progress["percent"] is not None:
+            st.progress(min(100, int(progress["percent"])), text=text)
+        else:
+            st.markdown(text)
+
+    def tail_log(self, view: str, max_lines: int = 500) -> str:
+        """
+        Returns the last lines of a log view of the running workflow. Only events logged since
+        the last call (in this session) are read, the log file is not read at all if its size
+        and modification time did not change.
+
+        Args:
+            view (str): The log view (see Logger.VIEWS).
+            max_lines (int, optional): Maximum number of lines to return. Defaults to 500.
+
+        Returns:
+            str: The last lines of the log.
+        """
+        log_path = self.logger.log_file
+        try:
+            stat = log_path.stat()
+        except FileNotFoundError:
+            return ""
+        key = f"{self.workflow_dir.stem}-log-tail"
+        tail = st.session_state.get(key)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if tail is not None and tail["stamp"] == stamp and tail["view"] == view:
+            return "".join(tail["lines"])
+        # Start from the beginning if the view changed or the log file was replaced (new workflow run)
+        with open(log_path, "rb") as f:
+            head = f.read(100)
+        if (
+            tail is None
+            or tail["view"] != view
+            or tail["head"] != head[: len(tail["head"])]
+            or stat.st_size < tail["offset"]
+        ):
+            tail = {"view": view, "head": head, "offset": 0, "lines": deque(maxlen=max_lines)}
+            st.session_state[key] = tail
+        events, tail["offset"] = self.logger.read_events(tail["offset"], self.logger.VIEWS[view])
+        for event in events:
+            tail["lines"].extend(f"{event['message']}\n\n".splitlines(keepends=True))
+        tail["head"] = head
+        tail["stamp"] = stamp
+        return "".join(tail["lines"])
+
+    def show_timeline(self, metrics: list[dict]) -> None:
+        """
+        Displays the execution timeline of the last workflow run (one row per process slot),
+        the commands on the critical path and where the run time was spent.
+
+        Args:
+            metrics (list[dict]): The command metrics of the run (see CommandExecutor.get_metrics).
+        """
+        timeline = RunTimeline(metrics, self.executor.max_slots)
+        summary = timeline.get_summary()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("run time", f"{summary['span']:.1f} s")
+        c2.metric(
+            "slot utilization",
+            f"{summary['utilization']:.0%}",
+            help=f"{summary['busy']:.0f} of {summary['capacity']:.0f} slot seconds ({summary['slots']} slots) were used by commands, {summary['idle']:.0f} slot seconds were idle.",
+        )
+        c3.metric(
+            "time without commands",
+            f"{summary['no_command_time']:.1f} s",
+            help="Time in which no command was running, e.g. Python code of the workflow or restoring previous results.",
+        )
+        c4.metric(
+            "critical path CPU usage",
+            f"{summary['critical_path_cpu_utilization']:.0%}",
+            help="CPU time of the commands on the critical path relative to their run time. Low values indicate that these commands wait for I/O, values above 100% that they use several threads.",
+        )
+        st.plotly_chart(timeline.get_figure(), use_container_width=True)
+        st.markdown(
+            f"**Critical path:** {summary['critical_path_time']:.1f} s of {summary['span']:.1f} s in commands. "
+            "These commands determined the total run time, commands running in parallel to them did not."
+        )
+        path = timeline.critical_path()
+        st.dataframe(
+            path[["tool", "file", "start", "wall_time", "gap", "cpu_time", "io_bytes", "returncode"]],
+            column_config={
+                "start": st.column_config.NumberColumn("start (s)", format="%.1f"),
+                "wall_time": st.column_config.NumberColumn("run time (s)", format="%.1f"),
+                "gap": st.column_config.NumberColumn("waited before (s)", format="%.1f"),
+                "cpu_time": st.column_config.NumberColumn("CPU time (s)", format="%.1f"),
+                "io_bytes": st.column_config.NumberColumn("I/O (bytes)"),
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
 
     def results_section(self, custom_results_function) -> None:
         custom_results_function()
@@ -1113,6 +1239,24 @@ class StreamlitUI:
         return "\n".join(markdown)
 
     def export_parameters_markdown(self):
+        # The summary only changes with the parameters and the TOPP tools used (ini files), it is kept
+        # in the session state together with the modification times of these files (across reruns)
+        files = [self.parameter_manager.params_file]
+        if self.parameter_manager.ini_dir.exists():
+            files += sorted(self.parameter_manager.ini_dir.iterdir())
+        stamp = []
+        for path in files:
+            try:
+                stamp.append((path.name, path.stat().st_mtime_ns))
+            except OSError:
+                stamp.append((path.name, None))
+        stamp = (tuple(stamp), st.session_state.settings["app-name"])
+        key = f"parameters_summary_{self.workflow_dir}"
+        if key not in st.session_state or st.session_state[key][0] != stamp:
+            st.session_state[key] = (stamp, self._export_parameters_markdown())
+        return st.session_state[key][1]
+
+    def _export_parameters_markdown(self):
         markdown = []
 
         url = f"https://github.com/{st.session_state.settings['github-user']}/{st.session_state.settings['repository-name']}"
@@ -1120,12 +1264,8 @@ class StreamlitUI:
         if len(tools) > 1:
             tools = ", ".join(tools[:-1]) + " and " + tools[-1]
 
-        result = subprocess.run(
-            "FileFilter --help", shell=True, text=True, capture_output=True
-        )
-        version = ""
-        if result.returncode == 0:
-            version = result.stderr.split("Version: ")[1][:5]
+        # Determined once per process
+        version = self.parameter_manager.get_openms_version()
 
         markdown.append(
             f"""Data was processed using **{st.session_state.settings['app-name']}** ([{url}]({url})), a web application based on the OpenMS WebApps framework [1].
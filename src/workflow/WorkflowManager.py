@@ -21,35 +21,71 @@ class WorkflowManager:
         self.ui = StreamlitUI(self.workflow_dir, self.logger, self.executor, self.parameter_manager)
         self.params = self.parameter_manager.get_parameters_from_json()
 
-    def start_workflow(self) -> None:
+    def start_workflow(self, force_rerun: bool = False, resume: bool = False) -> None:
         """
         Starts the workflow process and adds its process id to the pid directory.
         The workflow itself needs to be a process, otherwise streamlit will wait for everything to finish before updating the UI again.
-        """
-        # Delete the log file if it already exists
-        shutil.rmtree(Path(self.workflow_dir, "logs"), ignore_errors=True)
+
+        Args:
+            force_rerun (bool, optional): Execute all steps, even if their results are up to date. Defaults to False.
+            resume (bool, optional): Continue an interrupted run, keeping its log and metrics. Defaults to False.
+        """
+        if not resume:
+            # Delete the log file if it already exists
+            shutil.rmtree(Path(self.workflow_dir, "logs"), ignore_errors=True)
+            # Delete resource usage metrics of the previous run
+            self.executor.metrics_file.unlink(missing_ok=True)
+            self.executor.metrics_summary_file.unlink(missing_ok=True)
+        # Progress of the previous run
+        self.executor.progress.progress_file.unlink(missing_ok=True)
+        # Create pid dir before the workflow process starts (which registers its child processes there)
+        self.executor.pid_dir.mkdir()
         # Start workflow process
-        workflow_process = multiprocessing.Process(target=self.workflow_process)
+        workflow_process = multiprocessing.Process(target=self.workflow_process, args=(force_rerun, resume))
         workflow_process.start()
         # Add workflow process id to pid dir
-        self.executor.pid_dir.mkdir()
         Path(self.executor.pid_dir, str(workflow_process.pid)).touch()
         st.rerun()
 
-    def workflow_process(self) -> None:
+    def workflow_process(self, force_rerun: bool = False, resume: bool = False) -> None:
         """
         Workflow process. Logs start and end of the workflow and calls the execution method where all steps are defined.
+        Steps with unchanged tool, parameters and inputs are skipped and their results restored from the previous run,
+        so that an interrupted run continues with the first incomplete step.
+
+        Args:
+            force_rerun (bool, optional): Remove all previous results and execute every step. Defaults to False.
+            resume (bool, optional): Continue an interrupted run. Defaults to False.
         """
+        success = False
         try:
-            self.logger.log("STARTING WORKFLOW")
-            results_dir = Path(self.workflow_dir, "results")
-            if results_dir.exists():
-                shutil.rmtree(results_dir)
-            results_dir.mkdir(parents=True)
+            # Wait for a free slot if the number of running workflows is limited
+            if self.executor.job_queue is not None:
+                start_time = time.time()
+                if self.executor.job_queue.wait_for_slot():
+                    self.logger.log(f"Started after waiting {(time.time() - start_time) / 60:.1f} minutes in the workflow queue.")
+            self.logger.log("RESUMING WORKFLOW" if resume else "STARTING WORKFLOW")
+            self.executor.run_start_time = time.time()
+            self.executor.progress.start_run()
+            if force_rerun:
+                self.logger.log("Forcing a full re-run of all workflow steps.")
+            # Marks the run as incomplete until it finished successfully
+            self.executor.incomplete_marker.touch()
+            self.executor.cache_previous_results(force_rerun)
+            self.executor.start_python_workers()
             self.execution()
+            self.executor.remove_previous_results()
+            self.executor.incomplete_marker.unlink()
             self.logger.log("WORKFLOW FINISHED")
+            success = True
         except Exception as e:
             self.logger.log(f"ERROR: {e}")
+        if self.executor.job_queue is not None:
+            self.executor.job_queue.finish(success)
+        self.executor.progress.finish_run(success)
+        self.executor.stop_python_workers()
+        # Aggregate resource usage of all commands
+        self.executor.write_metrics_summary()
         # Delete pid dir path to indicate workflow is done
         shutil.rmtree(self.executor.pid_dir, ignore_errors=True)
 
@@ -1,8 +1,1124 @@
+import ast
+import importlib.util
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
 import unittest
+import tempfile
+import textwrap
+import threading
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pyopenms as poms
+
+from src.ms1annotation import annotate_ms1
+from src.workflow.CommandExecutor import CommandExecutor
+from src.workflow.StepGraph import StepGraph
+from src.workflow.RunTimeline import RunTimeline
+from src.workflow.PythonWorkerPool import PythonWorkerPool
+from src.workflow.Logger import Logger
+from src.workflow.JobQueue import JobQueue
+from src.workflow.ProgressTracker import ProgressTracker
+from src.workflow.ParameterManager import ParameterManager
 
 class TestDummy(unittest.TestCase):
     def test_dummy(self):
         self.assertEqual(1, 1)
 
+class WorkflowTestCase(unittest.TestCase):
+    """Creates a workflow directory in a temporary workspace and an executor for it."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.workflow_dir = Path(self.tmp.name, "workspace", "workflow")
+        Path(self.workflow_dir, "pids").mkdir(parents=True)
+        self.executor = CommandExecutor(
+            self.workflow_dir, Logger(self.workflow_dir), ParameterManager(self.workflow_dir)
+        )
+        self.results_dir = Path(self.workflow_dir, "results")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_tool(self, name: str, code: str) -> str:
+        """Writes a python-tools script with a main(params) function and returns its path."""
+        path = Path(self.tmp.name, name + ".py")
+        path.write_text(
+            textwrap.dedent(
+                """
+                import json
+                import sys
+                DEFAULTS = [{"key": "in", "value": []}]
+                def main(params):
+                """
+            )
+            + textwrap.indent(textwrap.dedent(code), "    ")
+            + textwrap.dedent(
+                """
+                if __name__ == "__main__":
+                    with open(sys.argv[1]) as f:
+                        main(json.load(f))
+                """
+            )
+        )
+        return str(path)
+
+    def run_workflow(self, steps) -> None:
+        """Runs steps (functions without arguments) like WorkflowManager, reusing results of the previous run."""
+        self.executor.used_steps = set()
+        self.executor.cache_previous_results()
+        for step in steps:
+            step()
+        self.executor.remove_previous_results()
+
+class TestInPlaceSteps(WorkflowTestCase):
+    def test_in_place_edit_is_not_lost_on_rerun(self):
+        # A creates the matrix, B adds a column to it in place and writes its own results file
+        tool_a = self.write_tool(
+            "tool_a",
+            """
+            with open(params["out"][0], "w") as f:
+                f.write("base")
+            """,
+        )
+        tool_b = self.write_tool(
+            "tool_b",
+            """
+            with open(params["in"][0], "a") as f:
+                f.write("+b")
+            with open(params["out_csv"][0], "w") as f:
+                f.write("b results")
+            """,
+        )
+        matrix = [str(Path(self.results_dir, "matrix.txt"))]
+        csv = [str(Path(self.results_dir, "b.csv"))]
+        steps = [
+            lambda: self.executor.run_python(tool_a, {"out": matrix}),
+            lambda: self.executor.run_python(tool_b, {"in": matrix, "out_csv": csv}, in_place=matrix),
+        ]
+        for _ in range(3):
+            self.run_workflow(steps)
+            self.assertEqual(Path(matrix[0]).read_text(), "base+b")
+            self.assertEqual(Path(csv[0]).read_text(), "b results")
+
+    def test_in_place_output_is_not_removed(self):
+        # Output which is read and rewritten by the tool (like annotate-ms2)
+        tool_a = self.write_tool(
+            "tool_a",
+            """
+            with open(params["out"][0], "w") as f:
+                f.write("base")
+            """,
+        )
+        tool_c = self.write_tool(
+            "tool_c",
+            """
+            with open(params["out"][0]) as f:
+                content = f.read()
+            with open(params["out"][0], "w") as f:
+                f.write(content + "+c")
+            """,
+        )
+        matrix = [str(Path(self.results_dir, "matrix.txt"))]
+        steps = [
+            lambda: self.executor.run_python(tool_a, {"out": matrix}),
+            lambda: self.executor.run_python(tool_c, {"out": matrix}, in_place=matrix),
+        ]
+        for _ in range(2):
+            self.run_workflow(steps)
+            self.assertEqual(Path(matrix[0]).read_text(), "base+c")
+
+class TestStepCache(WorkflowTestCase):
+    def setUp(self):
+        super().setUp()
+        # Counts executions of the tool
+        self.runs_file = Path(self.tmp.name, "runs.txt")
+        self.tool = self.write_tool(
+            "copy_tool",
+            f"""
+            with open({str(self.runs_file)!r}, "a") as f:
+                f.write("run\\n")
+            with open(params["in"][0]) as f:
+                content = f.read()
+            if content == "fail":
+                sys.exit(1)
+            with open(params["out"][0], "w") as f:
+                f.write(content.upper())
+            """,
+        )
+        self.input = Path(self.tmp.name, "input.txt")
+        self.input.write_text("data")
+        self.output = Path(self.results_dir, "output.txt")
+        self.steps = [
+            lambda: self.executor.run_python(self.tool, {"in": [str(self.input)], "out": [str(self.output)]})
+        ]
+
+    def get_runs(self) -> int:
+        return len(self.runs_file.read_text().splitlines()) if self.runs_file.exists() else 0
+
+    def test_unchanged_step_is_skipped_and_restored(self):
+        self.run_workflow(self.steps)
+        self.run_workflow(self.steps)
+        self.assertEqual(self.get_runs(), 1)
+        # Output is moved back from the results of the previous run
+        self.assertEqual(self.output.read_text(), "DATA")
+        self.assertFalse(self.executor.cache_dir.exists())
+
+    def test_changed_input_runs_again(self):
+        self.run_workflow(self.steps)
+        self.input.write_text("new data")
+        self.run_workflow(self.steps)
+        self.assertEqual(self.get_runs(), 2)
+        self.assertEqual(self.output.read_text(), "NEW DATA")
+
+    def test_changed_output_runs_again(self):
+        self.run_workflow(self.steps)
+        self.executor.cache_previous_results()
+        Path(self.executor.get_cached_path(self.output)).write_text("modified")
+        self.run_workflow(self.steps)
+        self.assertEqual(self.get_runs(), 2)
+        self.assertEqual(self.output.read_text(), "DATA")
+
+    def test_skipped_step_keeps_tsv_file(self):
+        # Like export_consensus_df, which writes a tsv file next to the parquet file
+        tool = self.write_tool(
+            "table_tool",
+            f"""
+            with open({str(self.runs_file)!r}, "a") as f:
+                f.write("run\\n")
+            with open(params["out"][0], "w") as f:
+                f.write("parquet")
+            with open(params["out_tsv"][0], "w") as f:
+                f.write("tsv")
+            """,
+        )
+        table = Path(self.results_dir, "table.parquet")
+        tsv = Path(self.results_dir, "table.tsv")
+        steps = [
+            lambda: self.executor.run_python(tool, {"in": [str(self.input)], "out": [str(table)], "out_tsv": [str(tsv)]})
+        ]
+        for _ in range(2):
+            self.run_workflow(steps)
+            self.assertEqual(table.read_text(), "parquet")
+            self.assertEqual(tsv.read_text(), "tsv")
+        self.assertEqual(self.get_runs(), 1)
+
+    def test_failed_step_is_not_recorded(self):
+        self.input.write_text("fail")
+        self.run_workflow(self.steps)
+        self.run_workflow(self.steps)
+        self.assertEqual(self.get_runs(), 2)
+        self.assertFalse(any(self.executor.step_dir.glob("*.json")))
+
+    def test_partial_outputs_of_interrupted_step_are_removed(self):
+        self.executor.cache_previous_results()
+        self.executor.begin_step("interrupted", "copy_tool", [str(self.output)])
+        self.output.write_text("partial")
+        self.executor.cache_previous_results()
+        self.assertFalse(self.output.exists())
+        self.assertFalse(Path(self.executor.cache_dir, "output.txt").exists())
+        self.assertFalse(any(self.executor.step_dir.glob("*.running")))
+
+class TestRunMultipleCommands(WorkflowTestCase):
+    def test_command_raising_counts_as_failed(self):
+        done = [Path(self.tmp.name, f"done-{i}") for i in range(3)]
+        commands = [[sys.executable, "-c", f"open({str(f)!r}, 'w')"] for f in done]
+        commands.insert(1, [str(Path(self.tmp.name, "missing-tool"))])
+        self.assertFalse(self.executor.run_multiple_commands(commands))
+        # Commands after the failing one are still executed
+        self.assertTrue(all(f.exists() for f in done))
+
+    def test_all_commands_succeed(self):
+        commands = [[sys.executable, "-c", "pass"] for _ in range(3)]
+        self.assertTrue(self.executor.run_multiple_commands(commands))
+
+class TestCommandOutput(WorkflowTestCase):
+    def get_output(self) -> list[str]:
+        return [
+            line for e in self.executor.logger.get_events() if e["level"] == 2 for line in e["message"].splitlines()
+        ]
+
+    def test_stdout_and_stderr_are_streamed_to_log(self):
+        code = "import sys\nfor i in range(5000):\n    print(f'out {i}')\n    print(f'err {i}', file=sys.stderr)"
+        self.assertTrue(self.executor.run_command([sys.executable, "-c", code]))
+        output = self.get_output()
+        self.assertEqual([line for line in output if line.startswith("out")], [f"out {i}" for i in range(5000)])
+        self.assertEqual([line for line in output if line.startswith("err")], [f"err {i}" for i in range(5000)])
+        # Successful commands do not repeat stderr
+        self.assertFalse(any("ERRORS OCCURRED" in line or "WARNINGS" in line for line in output))
+
+    def test_last_stderr_lines_are_logged_as_errors(self):
+        code = "import sys\nfor i in range(100):\n    print(f'err {i}', file=sys.stderr)\nsys.exit(3)"
+        self.assertFalse(self.executor.run_command([sys.executable, "-c", code]))
+        error = next(e["message"] for e in self.executor.logger.get_events() if "ERRORS OCCURRED" in e["message"])
+        self.assertEqual(error.splitlines(), ["ERRORS OCCURRED (return code 3):"] + [f"err {i}" for i in range(80, 100)])
+
+    def test_output_without_line_breaks_is_read_in_chunks(self):
+        size = 5 * CommandExecutor.OUTPUT_CHUNK_SIZE + 10
+        self.assertTrue(self.executor.run_command([sys.executable, "-c", f"print('x' * {size}, end='')"]))
+        output = self.get_output()
+        self.assertEqual(sum(len(line) for line in output), size)
+        self.assertLessEqual(max(len(line) for line in output), CommandExecutor.OUTPUT_CHUNK_SIZE)
+
+    def test_read_lines(self):
+        stream = io.BytesIO(b"a\n\nbb\n" + b"c" * 10 + b"\nd")
+        self.assertEqual(
+            list(CommandExecutor.read_lines(stream, 4)), [b"a", b"", b"bb", b"cccc", b"cccc", b"cc", b"d"]
+        )
+
+    def test_output_limit(self):
+        self.executor.settings["max-command-output"] = 100
+        self.assertTrue(self.executor.run_command([sys.executable, "-c", "for i in range(100): print(f'{i:09d}')"]))
+        output = self.get_output()
+        self.assertEqual(output[:10], [f"{i:09d}" for i in range(10)])
+        self.assertIn("Output truncated, 900 bytes of stdout not logged.", output)
+
+class TestCommandMetrics(WorkflowTestCase):
+    def test_metrics_fields(self):
+        self.assertTrue(self.executor.run_command(["true"]))
+        metrics = self.executor.get_metrics()
+        self.assertEqual(len(metrics), 1)
+        self.assertEqual(metrics[0]["tool"], "true")
+        self.assertEqual(metrics[0]["command"], ["true"])
+        self.assertEqual(metrics[0]["returncode"], 0)
+        self.assertEqual(len(metrics[0]["slots"]), 1)
+        self.assertAlmostEqual(metrics[0]["end_time"] - metrics[0]["start_time"], metrics[0]["wall_time"])
+        for key in ("user_time", "system_time", "read_bytes", "write_bytes", "storage_read_bytes", "storage_write_bytes"):
+            self.assertGreaterEqual(metrics[0][key], 0)
+
+    def test_peak_memory_of_command_only(self):
+        # Memory of this process (from which the command is forked) is not counted
+        parent_memory = bytearray(b"x") * (256 * 1024 * 1024)
+        code = "import time; x = bytearray(b'x') * (64 * 1024 * 1024); time.sleep(1)"
+        self.assertTrue(self.executor.run_command([sys.executable, "-c", code]))
+        self.assertTrue(self.executor.run_command(["true"]))
+        del parent_memory
+        python_metrics, true_metrics = self.executor.get_metrics()
+        self.assertGreater(python_metrics["max_rss_bytes"], 64 * 1024 * 1024)
+        self.assertLess(python_metrics["max_rss_bytes"], 160 * 1024 * 1024)
+        # Commands which finished before the first sample have no peak memory
+        self.assertLess(true_metrics.get("max_rss_bytes", 0), 64 * 1024 * 1024)
+
+class TestCommandLimits(WorkflowTestCase):
+    def set_limits(self, limits: dict) -> None:
+        with open(self.executor.parameter_manager.params_file, "w") as f:
+            json.dump({"command-limits": {"*": limits}}, f)
+
+    def get_log(self) -> str:
+        self.executor.logger.flush()
+        return "\n".join(e["message"] for e in self.executor.logger.get_events())
+
+    def test_timeout(self):
+        self.set_limits({"timeout": 1})
+        start = time.time()
+        self.assertFalse(self.executor.run_command(["sleep", "30"]))
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(self.executor.get_metrics()[0]["returncode"], -signal.SIGKILL)
+
+    def test_resident_memory_limit(self):
+        self.set_limits({"max-rss-mb": 100})
+        code = "import time; x = bytearray(b'x') * (300 * 1024 * 1024); time.sleep(30)"
+        start = time.time()
+        self.assertFalse(self.executor.run_command([sys.executable, "-c", code]))
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(self.executor.get_metrics()[0]["returncode"], -signal.SIGKILL)
+
+    def test_virtual_memory_limit(self):
+        self.set_limits({"max-memory-mb": 200})
+        code = "import sys; x = bytearray(300 * 1024 * 1024)"
+        self.assertFalse(self.executor.run_command([sys.executable, "-c", code]))
+        self.assertIn("MemoryError", self.get_log())
+        # Only the command is limited
+        self.assertEqual(len(bytearray(300 * 1024 * 1024)), 300 * 1024 * 1024)
+        self.assertTrue(self.executor.run_command([sys.executable, "-c", "pass"]))
+
+    def test_exited_process_is_not_killed(self):
+        self.set_limits({"timeout": 0.1})
+        self.executor.WATCHDOG_INTERVAL = 0.05
+        process = subprocess.Popen(["true"], start_new_session=True)
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        self.assertFalse(self.executor.is_running(process))
+        stop_watchdog = self.executor.start_watchdog(["true"], process)
+        # The time limit is exceeded before the process is reaped
+        time.sleep(0.3)
+        usage = self.executor.wait_for_process(process, stop_watchdog)
+        self.assertEqual(process.returncode, 0)
+        self.assertNotIn("terminating", self.get_log())
+        self.assertIn("user_time", usage)
+
+    def test_kill_exited_process(self):
+        process = subprocess.Popen(["true"], start_new_session=True)
+        process.wait()
+        self.executor.kill_process_group(process.pid)
+
+class TestRunTimeline(unittest.TestCase):
+    @staticmethod
+    def command(tool: str, start: float, end: float, slots: list = [0], run_start: float = 0, cpu_time: float = 0) -> dict:
+        return {
+            "tool": tool,
+            "start_time": start,
+            "end_time": end,
+            "wall_time": end - start,
+            "user_time": cpu_time,
+            "slots": slots,
+            "returncode": 0,
+            "run_start_time": run_start,
+        }
+
+    def test_interruption_is_not_idle_time(self):
+        metrics = [
+            self.command("A", 1000, 1010, [0]),
+            self.command("B", 1000, 1010, [1]),
+            # Resumed 90 seconds after the last command finished
+            self.command("C", 1101, 1111, [0], run_start=1100),
+        ]
+        timeline = RunTimeline(metrics, 2)
+        self.assertEqual(list(timeline.commands["start"]), [0, 0, 11])
+        summary = timeline.get_summary()
+        self.assertEqual(summary["span"], 21)
+        self.assertEqual(summary["no_command_time"], 1)
+        self.assertEqual(summary["idle"], 2 * 21 - 30)
+
+    def test_critical_path(self):
+        metrics = [
+            self.command("A", 100, 110, [0], cpu_time=10),
+            self.command("B", 100, 104, [1]),
+            self.command("C", 104, 106, [1]),
+            self.command("E", 106, 108, [1]),
+            # Waits for A, one second spent outside of commands
+            self.command("D", 111, 120, [0, 1], cpu_time=4.5),
+        ]
+        timeline = RunTimeline(metrics, 2)
+        path = timeline.critical_path()
+        self.assertEqual(list(path["tool"]), ["A", "D"])
+        self.assertEqual(list(path["gap"]), [0, 1])
+        summary = timeline.get_summary()
+        self.assertEqual(summary["span"], 20)
+        self.assertEqual(summary["busy"], 10 + 4 + 2 + 2 + 2 * 9)
+        self.assertEqual(summary["no_command_time"], 1)
+        self.assertEqual(summary["critical_path_time"], 19)
+        self.assertAlmostEqual(summary["critical_path_cpu_utilization"], 14.5 / 19)
+
+    def test_no_commands(self):
+        timeline = RunTimeline([], 2)
+        self.assertTrue(timeline.critical_path().empty)
+        self.assertEqual(timeline.get_summary(), {})
+
+class TestLogger(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.logger = Logger(Path(self.tmp.name))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_events_round_trip(self):
+        self.logger.log("started")
+        self.logger.log("command", 1)
+        self.logger.log("output\nwith two lines", 2)
+        events = self.logger.get_events()
+        self.assertEqual([(e["level"], e["message"]) for e in events], [(0, "started"), (1, "command"), (2, "output\nwith two lines")])
+        self.assertTrue(all(e["pid"] == os.getpid() and e["time"] > 0 for e in events))
+        self.assertEqual([e["message"] for e in self.logger.get_events(1)], ["started", "command"])
+        self.assertEqual(self.logger.get_log("minimal"), "started\n\n")
+        self.assertEqual(self.logger.get_log("all"), "started\n\ncommand\n\noutput\nwith two lines\n\n")
+
+    def test_buffered_events_are_written_periodically(self):
+        self.logger.log("buffered", 2)
+        self.assertFalse(self.logger.log_file.exists())
+        time.sleep(self.logger.FLUSH_INTERVAL * 3)
+        self.assertIn("buffered", self.logger.log_file.read_text())
+
+    def test_concurrent_threads(self):
+        def log(i):
+            for j in range(500):
+                self.logger.log(f"{i} {j}", 2)
+
+        threads = [threading.Thread(target=log, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        messages = [e["message"] for e in self.logger.get_events()]
+        self.assertEqual(sorted(messages), sorted(f"{i} {j}" for i in range(4) for j in range(500)))
+
+    def test_read_events_from_offset(self):
+        self.logger.log("first")
+        self.logger.log("detail", 2)
+        events, offset = self.logger.read_events()
+        self.assertEqual([e["message"] for e in events], ["first", "detail"])
+        self.assertEqual(offset, self.logger.log_file.stat().st_size)
+        # Only new events are read, filtered by level
+        self.logger.log("second", 1)
+        self.logger.log("more detail", 2)
+        events, offset = self.logger.read_events(offset, level=1)
+        self.assertEqual([e["message"] for e in events], ["second"])
+        # Incomplete lines (another process is writing) are read once they are complete
+        with open(self.logger.log_file, "a") as f:
+            f.write('{"time": 0, "level": 0, "pid": 0, "message": "thi')
+        events, new_offset = self.logger.read_events(offset)
+        self.assertEqual((events, new_offset), ([], offset))
+        with open(self.logger.log_file, "a") as f:
+            f.write('rd"}\n')
+        events, offset = self.logger.read_events(offset)
+        self.assertEqual([e["message"] for e in events], ["third"])
+        self.assertEqual(self.logger.read_events(offset), ([], offset))
+
+class TestPythonWorkerPool(WorkflowTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pool = PythonWorkerPool(1, ["json"], self.executor.pid_dir)
+
+    def tearDown(self):
+        self.pool.shutdown()
+        super().tearDown()
+
+    def test_runs_main_with_params(self):
+        tool = self.write_tool(
+            "params_tool",
+            """
+            with open(params["out"][0], "w") as f:
+                json.dump(params, f)
+            """,
+        )
+        out = str(Path(self.tmp.name, "params.json"))
+        result = self.pool.run(tool, {"in": [], "out": [out], "value": 3})
+        self.assertEqual(result["returncode"], 0)
+        with open(out) as f:
+            self.assertEqual(json.load(f), {"in": [], "out": [out], "value": 3})
+        self.assertIn("user_time", result["usage"])
+
+    def test_output_is_captured_through_file_descriptors(self):
+        tool = self.write_tool(
+            "output_tool",
+            """
+            import os
+            print("printed")
+            print("error", file=sys.stderr)
+            # Written directly to the file descriptor, like output of compiled libraries
+            sys.stdout.flush()
+            os.write(1, b"native\\n")
+            """,
+        )
+        result = self.pool.run(tool, {})
+        self.assertEqual(result["stdout"], b"printed\nnative\n")
+        self.assertEqual(result["stderr"], b"error\n")
+
+    def test_exit_and_exceptions_do_not_stop_the_worker(self):
+        exit_tool = self.write_tool("exit_tool", "sys.exit(3)")
+        message_tool = self.write_tool("message_tool", "sys.exit('failed')")
+        error_tool = self.write_tool("error_tool", "raise ValueError('bad value')")
+        ok_tool = self.write_tool("ok_tool", "import os; print(os.getpid())")
+        pid = int(self.pool.run(ok_tool, {})["stdout"])
+        self.assertEqual(self.pool.run(exit_tool, {})["returncode"], 3)
+        result = self.pool.run(message_tool, {})
+        self.assertEqual((result["returncode"], result["stderr"]), (1, b"failed\n"))
+        result = self.pool.run(error_tool, {})
+        self.assertEqual(result["returncode"], 1)
+        self.assertIn(b"ValueError: bad value", result["stderr"])
+        # Still the same worker process
+        self.assertEqual(int(self.pool.run(ok_tool, {})["stdout"]), pid)
+        self.assertTrue(Path(self.executor.pid_dir, str(pid)).exists())
+
+    def test_crashed_worker_is_replaced(self):
+        crash_tool = self.write_tool("crash_tool", "import os; os._exit(1)")
+        ok_tool = self.write_tool("ok_tool", "print('ok')")
+        result = self.pool.run(crash_tool, {})
+        self.assertEqual(result["returncode"], -1)
+        self.assertIn(b"terminated unexpectedly", result["stderr"])
+        result = self.pool.run(ok_tool, {})
+        self.assertEqual((result["returncode"], result["stdout"]), (0, b"ok\n"))
+
+    def test_process_ids_are_removed_on_shutdown(self):
+        tool = self.write_tool("ok_tool", "import os; print(os.getpid())")
+        pid = int(self.pool.run(tool, {})["stdout"])
+        self.assertTrue(Path(self.executor.pid_dir, str(pid)).exists())
+        self.pool.shutdown()
+        self.assertEqual(list(self.executor.pid_dir.iterdir()), [])
+
+    def test_tools_with_process_pools_do_not_run_in_workers(self):
+        self.executor.python_workers = self.pool
+        tool = self.write_tool(
+            "pool_tool",
+            """
+            import multiprocessing
+            with open(params["out"][0], "w") as f:
+                # Running in a worker of the pool (not started as a script)
+                json.dump(multiprocessing.parent_process() is not None, f)
+            """,
+        )
+        out = Path(self.tmp.name, "in_worker.json")
+        self.executor.run_python(tool, {"out": [str(out)]})
+        self.assertTrue(json.loads(out.read_text()))
+        Path(tool).write_text(Path(tool).read_text().replace('DEFAULTS = [', 'DEFAULTS = [{"key": "threads", "value": 2}, '))
+        self.executor.run_python(tool, {"out": [str(out)]})
+        self.assertFalse(json.loads(out.read_text()))
+
+    def test_feature_store_process_pool(self):
+        sys.path.insert(0, str(Path("src", "python-tools")))
+        try:
+            from feature_store import process_pool
+        finally:
+            sys.path.pop(0)
+        with process_pool(4, 2, self.executor.pid_dir) as pool:
+            pids = {pool.submit(os.getpid).result() for _ in range(4)}
+            self.assertLessEqual(len(pids), 2)
+            self.assertTrue(all(Path(self.executor.pid_dir, str(pid)).exists() for pid in pids))
+        self.assertEqual(list(self.executor.pid_dir.iterdir()), [])
+
+    def test_run_python_in_worker(self):
+        self.executor.python_workers = self.pool
+        tool = self.write_tool(
+            "copy_tool",
+            """
+            print("copying")
+            with open(params["out"][0], "w") as f:
+                f.write("copied")
+            """,
+        )
+        out = Path(self.results_dir, "out.txt")
+        self.results_dir.mkdir()
+        self.executor.run_python(tool, {"out": [str(out)]})
+        self.assertEqual(out.read_text(), "copied")
+        self.assertIn("copying", self.executor.logger.get_log())
+        metrics = self.executor.get_metrics()
+        self.assertEqual((metrics[0]["tool"], metrics[0]["returncode"]), ("copy_tool.py", 0))
+
+class TestPythonToolDefaults(WorkflowTestCase):
+    def setUp(self):
+        super().setUp()
+        ParameterManager._python_tools_cache.clear()
+
+    def test_static_defaults_match_module(self):
+        for path in sorted(Path("src", "python-tools").glob("*.py")):
+            with self.subTest(tool=path.name):
+                defaults = ParameterManager.get_python_tool_defaults(path)
+                spec = importlib.util.spec_from_file_location(path.stem, path)
+                module = importlib.util.module_from_spec(spec)
+                sys.path.append(str(path.parent))
+                try:
+                    spec.loader.exec_module(module)
+                except ImportError as e:
+                    self.skipTest(f"{path.name} can not be imported: {e}")
+                finally:
+                    sys.path.remove(str(path.parent))
+                self.assertEqual(defaults, getattr(module, "DEFAULTS", None))
+                self.assertEqual(ParameterManager.python_tool_has_main(path), hasattr(module, "main"))
+
+    def test_module_is_not_executed(self):
+        marker = Path(self.tmp.name, "imported")
+        tool = self.write_tool("static_tool", "pass")
+        with open(tool, "a") as f:
+            f.write(f"open({str(marker)!r}, 'w')\n")
+        self.assertEqual(ParameterManager.get_python_tool_defaults(tool), [{"key": "in", "value": []}])
+        self.assertTrue(ParameterManager.python_tool_has_main(tool))
+        self.assertFalse(marker.exists())
+
+    def test_computed_defaults_are_imported(self):
+        tool = Path(self.tmp.name, "computed_tool.py")
+        tool.write_text('DEFAULTS = [{"key": k, "value": 0} for k in ("a", "b")]\n')
+        self.assertEqual(
+            ParameterManager.get_python_tool_defaults(tool), [{"key": "a", "value": 0}, {"key": "b", "value": 0}]
+        )
+        self.assertFalse(ParameterManager.python_tool_has_main(tool))
+
+    def test_missing_defaults(self):
+        tool = Path(self.tmp.name, "plain_tool.py")
+        tool.write_text("print('no defaults')\n")
+        self.assertIsNone(ParameterManager.get_python_tool_defaults(tool))
+
+class TestToppDefaults(WorkflowTestCase):
+    def setUp(self):
+        super().setUp()
+        # A fake TOPP tool which writes its default INI file and counts how often it was executed
+        self.runs_file = Path(self.tmp.name, "runs.txt")
+        bin_dir = Path(self.tmp.name, "bin")
+        bin_dir.mkdir()
+        tool = Path(bin_dir, "FakeTool")
+        tool.write_text(
+            textwrap.dedent(
+                f"""\
+                #!{sys.executable}
+                import sys
+                import pyopenms as poms
+                with open({str(self.runs_file)!r}, "a") as f:
+                    f.write("run\\n")
+                param = poms.Param()
+                param.setValue("FakeTool:version", "1.0", "")
+                param.setValue("FakeTool:1:value", 1, "a value")
+                param.setValue("FakeTool:1:name", "default", "a name")
+                poms.ParamXMLFile().store(sys.argv[2], param)
+                """
+            )
+        )
+        tool.chmod(0o755)
+        self.environ = mock.patch.dict(os.environ, {"PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}"})
+        self.environ.start()
+        self.settings = mock.patch.multiple(
+            ParameterManager,
+            topp_ini_cache_dir=Path(self.tmp.name, "topp-ini"),
+            _openms_version="3.0.0",
+            _topp_defaults_cache={},
+        )
+        self.settings.start()
+
+    def tearDown(self):
+        self.settings.stop()
+        self.environ.stop()
+        super().tearDown()
+
+    def get_runs(self) -> int:
+        return len(self.runs_file.read_text().splitlines()) if self.runs_file.exists() else 0
+
+    def test_ini_file_is_written_once_per_version(self):
+        defaults = ParameterManager.get_topp_defaults("FakeTool")
+        self.assertEqual(defaults.getValue("FakeTool:1:value"), 1)
+        self.assertTrue(Path(self.tmp.name, "topp-ini", "3.0.0", "FakeTool.ini").exists())
+        # Cached in memory
+        ParameterManager.get_topp_defaults("FakeTool")
+        self.assertEqual(self.get_runs(), 1)
+        # Shared INI file is used by other processes (empty memory cache) and workspaces
+        ParameterManager._topp_defaults_cache.clear()
+        other_workspace = ParameterManager(Path(self.tmp.name, "other", "workflow"))
+        self.assertEqual(other_workspace.get_topp_value("FakeTool", "value"), 1)
+        self.assertEqual(self.get_runs(), 1)
+        # Written again for another OpenMS version
+        ParameterManager._openms_version = "3.1.0"
+        ParameterManager.get_topp_defaults("FakeTool")
+        self.assertEqual(self.get_runs(), 2)
+        self.assertTrue(Path(self.tmp.name, "topp-ini", "3.1.0", "FakeTool.ini").exists())
+
+    def test_defaults_are_copied(self):
+        ParameterManager.get_topp_defaults("FakeTool").setValue("FakeTool:1:value", 5, "")
+        self.assertEqual(ParameterManager.get_topp_defaults("FakeTool").getValue("FakeTool:1:value"), 1)
+
+    def test_missing_tool(self):
+        self.assertIsNone(ParameterManager.get_topp_defaults("MissingTool"))
+        self.assertIsNone(self.executor.parameter_manager.get_topp_value("MissingTool", "value"))
+
+    def test_modified_workspace_ini_file_is_read(self):
+        parameter_manager = self.executor.parameter_manager
+        parameter_manager.write_topp_overrides("FakeTool", {"value": 2})
+        self.assertEqual(parameter_manager.get_topp_value("FakeTool", "value"), 2)
+        parameter_manager.write_topp_overrides("FakeTool", {"value": 3})
+        ini_file = Path(parameter_manager.ini_dir, "FakeTool.ini")
+        os.utime(ini_file, (time.time(), time.time() + 10))
+        self.assertEqual(parameter_manager.get_topp_value("FakeTool", "value"), 3)
+        ini_file.unlink()
+        self.assertEqual(parameter_manager.get_topp_value("FakeTool", "value"), 1)
+
+    def test_workspace_overrides(self):
+        parameter_manager = self.executor.parameter_manager
+        parameter_manager.write_topp_overrides("FakeTool", {"value": 2, "unknown": 3})
+        overrides = poms.Param()
+        poms.ParamXMLFile().load(str(Path(parameter_manager.ini_dir, "FakeTool.ini")), overrides)
+        # Only custom defaults and the version are stored in the workspace
+        self.assertEqual(sorted(overrides.keys()), ["FakeTool:1:value", "FakeTool:version"])
+        self.assertEqual(parameter_manager.get_topp_param("FakeTool").getValue("FakeTool:1:name"), "default")
+        self.assertEqual(parameter_manager.get_topp_value("FakeTool", "value"), 2)
+        with open(parameter_manager.params_file, "w") as f:
+            json.dump({"FakeTool": {"name": "user"}}, f)
+        self.assertEqual(parameter_manager.get_topp_diff("FakeTool"), {"value": 2, "name": "user"})
+        self.assertEqual(self.get_runs(), 1)
+
+class TestParameterCache(WorkflowTestCase):
+    def setUp(self):
+        super().setUp()
+        self.parameter_manager = self.executor.parameter_manager
+        self.params_file = self.parameter_manager.params_file
+
+    def write(self, path: Path, content: str, mtime_offset: int) -> None:
+        # Explicit modification times, files can be written within the file system timestamp resolution
+        path.write_text(content)
+        os.utime(path, (time.time(), time.time() + mtime_offset))
+
+    def test_params_file_is_parsed_once_until_modified(self):
+        self.write(self.params_file, '{"a": 1}', 0)
+        with mock.patch.object(ParameterManager, "_load_json", wraps=ParameterManager._load_json) as load:
+            self.assertEqual(self.parameter_manager.get_parameters_from_json(), {"a": 1})
+            self.assertEqual(ParameterManager(self.workflow_dir).get_value("a", 0), 1)
+            self.assertEqual(load.call_count, 1)
+            # Same size, different modification time
+            self.write(self.params_file, '{"a": 2}', 10)
+            self.assertEqual(self.parameter_manager.get_parameters_from_json(), {"a": 2})
+            self.assertEqual(load.call_count, 2)
+        self.params_file.unlink()
+        self.assertEqual(self.parameter_manager.get_parameters_from_json(), {})
+
+    def test_cached_params_are_copied(self):
+        self.write(self.params_file, '{"tool": {"a": [1]}}', 0)
+        self.parameter_manager.get_parameters_from_json()["tool"]["a"].append(2)
+        self.assertEqual(self.parameter_manager.get_parameters_from_json(), {"tool": {"a": [1]}})
+
+    def test_python_tool_is_parsed_once_until_modified(self):
+        tool = Path(self.tmp.name, "tool.py")
+        self.write(tool, 'DEFAULTS = [{"key": "a", "value": 1}]\n', 0)
+        with mock.patch("src.workflow.ParameterManager.ast.parse", wraps=ast.parse) as parse:
+            self.assertEqual(ParameterManager.get_python_tool_defaults(tool), [{"key": "a", "value": 1}])
+            self.assertEqual(ParameterManager.get_python_tool_defaults(tool), [{"key": "a", "value": 1}])
+            self.assertEqual(parse.call_count, 1)
+            self.write(tool, 'DEFAULTS = [{"key": "a", "value": 2}]\n', 10)
+            self.assertEqual(ParameterManager.get_python_tool_defaults(tool), [{"key": "a", "value": 2}])
+            self.assertEqual(parse.call_count, 2)
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = Path(self.tmp.name, "job-queue.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def queue(self, workspace: str, slots: int = 1) -> JobQueue:
+        return JobQueue(self.db_file, slots, Path(self.tmp.name, workspace, "workflow"))
+
+    def add_job(self, workspace: str, state: str, submitted: float, pid: int = None, pid_start_time: int = None) -> int:
+        if pid is None:
+            pid, pid_start_time = os.getpid(), JobQueue._get_start_time(os.getpid())
+        connection = self.queue(workspace)._connect()
+        connection.execute(
+            "INSERT INTO jobs (workspace, workflow_dir, pid, pid_start_time, state, submitted) VALUES (?, ?, ?, ?, ?, ?)",
+            (str(Path(self.tmp.name, workspace).resolve()), workspace, pid, pid_start_time, state, submitted),
+        )
+        job_id = connection.execute("SELECT last_insert_rowid()").fetchone()[0]
+        connection.close()
+        return job_id
+
+    def wait_for_slot(self, queue: JobQueue) -> bool:
+        # Fails instead of waiting forever
+        result = []
+        thread = threading.Thread(target=lambda: result.append(queue.wait_for_slot(0.05)), daemon=True)
+        thread.start()
+        thread.join(10)
+        self.assertEqual(len(result), 1, "job was not admitted")
+        return result[0]
+
+    def test_fair_share_order(self):
+        self.add_job("a", "running", 0)
+        a1 = self.add_job("a", "queued", 1)
+        a2 = self.add_job("a", "queued", 2)
+        b1 = self.add_job("b", "queued", 3)
+        c1 = self.add_job("c", "queued", 4)
+        connection = self.queue("a")._connect()
+        # Workspaces without running jobs first, then by submission time
+        self.assertEqual(self.queue("a")._next_jobs(connection), [b1, c1, a1, a2])
+        connection.close()
+
+    def test_job_waits_for_free_slot(self):
+        running = self.add_job("a", "running", 0)
+        queue = self.queue("b", slots=1)
+        thread = threading.Thread(target=queue.wait_for_slot, args=(0.05,), daemon=True)
+        thread.start()
+        time.sleep(0.5)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(self.queue("b").get_queue_status(), {"position": 1, "estimated_wait": None})
+        connection = queue._connect()
+        connection.execute("UPDATE jobs SET state = 'done', started = 0, finished = 1 WHERE id = ?", (running,))
+        connection.close()
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(self.queue("b").get_queue_status(), {})
+
+    def test_dead_jobs_are_removed(self):
+        process = subprocess.Popen(["true"])
+        process.wait()
+        self.add_job("a", "running", 0, pid=process.pid)
+        # Process id reused by another process (this one)
+        self.add_job("b", "running", 0, pid=os.getpid(), pid_start_time=JobQueue._get_start_time(os.getpid()) - 1)
+        queue = self.queue("c", slots=1)
+        self.assertFalse(self.wait_for_slot(queue))
+        connection = queue._connect()
+        self.assertEqual(connection.execute("SELECT workspace, state FROM jobs").fetchall(), [(queue.workspace, "running")])
+        connection.close()
+
+    def test_finished_jobs_are_removed(self):
+        with mock.patch.object(JobQueue, "HISTORY", 3):
+            for i in range(5):
+                queue = self.queue(f"w{i}")
+                self.wait_for_slot(queue)
+                queue.finish(success=i != 4)
+            connection = queue._connect()
+            workspaces = [r[0] for r in connection.execute("SELECT workspace FROM jobs ORDER BY id")]
+            connection.close()
+        # Failed jobs are removed, only the last successful ones are kept
+        self.assertEqual([Path(w).name for w in workspaces], ["w1", "w2", "w3"])
+
+class TestProgressTracker(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.workflow_dir = Path(self.tmp.name, "workspace", "workflow")
+        self.workflow_dir.mkdir(parents=True)
+        self.db_file = Path(self.tmp.name, "progress.db")
+        # Simulated clock, advanced by the tests
+        self.now = 1000.0
+        patcher = mock.patch("src.workflow.ProgressTracker.time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_steps(self, tracker: ProgressTracker, steps: list[tuple[str, float]], input_bytes: int = 0) -> None:
+        """Runs steps (name, run time) one after another."""
+        tracker.start_run()
+        tracker.set_input_size(input_bytes)
+        for name, wall_time in steps:
+            call_id = tracker.add_step(name)
+            tracker.step_started(call_id)
+            self.now += wall_time
+            tracker.finish_step(call_id)
+        tracker.finish_run(True)
+
+    def test_progress_file(self):
+        tracker = ProgressTracker(self.workflow_dir, self.db_file)
+        tracker.start_run()
+        tracker.expect_files("A", 3)
+        call_id = tracker.add_step("A", files=2)
+        self.assertEqual(tracker.get_progress()["current"], [])
+        tracker.step_started(call_id)
+        tracker.file_done(call_id)
+        progress = tracker.get_progress()
+        self.assertEqual(progress["current"], ["A"])
+        self.assertEqual((progress["steps"][0]["files_done"], progress["steps"][0]["files_total"]), (1, 3))
+        # No previous runs, nothing to estimate
+        self.assertIsNone(progress["eta"])
+        tracker.finish_step(call_id)
+        # Waits for the announced third file
+        self.assertIsNone(tracker.get_progress()["steps"][0]["finished"])
+        last_id = tracker.add_step("A")
+        tracker.finish_step(last_id)
+        self.assertIsNotNone(tracker.get_progress()["steps"][0]["finished"])
+        tracker.finish_run(True)
+        progress = tracker.get_progress()
+        self.assertEqual((progress["percent"], progress["eta"]), (100.0, 0.0))
+        self.assertEqual(progress["current"], [])
+
+    def test_estimate_from_previous_runs(self):
+        self.run_steps(ProgressTracker(self.workflow_dir, self.db_file), [("A", 10), ("B", 30)], input_bytes=100)
+        # Other workflows have their own history
+        other_dir = Path(self.tmp.name, "workspace", "other")
+        other_dir.mkdir()
+        self.run_steps(ProgressTracker(other_dir, self.db_file), [("A", 1000)])
+        tracker = ProgressTracker(self.workflow_dir, self.db_file)
+        tracker.start_run()
+        tracker.set_input_size(100)
+        self.assertEqual(tracker.get_progress()["eta"], 40)
+        call_id = tracker.add_step("A")
+        tracker.step_started(call_id)
+        self.now += 5
+        tracker.file_done(call_id)
+        progress = tracker.get_progress()
+        self.assertEqual(progress["eta"], 35)
+        self.assertAlmostEqual(progress["percent"], 100 * 5 / 40)
+        tracker.finish_step(call_id)
+        tracker.finish_run(True)
+        # Steps of the last run (only A) scaled by the workflow input size
+        tracker = ProgressTracker(self.workflow_dir, self.db_file)
+        tracker.start_run()
+        tracker.set_input_size(200)
+        self.assertAlmostEqual(tracker.get_progress()["eta"], 2 * (10 + 5) / 2)
+
+    def test_skipped_steps_are_not_recorded(self):
+        tracker = ProgressTracker(self.workflow_dir, self.db_file)
+        tracker.start_run()
+        tracker.skip_step("A")
+        self.assertTrue(tracker.get_progress()["steps"][0]["skipped"])
+        tracker.finish_run(True)
+        tracker.start_run()
+        self.assertEqual((tracker.history, tracker.plan), ({}, []))
+
+class TestFeatureStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = Path(self.tmp.name, "ffm-df")
+        self.store.mkdir()
+        sys.path.insert(0, str(Path("src", "python-tools")))
+        try:
+            import feature_store
+        finally:
+            sys.path.pop(0)
+        self.feature_store = feature_store
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_chromatograms_round_trip(self):
+        from src.common.common import load_chromatograms
+
+        # String order differs from numeric order ("10" < "100" < "2" < "9")
+        ids = [2, 9, 10, 11, 100, 1000, 3]
+        df = pd.DataFrame(
+            {
+                "mz": [float(i) for i in ids],
+                "chrom_RT": [np.arange(i % 5 + 1, dtype=float) + i for i in ids],
+                "chrom_intensity": [np.full(i % 5 + 1, i, dtype=float) for i in ids],
+            },
+            index=ids,
+        )
+        for delta_rt in (False, True):
+            with self.subTest(delta_rt=delta_rt), mock.patch.object(self.feature_store, "ROW_GROUP_SIZE", 2):
+                index = self.feature_store.write_feature_df(df.copy(), Path(self.store, "sample.parquet"), delta_rt)
+                self.feature_store.write_feature_index([index], self.store)
+                self.assertEqual(len(index), 4)
+                for i in ids:
+                    chroms = load_chromatograms(self.store, {"sample": i})
+                    np.testing.assert_allclose(chroms.at["sample", "chrom_RT"], np.arange(i % 5 + 1) + i)
+                    np.testing.assert_allclose(chroms.at["sample", "chrom_intensity"], np.full(i % 5 + 1, i))
+                for missing in (1, 5, 99, 5000):
+                    self.assertTrue(load_chromatograms(self.store, {"sample": missing}).empty)
+                # Missing samples are skipped
+                self.assertTrue(load_chromatograms(self.store, {"other": 2}).empty)
+
+class TestMS1Annotation(unittest.TestCase):
+    @staticmethod
+    def brute_force(features: pd.DataFrame, library: pd.DataFrame, mz_tolerance: float, rt_window: float) -> list:
+        annotations = []
+        for mz, rt in zip(features["mz"], features["RT"]):
+            names = []
+            for name, library_mz, library_rt in zip(library["name"], library["mz"], library["RT"]):
+                delta = abs(mz_tolerance * library_mz / 1000000)
+                if (
+                    library_mz - delta < mz < library_mz + delta
+                    and library_rt - rt_window / 2 < rt < library_rt + rt_window / 2
+                ):
+                    names.append(str(name))
+            annotations.append(";".join(names))
+        return annotations
+
+    def test_same_as_brute_force(self):
+        rng = np.random.default_rng(0)
+        library = pd.DataFrame(
+            {"name": [f"compound {i}" for i in range(60)], "mz": rng.uniform(100, 110, 60), "RT": rng.uniform(0, 600, 60)}
+        )
+        # Entries with the same m/z and RT, features can match several entries
+        library = pd.concat([library, library.iloc[:10].assign(name=lambda df: df["name"] + " isomer")], ignore_index=True)
+        features = pd.DataFrame(
+            {
+                "mz": np.concatenate([rng.uniform(100, 110, 300), library["mz"] * (1 + rng.normal(0, 2e-6, len(library)))]),
+                "RT": np.concatenate([rng.uniform(0, 600, 300), library["RT"] + rng.normal(0, 5, len(library))]),
+            },
+            index=[f"feature {i}" for i in range(300 + len(library))],
+        )
+        for mz_tolerance, rt_window in ((5, 30), (50, 120), (1000, 600)):
+            with self.subTest(mz_tolerance=mz_tolerance, rt_window=rt_window):
+                annotations = annotate_ms1(features, library, mz_tolerance, rt_window)
+                self.assertEqual(list(annotations.index), list(features.index))
+                self.assertEqual(list(annotations), self.brute_force(features, library, mz_tolerance, rt_window))
+        annotations = annotate_ms1(features, library, 10, 60)
+        self.assertTrue(annotations.str.contains(";").any())
+
+    def test_empty_inputs(self):
+        features = pd.DataFrame({"mz": [100.0, 200.0], "RT": [10.0, 20.0]}, index=[3, 1])
+        library = pd.DataFrame({"name": ["a"], "mz": [100.0], "RT": [10.0]})
+        no_features = features.iloc[:0]
+        no_library = library.iloc[:0]
+        self.assertEqual(list(annotate_ms1(features, no_library, 10, 30)), ["", ""])
+        self.assertEqual(list(annotate_ms1(features, no_library, 10, 30).index), [3, 1])
+        self.assertTrue(annotate_ms1(no_features, library, 10, 30).empty)
+        self.assertTrue(annotate_ms1(no_features, no_library, 10, 30).empty)
+        self.assertEqual(list(annotate_ms1(features, library, 10, 30)), ["a", ""])
+
+class TestStepGraph(WorkflowTestCase):
+    def setUp(self):
+        super().setUp()
+        self.executor.max_slots = 4
+        self.executor.settings["command-order"] = "fifo"
+        self.events = []
+        self.lock = threading.Lock()
+
+    def step(self, name: str, io: dict = {}, duration: float = 0.05, fail: bool = False, in_place: list = []) -> None:
+        with self.lock:
+            self.events.append(("start", name, io))
+        time.sleep(duration)
+        with self.lock:
+            self.events.append(("end", name, io))
+        if fail:
+            raise RuntimeError(name)
+
+    def index(self, kind: str, name: str) -> int:
+        return next(i for i, e in enumerate(self.events) if e[0] == kind and e[1] == name)
+
+    def test_dependent_steps_wait_independent_steps_run_concurrently(self):
+        a, b = str(Path(self.tmp.name, "a")), str(Path(self.tmp.name, "b"))
+        graph = StepGraph(self.executor)
+        graph.add(self.step, "write a", {"out": [a]}, duration=0.2)
+        graph.add(self.step, "write b", {"out": [b]}, duration=0.2)
+        graph.add(self.step, "read a", {"in": [a], "out": [b + "2"]})
+        graph.add(self.step, "barrier")
+        graph.add(self.step, "after barrier", {"in": [b]})
+        graph.run()
+        self.assertLess(self.index("start", "write b"), self.index("end", "write a"))
+        self.assertGreater(self.index("start", "read a"), self.index("end", "write a"))
+        self.assertGreater(self.index("start", "barrier"), self.index("end", "read a"))
+        self.assertGreater(self.index("start", "barrier"), self.index("end", "write b"))
+        self.assertGreater(self.index("start", "after barrier"), self.index("end", "barrier"))
+
+    def test_in_place_files_order_steps(self):
+        matrix = str(Path(self.tmp.name, "matrix"))
+        graph = StepGraph(self.executor)
+        graph.add(self.step, "first", {"out_csv": [matrix + ".csv"]}, in_place=[matrix], duration=0.2)
+        graph.add(self.step, "second", {"out_csv": [matrix + "2.csv"]}, in_place=[matrix])
+        graph.run()
+        self.assertGreater(self.index("start", "second"), self.index("end", "first"))
+
+    def test_exception_is_raised_and_stops_dependent_steps(self):
+        a = str(Path(self.tmp.name, "a"))
+        graph = StepGraph(self.executor)
+        graph.add(self.step, "fails", {"out": [a]}, fail=True)
+        graph.add(self.step, "depends", {"in": [a]})
+        with self.assertRaises(RuntimeError):
+            graph.run()
+        self.assertNotIn("depends", [e[1] for e in self.events])
+
+    def test_per_file_steps_are_split_and_pipelined(self):
+        files = [str(Path(self.tmp.name, f"{i}.mzML")) for i in range(3)]
+        features = [f + ".featureXML" for f in files]
+        database = str(Path(self.tmp.name, "db.tsv"))
+        graph = StepGraph(self.executor)
+        graph.add(self.step, "detect", {"in": files, "out": features, "db": [database]}, per_file=True)
+        graph.add(self.step, "decharge", {"in": features, "out": [f + "2" for f in features]}, per_file=True)
+        graph.add(self.step, "link", {"in": [[f + "2" for f in features]], "out": ["consensus"]})
+        self.assertEqual(len(graph.steps), 7)
+        self.assertEqual(
+            [s["args"][1] for s in graph.steps[:3]],
+            [{"in": [f], "out": [o], "db": [database]} for f, o in zip(files, features)],
+        )
+        self.assertEqual(graph.steps[0]["name"], "detect (0.mzML)")
+        self.executor.max_slots = 1
+        graph.run()
+        # Each file continues with the next step independently, the collective step waits for all files
+        for f in features:
+            io = {"in": [f], "out": [f + "2"]}
+            detect_io = {"in": [f.removesuffix(".featureXML")], "out": [f], "db": [database]}
+            self.assertGreater(
+                self.events.index(("start", "decharge", io)), self.events.index(("end", "detect", detect_io))
+            )
+        self.assertEqual([e[1] for e in self.events[-2:]], ["link", "link"])
+
+    def test_running_steps_are_bounded_by_slots(self):
+        self.executor.max_slots = 2
+        running = [0, 0]
+
+        def step(i):
+            with self.lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            time.sleep(0.05)
+            with self.lock:
+                running[0] -= 1
+
+        graph = StepGraph(self.executor)
+        for i in range(6):
+            graph.add(step, {"out": [str(Path(self.tmp.name, f"out-{i}"))]})
+        graph.run()
+        self.assertEqual(running[1], 2)
+
 if __name__ == '__main__':
     unittest.main()